@@ -0,0 +1,7 @@
+"""
+編譯效能基準測試: 產生指定形狀的合成白板，分階段量測編譯流程的耗時
+
+    python -m benchmarks run -o bench/base.json
+    python -m benchmarks run --baseline bench/base.json --threshold 0.2
+    python -m benchmarks compare bench/base.json bench/head.json
+"""
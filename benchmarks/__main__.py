@@ -0,0 +1,158 @@
+"""
+編譯效能基準測試命令列: run 執行量測 (可附帶回歸檢查)，compare 比較兩次量測結果
+
+    python -m benchmarks run -o bench/base.json
+    python -m benchmarks run --case shortcuts --case hotstrings --repeat 10
+    python -m benchmarks run --shortcuts 1000 --do-chain 500 --hotkey-depth 32 --math-depth 256 --hotstrings 5000
+    python -m benchmarks run --baseline bench/base.json --threshold 0.2
+    python -m benchmarks compare bench/base.json bench/head.json
+
+有階段變慢超過門檻時，以結束代碼 1 結束 (可作為 CI 的回歸檢查)
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+from loguru import logger
+
+from benchmarks.compile_benchmark import (
+    compare_results,
+    format_result_table,
+    run_benchmarks,
+)
+from benchmarks.workspace_generator import (
+    CASE_NAME_MAPPING_WORKSPACE_SHAPE_DICT,
+    WorkspaceShape,
+)
+from server.ahk_func_library import AhkFuncLibrary
+
+AHK_FUNC_DIRPATH = Path(__file__).parent.parent / 'ahk_funcs'
+
+
+def read_result_dict(result_filepath: Path) -> dict:
+    """ 讀取量測結果 json 檔 """
+    return json.loads(result_filepath.read_text('utf-8'))
+
+
+def check_regressions(base_result_dict: dict, head_result_dict: dict, args: argparse.Namespace) -> int:
+    """ 回歸檢查: 有階段變慢超過門檻時回傳 1
+
+    Returns:
+        int: 結束代碼
+    """
+    stage_regression_list = compare_results(
+        base_result_dict,
+        head_result_dict,
+        threshold=args.threshold,
+        min_delta_ms=args.min_delta_ms,
+    )
+    for stage_regression in stage_regression_list:
+        logger.error(
+            f"{stage_regression.case_name}/{stage_regression.stage_name} 變慢: "
+            f"{stage_regression.base_ms:.3f} ms -> {stage_regression.head_ms:.3f} ms "
+            f"({stage_regression.ratio:+.1%}，門檻 {args.threshold:+.0%})"
+        )
+    if stage_regression_list:
+        return 1
+    logger.info(f"沒有階段變慢超過門檻 ({args.threshold:+.0%})")
+    return 0
+
+
+def run_command(args: argparse.Namespace) -> int:
+    """ run 子命令 """
+    case_name_mapping_workspace_shape_dict = {
+        case_name: CASE_NAME_MAPPING_WORKSPACE_SHAPE_DICT[case_name]
+        for case_name in args.case or []
+    }
+    custom_workspace_shape = WorkspaceShape(
+        shortcut_count=args.shortcuts,
+        do_chain_length=args.do_chain,
+        hotkey_depth=args.hotkey_depth,
+        math_depth=args.math_depth,
+        hotstring_count=args.hotstrings,
+    )
+    if any(custom_workspace_shape):
+        case_name_mapping_workspace_shape_dict['custom'] = custom_workspace_shape
+
+    result_dict = run_benchmarks(
+        AhkFuncLibrary(args.ahk_funcs_dir),
+        case_name_mapping_workspace_shape_dict,
+        repeat=args.repeat,
+    )
+    base_result_dict = read_result_dict(args.baseline) if args.baseline else None
+    print(format_result_table(result_dict, base_result_dict))
+
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(result_dict, indent=2), encoding='utf-8')
+        logger.info(f"量測結果已儲存至 {args.out}")
+
+    if base_result_dict is None:
+        return 0
+    return check_regressions(base_result_dict, result_dict, args)
+
+
+def compare_command(args: argparse.Namespace) -> int:
+    """ compare 子命令 """
+    base_result_dict = read_result_dict(args.base)
+    head_result_dict = read_result_dict(args.head)
+    print(format_result_table(head_result_dict, base_result_dict))
+    return check_regressions(base_result_dict, head_result_dict, args)
+
+
+def add_gate_arguments(parser: argparse.ArgumentParser):
+    """ 加入回歸檢查的參數 """
+    parser.add_argument(
+        '--threshold', type=float, default=0.2, help='容許變慢的比例 (預設 0.2，即 20%%)')
+    parser.add_argument(
+        '--min-delta-ms', type=float, default=1.0, help='容許變慢的毫秒數 (預設 1.0)')
+
+
+def get_arg_parser() -> argparse.ArgumentParser:
+    """ 建立命令列參數解析器 """
+    arg_parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    subparsers = arg_parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='執行編譯效能量測')
+    run_parser.add_argument(
+        '--case', action='append', choices=list(CASE_NAME_MAPPING_WORKSPACE_SHAPE_DICT),
+        help='量測的預設案例 (可重複指定；未指定案例與自訂形狀時量測所有預設案例)')
+    run_parser.add_argument(
+        '--shortcuts', type=int, default=0, help='自訂案例: 頂層快捷鍵積木數量')
+    run_parser.add_argument(
+        '--do-chain', type=int, default=0, help='自訂案例: 單一快捷鍵的 DO 動作積木串長度')
+    run_parser.add_argument(
+        '--hotkey-depth', type=int, default=0, help='自訂案例: 巢狀熱鍵積木深度')
+    run_parser.add_argument(
+        '--math-depth', type=int, default=0, help='自訂案例: 巢狀數學運算積木深度')
+    run_parser.add_argument(
+        '--hotstrings', type=int, default=0, help='自訂案例: 頂層熱字串積木數量')
+    run_parser.add_argument(
+        '--repeat', type=int, default=5, help='每個案例的量測次數 (預設 5)')
+    run_parser.add_argument(
+        '-o', '--out', type=Path, default=None, help='量測結果 json 檔的輸出路徑')
+    run_parser.add_argument(
+        '--baseline', type=Path, default=None, help='基準量測結果 json 檔 (指定時進行回歸檢查)')
+    run_parser.add_argument(
+        '--ahk-funcs-dir', type=Path, default=AHK_FUNC_DIRPATH, help='AHK 函式目錄')
+    add_gate_arguments(run_parser)
+    run_parser.set_defaults(func=run_command)
+
+    compare_parser = subparsers.add_parser('compare', help='比較兩次量測結果')
+    compare_parser.add_argument('base', type=Path, help='基準量測結果 json 檔')
+    compare_parser.add_argument('head', type=Path, help='本次量測結果 json 檔')
+    add_gate_arguments(compare_parser)
+    compare_parser.set_defaults(func=compare_command)
+
+    return arg_parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = get_arg_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""
+編譯流程基準測試: 分階段量測解析、產生 AHK 代碼、產生 xml 字串與函式解析的耗時，
+並比較兩次量測結果以找出變慢的階段
+"""
+import gc
+import platform
+import statistics
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from benchmarks.workspace_generator import (
+    CASE_NAME_MAPPING_WORKSPACE_SHAPE_DICT,
+    WorkspaceShape,
+    blocks_to_workspace_xml_str,
+    generate_workspace_xml_str,
+)
+from pysrc import compiler
+from pysrc.models.block_bases import BlockBase
+from server.ahk_func_library import AhkFuncLibrary
+
+# 量測的編譯階段名稱 (依執行順序)
+STAGE_NAMES = ('parse', 'ahkscr', 'get_xml_str', 'resolve_funcs')
+
+
+class StageRegression(NamedTuple):
+    """ 變慢的編譯階段 """
+    case_name: str
+    stage_name: str
+    base_ms: float
+    head_ms: float
+
+    @property
+    def ratio(self) -> float:
+        """ 耗時變化比例 (如 0.25 表示慢了 25%) """
+        return self.head_ms / self.base_ms - 1 if self.base_ms else float('inf')
+
+
+def get_stage_stat_dict(elapsed_ms_list: List[float]) -> Dict[str, float]:
+    """ 統計單一階段多次量測的耗時
+
+    Args:
+        elapsed_ms_list (List[float]): 每次量測的耗時毫秒數
+
+    Returns:
+        Dict[str, float]: {"min_ms": 最短, "median_ms": 中位數, "mean_ms": 平均}
+    """
+    return {
+        "min_ms": round(min(elapsed_ms_list), 4),
+        "median_ms": round(statistics.median(elapsed_ms_list), 4),
+        "mean_ms": round(statistics.mean(elapsed_ms_list), 4),
+    }
+
+
+def benchmark_workspace(
+        xml_str: str,
+        ahk_func_library: AhkFuncLibrary,
+        repeat: int = 5) -> Dict[str, Dict[str, float]]:
+    """ 分階段量測單一白板的編譯耗時
+
+    每次量測都重新解析積木 (積木實例會快取降階結果，重複使用會量不到真正的編譯耗時)
+
+    Args:
+        xml_str (str): 白板的 xml 字串
+        ahk_func_library (AhkFuncLibrary): AHK 函式庫
+        repeat (int, optional): 量測次數. Defaults to 5.
+
+    Returns:
+        Dict[str, Dict[str, float]]: 階段名稱與其耗時統計字典
+    """
+    header_ahkscr = compiler.get_header_ahkscr()
+    stage_name_mapping_elapsed_ms_list_dict: Dict[str, List[float]] = {
+        stage_name: [] for stage_name in STAGE_NAMES
+    }
+
+    def _measure(stage_name: str, stage_func: Callable):
+        start_time = time.perf_counter()
+        result = stage_func()
+        stage_name_mapping_elapsed_ms_list_dict[stage_name].append(
+            (time.perf_counter() - start_time) * 1000)
+        return result
+
+    # 量測期間停用垃圾回收，避免回收時機造成的耗時抖動
+    gc_enabled = gc.isenabled()
+    try:
+        for _ in range(repeat):
+            gc.collect()
+            gc.disable()
+            blocks = _measure(
+                'parse', lambda: BlockBase.create_blocks_from_xml_str(xml_str))
+            block_ahkscr = _measure(
+                'ahkscr', lambda: compiler.blocks_to_ahkscr(blocks))
+            _measure(
+                'get_xml_str', lambda: blocks_to_workspace_xml_str(blocks))
+            _measure('resolve_funcs', lambda: compiler.link_ahkscr(
+                header_ahkscr,
+                block_ahkscr,
+                ahk_func_library.func_name_mapping_scr_dict,
+                ahk_func_library.get_funcs_script,
+            ))
+            if gc_enabled:
+                gc.enable()
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    return {
+        stage_name: get_stage_stat_dict(elapsed_ms_list)
+        for stage_name, elapsed_ms_list in stage_name_mapping_elapsed_ms_list_dict.items()
+    }
+
+
+def run_benchmarks(
+        ahk_func_library: AhkFuncLibrary,
+        case_name_mapping_workspace_shape_dict: Optional[Dict[str, WorkspaceShape]] = None,
+        repeat: int = 5) -> dict:
+    """ 執行所有基準測試案例
+
+    Args:
+        ahk_func_library (AhkFuncLibrary): AHK 函式庫
+        case_name_mapping_workspace_shape_dict (Optional[Dict[str, WorkspaceShape]], optional):
+            案例名稱與白板形狀字典. Defaults to None (使用預設案例).
+        repeat (int, optional): 每個案例的量測次數. Defaults to 5.
+
+    Returns:
+        dict: 量測結果 (可直接存成 json 檔，供之後比較)
+    """
+    case_name_mapping_workspace_shape_dict = case_name_mapping_workspace_shape_dict \
+        or CASE_NAME_MAPPING_WORKSPACE_SHAPE_DICT
+    case_name_mapping_result_dict = {}
+    for case_name, workspace_shape in case_name_mapping_workspace_shape_dict.items():
+        xml_str = generate_workspace_xml_str(workspace_shape)
+        case_name_mapping_result_dict[case_name] = {
+            "shape": workspace_shape._asdict(),
+            "xml_size": len(xml_str),
+            "stages": benchmark_workspace(xml_str, ahk_func_library, repeat),
+        }
+    return {
+        "created_at": datetime.now().isoformat(timespec='seconds'),
+        "python": f"{platform.python_implementation()} {platform.python_version()}",
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "cases": case_name_mapping_result_dict,
+    }
+
+
+def compare_results(
+        base_result_dict: dict,
+        head_result_dict: dict,
+        threshold: float = 0.2,
+        min_delta_ms: float = 1.0) -> List[StageRegression]:
+    """ 比較兩次量測結果，找出變慢超過門檻的階段
+
+    以最短耗時比較 (受其他程序干擾最小)；僅比較兩次結果皆有的案例與階段
+
+    Args:
+        base_result_dict (dict): 基準量測結果
+        head_result_dict (dict): 本次量測結果
+        threshold (float, optional): 容許變慢的比例. Defaults to 0.2.
+        min_delta_ms (float, optional): 容許變慢的毫秒數 (避免極短的階段因量測誤差而誤判). Defaults to 1.0.
+
+    Returns:
+        List[StageRegression]
+    """
+    com_stage_regression_list: List[StageRegression] = []
+    for case_name, head_case_dict in head_result_dict['cases'].items():
+        base_case_dict = base_result_dict['cases'].get(case_name)
+        if base_case_dict is None:
+            continue
+        for stage_name, head_stage_dict in head_case_dict['stages'].items():
+            base_stage_dict = base_case_dict['stages'].get(stage_name)
+            if base_stage_dict is None:
+                continue
+            base_ms = base_stage_dict['min_ms']
+            head_ms = head_stage_dict['min_ms']
+            if head_ms - base_ms > max(base_ms * threshold, min_delta_ms):
+                com_stage_regression_list.append(
+                    StageRegression(case_name, stage_name, base_ms, head_ms))
+    return com_stage_regression_list
+
+
+def format_result_table(result_dict: dict, base_result_dict: Optional[dict] = None) -> str:
+    """ 將量測結果格式化成文字表格 (有基準結果時附上耗時變化比例)
+
+    Args:
+        result_dict (dict): 量測結果
+        base_result_dict (Optional[dict], optional): 基準量測結果. Defaults to None.
+
+    Returns:
+        str
+    """
+    line_list = [
+        f"{result_dict['python']} / {result_dict['platform']} (repeat={result_dict['repeat']})",
+        f"{'case':<14}{'stage':<15}{'min_ms':>12}{'median_ms':>12}{'change':>10}",
+    ]
+    for case_name, case_dict in result_dict['cases'].items():
+        base_case_dict = (base_result_dict or {}).get('cases', {}).get(case_name, {})
+        for stage_name, stage_dict in case_dict['stages'].items():
+            base_stage_dict = base_case_dict.get('stages', {}).get(stage_name)
+            change_str = ''
+            if base_stage_dict and base_stage_dict['min_ms']:
+                change_str = f"{stage_dict['min_ms'] / base_stage_dict['min_ms'] - 1:+.1%}"
+            line_list.append(
+                f"{case_name:<14}{stage_name:<15}"
+                f"{stage_dict['min_ms']:>12.3f}{stage_dict['median_ms']:>12.3f}{change_str:>10}"
+            )
+    return '\n'.join(line_list)
@@ -0,0 +1,199 @@
+"""
+合成白板產生器: 依白板形狀 (頂層快捷鍵數量、DO 串長度、巢狀深度、熱字串數量) 產生積木與 xml 字串
+"""
+from typing import Dict, List, NamedTuple
+
+from pysrc.models.block_bases import BlockBase
+from pysrc.models.blocks import (
+    HotKeyBlock,
+    HotStringBlock,
+    MathNumberBlock,
+    MathOperatorBlock,
+    MathRandomBlock,
+    MousePosBlock,
+    MsgboxBlock,
+    NormalKeyBlock,
+    SendInputKeyBlock,
+    SendInputTextBlock,
+    ShortCutBlock,
+    SleepBlock,
+    TextBlock,
+)
+
+# 巢狀熱鍵積木 A 按鍵依序循環使用的輔助按鍵
+HOTKEY_KEY_A_LIST = ['Ctrl', 'Shift', 'Alt', 'Win']
+# 巢狀數學運算積木依序循環使用的運算子
+MATH_OPERATOR_LIST = ['+', '-', '*', 'Mod']
+
+
+class WorkspaceShape(NamedTuple):
+    """ 合成白板的形狀 """
+    # 頂層快捷鍵積木數量 (每個快捷鍵的 DO 有數個動作積木)
+    shortcut_count: int = 0
+    # 單一快捷鍵積木的 DO 動作積木串長度
+    do_chain_length: int = 0
+    # 巢狀熱鍵積木深度
+    hotkey_depth: int = 0
+    # 巢狀數學運算積木深度
+    math_depth: int = 0
+    # 頂層熱字串積木數量
+    hotstring_count: int = 0
+
+
+# 預設的基準測試案例名稱與白板形狀字典
+CASE_NAME_MAPPING_WORKSPACE_SHAPE_DICT: Dict[str, WorkspaceShape] = {
+    'shortcuts': WorkspaceShape(shortcut_count=500),
+    'do_chain': WorkspaceShape(do_chain_length=2000),
+    'deep_nesting': WorkspaceShape(hotkey_depth=2000, math_depth=400),
+    'hotstrings': WorkspaceShape(hotstring_count=2000),
+    'mixed': WorkspaceShape(
+        shortcut_count=100,
+        do_chain_length=200,
+        hotkey_depth=16,
+        math_depth=64,
+        hotstring_count=200,
+    ),
+}
+
+
+def get_action_block_list(index: int) -> List[BlockBase]:
+    """ 產生快捷鍵 DO 內的動作積木 (依序號改變內容，避免所有積木代碼都相同)
+
+    Args:
+        index (int): 動作積木序號
+
+    Returns:
+        List[BlockBase]
+    """
+    return [
+        SendInputTextBlock(TEXT=TextBlock(TEXT=f"text {index}")),
+        SleepBlock(TIME=MathNumberBlock(NUM=str(index % 10 + 1)), UNIT=' * 1000', PRECISE='FALSE'),
+        MsgboxBlock(TEXT=MathOperatorBlock(
+            OPERATOR='+',
+            NUM_A=MousePosBlock(POS='"x", "Screen"'),
+            NUM_B=MathNumberBlock(NUM=str(index)),
+        )),
+        MsgboxBlock(TEXT=MathRandomBlock(
+            METHOD='"Int"',
+            MIN=MathNumberBlock(NUM='1'),
+            MAX=MathNumberBlock(NUM=str(index + 1)),
+        )),
+        SendInputKeyBlock(KEY=NormalKeyBlock(KEY='Enter')),
+    ]
+
+
+def get_shortcut_key_block(index: int) -> BlockBase:
+    """ 產生不重複的快捷鍵按鍵積木
+
+    Args:
+        index (int): 快捷鍵序號
+
+    Returns:
+        BlockBase
+    """
+    key_block = NormalKeyBlock(KEY=f"F{index % 24 + 1}")
+    for key_a in HOTKEY_KEY_A_LIST[:index // 24 % len(HOTKEY_KEY_A_LIST) + 1]:
+        key_block = HotKeyBlock(KEY_A=key_a, KEY_B=key_block)
+    return key_block
+
+
+def get_nested_hotkey_block(depth: int) -> BlockBase:
+    """ 產生巢狀的熱鍵積木: 最內層為一般按鍵
+
+    Args:
+        depth (int): 熱鍵積木層數
+
+    Returns:
+        BlockBase
+    """
+    key_block = NormalKeyBlock(KEY='a')
+    for level in range(depth):
+        key_block = HotKeyBlock(
+            KEY_A=HOTKEY_KEY_A_LIST[level % len(HOTKEY_KEY_A_LIST)],
+            KEY_B=key_block,
+        )
+    return key_block
+
+
+def get_nested_math_block(depth: int) -> BlockBase:
+    """ 產生巢狀的數學運算積木: 每層的右運算元為滑鼠座標，以免被常數摺疊
+
+    Args:
+        depth (int): 數學運算積木層數
+
+    Returns:
+        BlockBase
+    """
+    num_block = MathNumberBlock(NUM='1')
+    for level in range(depth):
+        num_block = MathOperatorBlock(
+            OPERATOR=MATH_OPERATOR_LIST[level % len(MATH_OPERATOR_LIST)],
+            NUM_A=num_block,
+            NUM_B=MousePosBlock(POS='"y", "Screen"') if level % 2 else MathNumberBlock(NUM=str(level + 2)),
+        )
+    return num_block
+
+
+def generate_workspace_blocks(workspace_shape: WorkspaceShape) -> List[BlockBase]:
+    """ 依白板形狀產生白板上的頂層積木
+
+    Args:
+        workspace_shape (WorkspaceShape)
+
+    Returns:
+        List[BlockBase]
+    """
+    com_block_list: List[BlockBase] = []
+    for index in range(workspace_shape.shortcut_count):
+        com_block_list.append(ShortCutBlock(
+            KEY=get_shortcut_key_block(index),
+            DO=get_action_block_list(index),
+        ))
+    if workspace_shape.do_chain_length:
+        do_block_list: List[BlockBase] = []
+        while len(do_block_list) < workspace_shape.do_chain_length:
+            do_block_list.extend(get_action_block_list(len(do_block_list)))
+        del do_block_list[workspace_shape.do_chain_length:]
+        com_block_list.append(ShortCutBlock(
+            KEY=NormalKeyBlock(KEY='F1'),
+            DO=do_block_list,
+        ))
+    if workspace_shape.hotkey_depth or workspace_shape.math_depth:
+        com_block_list.append(ShortCutBlock(
+            KEY=get_nested_hotkey_block(workspace_shape.hotkey_depth),
+            DO=[MsgboxBlock(TEXT=get_nested_math_block(workspace_shape.math_depth))],
+        ))
+    for index in range(workspace_shape.hotstring_count):
+        com_block_list.append(HotStringBlock(
+            ABBR=TextBlock(TEXT=f"abbr{index}"),
+            TEXT=TextBlock(TEXT=f"hot string text {index}"),
+        ))
+    return com_block_list
+
+
+def blocks_to_workspace_xml_str(blocks: List[BlockBase]) -> str:
+    """ 將白板上的頂層積木組合成白板 xml 字串
+
+    Args:
+        blocks (List[BlockBase])
+
+    Returns:
+        str
+    """
+    return ''.join([
+        '<xml xmlns="https://developers.google.com/blockly/xml">',
+        *[block.get_xml_str() for block in blocks],
+        '</xml>',
+    ])
+
+
+def generate_workspace_xml_str(workspace_shape: WorkspaceShape) -> str:
+    """ 依白板形狀產生白板 xml 字串
+
+    Args:
+        workspace_shape (WorkspaceShape)
+
+    Returns:
+        str
+    """
+    return blocks_to_workspace_xml_str(generate_workspace_blocks(workspace_shape))
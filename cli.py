@@ -0,0 +1,377 @@
+"""
+命令列工具: 將積木 xml 檔 (或 json 檔) 編譯成 AHK 腳本
+
+    python -m cli compile workspaces/ -o build/
+    python -m cli compile a.xml b.json --watch
+    python -m cli convert a.xml b.json
+    python -m cli import-hotstrings abbrs.csv -o abbrs.ahk
+    python -m cli fetch-blockly-media
+"""
+import argparse
+import time
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from pysrc import compiler, optimizer, workspace_json
+from pysrc.models.block_bases import BlockBase
+from server import hotstring_import
+from server.ahk_func_library import AhkFuncLibrary
+
+AHK_FUNC_DIRPATH = Path(__file__).parent / 'ahk_funcs'
+# 白板檔案的副檔名: xml (Blockly xml) 或 json (Blockly 的 json 序列化格式)
+WORKSPACE_FILE_SUFFIXES = ('.xml', '.json')
+BLOCKLY_MEDIA_DIRPATH = Path(__file__).parent / 'static' / 'media'
+# Blockly 發行版的媒體檔 (精靈圖、音效、游標)
+BLOCKLY_MEDIA_FILENAMES = (
+    'sprites.png',
+    'sprites.svg',
+    *[
+        f'{sound_name}.{suffix}'
+        for sound_name in ('click', 'delete', 'disconnect')
+        for suffix in ('mp3', 'ogg', 'wav')
+    ],
+    'handopen.cur',
+    'handclosed.cur',
+    'handdelete.cur',
+)
+BLOCKLY_MEDIA_BASE_URL = 'https://blockly-demo.appspot.com/static/media/'
+
+
+def read_workspace_blocks(workspace_filepath: Path) -> List[BlockBase]:
+    """ 讀取白板檔案並建立積木實例
+
+    Args:
+        workspace_filepath (Path): 積木 xml 檔或 json 檔
+
+    Returns:
+        List[BlockBase]
+    """
+    workspace_str = workspace_filepath.read_text('utf-8')
+    if workspace_filepath.suffix.lower() == '.json':
+        return BlockBase.create_blocks_from_workspace_json(workspace_str)
+    return BlockBase.create_blocks_from_xml_str(workspace_str)
+
+
+class WorkspaceFile:
+    """ 已解析的積木 xml 檔: 保留積木實例、置頂程式碼與積木代碼，檔案未變動時不需重新解析 """
+
+    def __init__(
+            self,
+            stat_key: Tuple[int, int],
+            blocks: List[BlockBase],
+            run_as_admin: bool = False,
+            compile_options: Optional[compiler.CompileOptions] = None):
+        self.stat_key = stat_key
+        self.blocks = blocks
+        # 置頂程式碼含依白板選擇的執行期設定，因此每個檔案各自產生
+        self.header_ahkscr, self.block_ahkscr = compiler.compile_blocks(
+            blocks, run_as_admin, compile_options)
+        # 上次輸出時使用的函式庫版本
+        self.ahk_func_library_version: Optional[str] = None
+
+
+class WorkspaceBuilder:
+    """ 積木 xml 檔編譯器: 僅重新編譯有變動的檔案 """
+
+    def __init__(
+            self,
+            paths: List[Path],
+            ahk_func_library: AhkFuncLibrary,
+            out_dirpath: Optional[Path] = None,
+            run_as_admin: bool = False,
+            compile_options: Optional[compiler.CompileOptions] = None):
+        """ 積木 xml 檔編譯器
+
+        Args:
+            paths (List[Path]): 積木 xml 檔、json 檔或其所在目錄 (會遞迴尋找目錄中的 .xml、.json 檔)
+            ahk_func_library (AhkFuncLibrary): AHK 函式庫
+            out_dirpath (Optional[Path], optional): 輸出目錄，未設定時輸出至 xml 檔旁. Defaults to None.
+            run_as_admin (bool, optional): 是否使用管理員權限執行. Defaults to False.
+            compile_options (Optional[compiler.CompileOptions], optional): 命令列指定的編譯選項
+                (優先於白板的腳本設定積木). Defaults to None.
+        """
+        self.paths = paths
+        self.ahk_func_library = ahk_func_library
+        self.out_dirpath = out_dirpath
+        self.run_as_admin = run_as_admin
+        self.compile_options = compile_options
+        self._xml_filepath_mapping_workspace_file_dict: Dict[Path, WorkspaceFile] = {}
+
+    def _get_xml_filepath_mapping_ahk_filepath_dict(self) -> Dict[Path, Path]:
+        """ 獲取積木 xml 檔與輸出的 AHK 檔路徑字典 """
+        xml_filepath_mapping_ahk_filepath_dict = {}
+        for path in self.paths:
+            if path.is_dir():
+                xml_filepath_list = sorted(
+                    filepath for filepath in path.rglob('*')
+                    if filepath.suffix.lower() in WORKSPACE_FILE_SUFFIXES
+                )
+                root_dirpath = path
+            else:
+                xml_filepath_list = [path]
+                root_dirpath = path.parent
+            for xml_filepath in xml_filepath_list:
+                ahk_filepath = xml_filepath.with_suffix('.ahk')
+                if self.out_dirpath:
+                    ahk_filepath = self.out_dirpath / \
+                        ahk_filepath.relative_to(root_dirpath)
+                xml_filepath_mapping_ahk_filepath_dict[xml_filepath] = ahk_filepath
+        return xml_filepath_mapping_ahk_filepath_dict
+
+    def build(self) -> int:
+        """ 編譯有變動的積木 xml 檔 (或函式庫有變動時，重新附加函式腳本)
+
+        Returns:
+            int: 寫入的 AHK 檔數量
+        """
+        self.ahk_func_library.reload()
+        ahk_func_library_version = self.ahk_func_library.version
+        xml_filepath_mapping_ahk_filepath_dict = self._get_xml_filepath_mapping_ahk_filepath_dict()
+
+        # 移除已不存在的檔案
+        for xml_filepath in list(self._xml_filepath_mapping_workspace_file_dict):
+            if xml_filepath not in xml_filepath_mapping_ahk_filepath_dict:
+                del self._xml_filepath_mapping_workspace_file_dict[xml_filepath]
+
+        written_count = 0
+        for xml_filepath, ahk_filepath in xml_filepath_mapping_ahk_filepath_dict.items():
+            stat = xml_filepath.stat()
+            stat_key = (stat.st_mtime_ns, stat.st_size)
+            workspace_file = self._xml_filepath_mapping_workspace_file_dict.get(
+                xml_filepath)
+
+            # xml 檔有變動: 重新解析積木並編譯積木代碼
+            if workspace_file is None or workspace_file.stat_key != stat_key:
+                try:
+                    workspace_file = WorkspaceFile(
+                        stat_key,
+                        read_workspace_blocks(xml_filepath),
+                        self.run_as_admin,
+                        self.compile_options,
+                    )
+                except Exception as err:
+                    logger.error(f"{xml_filepath}: {type(err).__name__}: {err}")
+                    continue
+                self._xml_filepath_mapping_workspace_file_dict[xml_filepath] = workspace_file
+
+            # xml 檔與函式庫皆未變動: 不需重新輸出
+            elif workspace_file.ahk_func_library_version == ahk_func_library_version:
+                continue
+
+            ahkscr = compiler.link_ahkscr(
+                workspace_file.header_ahkscr,
+                workspace_file.block_ahkscr,
+                self.ahk_func_library.func_name_mapping_scr_dict,
+                self.ahk_func_library.get_funcs_script,
+            )
+            workspace_file.ahk_func_library_version = ahk_func_library_version
+            if ahk_filepath.exists() and ahk_filepath.read_text('utf-8-sig') == ahkscr:
+                continue
+            ahk_filepath.parent.mkdir(parents=True, exist_ok=True)
+            ahk_filepath.write_text(ahkscr, encoding='utf-8-sig')
+            logger.info(f"{xml_filepath} -> {ahk_filepath}")
+            written_count += 1
+        return written_count
+
+    def watch(self, poll_interval: float = 0.5):
+        """ 持續監看並編譯有變動的檔案 (Ctrl+C 結束)
+
+        Args:
+            poll_interval (float, optional): 輪詢間隔秒數. Defaults to 0.5.
+        """
+        logger.info("監看中... (Ctrl+C 結束)")
+        try:
+            while True:
+                time.sleep(poll_interval)
+                start_time = time.perf_counter()
+                if self.build():
+                    logger.info(
+                        f"重新編譯完成 ({(time.perf_counter() - start_time) * 1000:.0f} ms)")
+        except KeyboardInterrupt:
+            pass
+
+
+def parse_tuning_override(tuning_str: str) -> Tuple[str, Optional[str]]:
+    """ 解析自訂的執行期設定，如 `SetBatchLines=20ms`、`#UseHook=` (值為空表示不輸出該設定)
+
+    Args:
+        tuning_str (str)
+
+    Raises:
+        argparse.ArgumentTypeError: 格式錯誤或未知的設定名稱
+
+    Returns:
+        Tuple[str, Optional[str]]: (設定名稱, 值)
+    """
+    try:
+        return optimizer.parse_runtime_tuning_override(tuning_str)
+    except ValueError as err:
+        raise argparse.ArgumentTypeError(str(err))
+
+
+def compile_command(args: argparse.Namespace):
+    """ compile 子命令 """
+    workspace_builder = WorkspaceBuilder(
+        paths=args.paths,
+        ahk_func_library=AhkFuncLibrary(args.ahk_funcs_dir),
+        out_dirpath=args.out_dir,
+        run_as_admin=args.run_as_admin,
+        compile_options=compiler.CompileOptions(
+            hotstring_dispatch_threshold=args.hotstring_dispatch_threshold,
+            paste_text_min_length=args.paste_text_min_length,
+            precise_sleep=args.precise_sleep,
+            runtime_tuning=args.runtime_tuning,
+            runtime_tuning_overrides=dict(args.tuning) if args.tuning else None,
+        ),
+    )
+    start_time = time.perf_counter()
+    written_count = workspace_builder.build()
+    logger.info(
+        f"已編譯 {written_count} 個檔案 ({(time.perf_counter() - start_time) * 1000:.0f} ms)")
+    if args.watch:
+        workspace_builder.watch()
+
+
+def convert_command(args: argparse.Namespace):
+    """ convert 子命令: 積木 xml 檔與 json 檔無損互轉 (輸出至原檔案旁，副檔名互換) """
+    for filepath in args.paths:
+        if filepath.suffix.lower() == '.json':
+            out_filepath = filepath.with_suffix('.xml')
+            out_str = workspace_json.workspace_json_to_xml_str(filepath.read_text('utf-8'))
+        else:
+            out_filepath = filepath.with_suffix('.json')
+            out_str = workspace_json.dumps(
+                workspace_json.xml_str_to_workspace_json(
+                    filepath.read_text('utf-8'), keep_ids=not args.drop_ids),
+                indent=args.indent,
+            )
+        out_filepath.write_text(out_str, encoding='utf-8')
+        logger.info(f"{filepath} -> {out_filepath}")
+
+
+def import_hotstrings_command(args: argparse.Namespace):
+    """ import-hotstrings 子命令: 將 CSV/TSV 縮寫字典匯入成熱字串 (逐列讀取、逐段寫入) """
+    out_filepath: Path = args.out or args.path.with_suffix(f'.{args.format or "ahk"}')
+    output_format = args.format or out_filepath.suffix.lower().lstrip('.')
+    if output_format not in hotstring_import.OUTPUT_FORMATS:
+        output_format = 'ahk'
+    ahk_func_library = AhkFuncLibrary(args.ahk_funcs_dir)
+
+    start_time = time.perf_counter()
+    with open(args.path, encoding='utf-8-sig', newline='') as in_file, \
+            open(out_filepath, 'w', encoding='utf-8-sig' if output_format == 'ahk' else 'utf-8') as out_file:
+        for chunk in hotstring_import.iter_import_chunks(
+                in_file,
+                output_format=output_format,
+                delimiter=args.delimiter or hotstring_import.get_delimiter(args.path.name),
+                ahk_func_names=ahk_func_library.func_name_mapping_scr_dict,
+                get_ahk_funcs_script=ahk_func_library.get_funcs_script,
+                run_as_admin=args.run_as_admin):
+            out_file.write(chunk)
+    logger.info(
+        f"{args.path} -> {out_filepath} ({(time.perf_counter() - start_time) * 1000:.0f} ms)")
+
+
+def fetch_blockly_media_command(args: argparse.Namespace):
+    """ fetch-blockly-media 子命令: 下載 Blockly 發行版的媒體檔至本地的媒體目錄 (已存在的檔案不重新下載) """
+    args.out_dir.mkdir(parents=True, exist_ok=True)
+    for filename in BLOCKLY_MEDIA_FILENAMES:
+        out_filepath: Path = args.out_dir / filename
+        if out_filepath.exists() and not args.force:
+            continue
+        with urllib.request.urlopen(args.base_url + filename) as response:
+            out_filepath.write_bytes(response.read())
+        logger.info(f"{args.base_url + filename} -> {out_filepath}")
+
+
+def get_arg_parser() -> argparse.ArgumentParser:
+    """ 建立命令列參數解析器 """
+    arg_parser = argparse.ArgumentParser(prog='python -m cli')
+    subparsers = arg_parser.add_subparsers(dest='command', required=True)
+
+    compile_parser = subparsers.add_parser(
+        'compile', help='將積木 xml 檔 (或 json 檔) 編譯成 AHK 腳本')
+    compile_parser.add_argument(
+        'paths', type=Path, nargs='+', help='積木 xml 檔、json 檔或其所在目錄')
+    compile_parser.add_argument(
+        '-o', '--out-dir', type=Path, default=None, help='輸出目錄 (預設輸出至 xml 檔旁)')
+    compile_parser.add_argument(
+        '--ahk-funcs-dir', type=Path, default=AHK_FUNC_DIRPATH, help='AHK 函式目錄')
+    compile_parser.add_argument(
+        '--run-as-admin', action='store_true', help='使用管理員權限執行')
+    compile_parser.add_argument(
+        '--watch', action='store_true', help='持續監看並重新編譯有變動的檔案')
+    compile_parser.add_argument(
+        '--hotstring-dispatch-threshold', type=int, default=None,
+        help='熱字串數量達到此門檻時，改以單一 InputHook 的熱字串分派器處理 (適用於大型縮寫字典；'
+        '未指定時依白板的腳本設定積木，0 表示不使用)')
+    compile_parser.add_argument(
+        '--paste-text-min-length', type=int, default=None,
+        help=f'送出的文字長度達到此門檻時，改為經由剪貼簿貼上 (會暫時覆蓋剪貼簿，建議 {optimizer.PASTE_TEXT_MIN_LENGTH}；'
+        '未指定時依白板的腳本設定積木，0 表示一律逐字送出)')
+    compile_parser.add_argument(
+        '--precise-sleep', action='store_true', default=None,
+        help='所有等待皆使用精確等待 (不受系統計時器約 10~15.6 毫秒的間隔限制，適用於需要短等待的巨集；'
+        '未指定時依白板的腳本設定積木)')
+    compile_parser.add_argument(
+        '--runtime-tuning', action='store_true', default=None,
+        help='依工作負載於置頂程式碼加入執行期設定 (SetBatchLines、ListLines、#KeyHistory、#MaxHotkeysPerInterval、#UseHook；'
+        '未指定時依白板的腳本設定積木)')
+    compile_parser.add_argument(
+        '--no-runtime-tuning', action='store_false', dest='runtime_tuning',
+        help='不依工作負載加入執行期設定 (覆蓋白板的腳本設定積木)')
+    compile_parser.add_argument(
+        '--tuning', action='append', type=parse_tuning_override, metavar='NAME=VALUE',
+        help='自訂執行期設定，覆蓋依工作負載選擇的設定與白板的自訂設定 (可重複指定；值為空表示不輸出)，如 --tuning SetBatchLines=20ms')
+    compile_parser.set_defaults(func=compile_command)
+
+    convert_parser = subparsers.add_parser(
+        'convert', help='積木 xml 檔與 json 檔互轉')
+    convert_parser.add_argument(
+        'paths', type=Path, nargs='+', help='積木 xml 檔或 json 檔')
+    convert_parser.add_argument(
+        '--drop-ids', action='store_true', help='不保留積木 id (輸出較精簡)')
+    convert_parser.add_argument(
+        '--indent', type=int, default=None, help='json 縮排空白數 (預設不縮排)')
+    convert_parser.set_defaults(func=convert_command)
+
+    import_hotstrings_parser = subparsers.add_parser(
+        'import-hotstrings', help='將 CSV/TSV 縮寫字典匯入成熱字串 (AHK 腳本或白板 xml/json 檔)')
+    import_hotstrings_parser.add_argument(
+        'path', type=Path, help='縮寫字典檔 (欄位: 縮寫、展開文字，與選填的熱字串設定)')
+    import_hotstrings_parser.add_argument(
+        '-o', '--out', type=Path, default=None, help='輸出檔案 (預設輸出至字典檔旁)')
+    import_hotstrings_parser.add_argument(
+        '--format', choices=hotstring_import.OUTPUT_FORMATS, default=None,
+        help='輸出格式 (預設依輸出檔副檔名，否則為 ahk)')
+    import_hotstrings_parser.add_argument(
+        '--delimiter', default=None, help='欄位分隔符號 (預設依副檔名: .tsv 為定位字元，其餘為逗號)')
+    import_hotstrings_parser.add_argument(
+        '--ahk-funcs-dir', type=Path, default=AHK_FUNC_DIRPATH, help='AHK 函式目錄')
+    import_hotstrings_parser.add_argument(
+        '--run-as-admin', action='store_true', help='使用管理員權限執行')
+    import_hotstrings_parser.set_defaults(func=import_hotstrings_command)
+
+    fetch_blockly_media_parser = subparsers.add_parser(
+        'fetch-blockly-media', help='下載 Blockly 的媒體檔 (精靈圖、音效、游標) 至本地的媒體目錄')
+    fetch_blockly_media_parser.add_argument(
+        '-o', '--out-dir', type=Path, default=BLOCKLY_MEDIA_DIRPATH, help='媒體目錄')
+    fetch_blockly_media_parser.add_argument(
+        '--base-url', default=BLOCKLY_MEDIA_BASE_URL, help='Blockly 媒體目錄網址 (需與使用的 Blockly 版本相符)')
+    fetch_blockly_media_parser.add_argument(
+        '--force', action='store_true', help='重新下載已存在的檔案')
+    fetch_blockly_media_parser.set_defaults(func=fetch_blockly_media_command)
+
+    return arg_parser
+
+
+def main(argv: Optional[List[str]] = None):
+    args = get_arg_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
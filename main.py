@@ -1,9 +1,10 @@
 from threading import Timer
 import tempfile
+import io
 import subprocess
 import time
 import json
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, Union
 from pydantic import BaseModel
 from pathlib import Path
 from loguru import logger
@@ -11,8 +12,9 @@ from fastapi import (
     FastAPI,
     Request,
     BackgroundTasks,
+    HTTPException,
 )
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse
@@ -20,12 +22,29 @@ from fastapi.templating import Jinja2Templates
 from pydantic.types import FilePath
 
 from utils import AHK_PROCESS_PID_FILENAME
+from pysrc import compiler, optimizer, workspace_json
+from server.precache import PrecacheManifest
+from server.static_files import CachedStaticFiles
+from server.ahk_func_library import AhkFuncLibrary
+from server.batch_compile import BatchCompiler
+from server.compile_cache import CompileCache, get_block_definition_version
+from server import hotstring_import
 
 
 class Config(BaseModel):
     host: str = "127.0.0.1"
     port: int
     ahk_exe_filepath: FilePath
+    # Blockly 媒體檔 (精靈圖、音效) 路徑，預設使用本地的 static/media/
+    blockly_media_path: str = "static/media/"
+    # 是否啟用 Blockly 音效 (啟用後會於載入時下載音效檔)
+    blockly_sounds: bool = False
+    # 是否以 #Include 引入 AHK 函式 (函式檔案寫入至 AHK 主程式旁的 ahk_funcs 目錄)，否則將函式內容直接附加至腳本
+    ahk_funcs_as_include: bool = False
+
+    def ahk_funcs_include_dirpath(self) -> Path:
+        """ 以 #Include 引入時，AHK 函式檔案的存放目錄 """
+        return Path(self.ahk_exe_filepath).parent / 'ahk_funcs'
 
     def endpoint(self):
         return f"http://{self.host}:{self.port}"
@@ -44,15 +63,21 @@ class Config(BaseModel):
         # 並於數秒後刪除腳本檔案
         Timer(5, Path(ahk_filepath).unlink, None).start()
 
-    def run_ahk_script(self, ahk_script: str):
-        """ 執行 AHK 腳本字串
+    def run_ahk_script(self, ahk_script: Union[str, Iterable[str]]):
+        """ 執行 AHK 腳本字串 (或依序產出的腳本段落，如 `BatchCompiler.iter_compile_xml_str`，逐段寫入腳本檔案)
         """
         # 產生臨時 AHK 腳本檔案
         ahk_file = tempfile.NamedTemporaryFile(
             prefix='ahk_script_', suffix='.ahk', delete=False
         )
+        ahk_file.close()
         ahk_file = Path(ahk_file.name)
-        ahk_file.write_text(ahk_script, encoding='utf-8-sig')
+        with open(ahk_file, 'w', encoding='utf-8-sig') as f:
+            if isinstance(ahk_script, str):
+                f.write(ahk_script)
+            else:
+                for ahk_script_chunk in ahk_script:
+                    f.write(ahk_script_chunk)
 
         # 執行腳本
         self._run_ahk_file(ahk_file)
@@ -90,6 +115,42 @@ class App(FastAPI):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.config = Config.get()
+        # AHK 函式庫 (ahk_funcs 目錄): 於背景監看檔案變動並重新載入
+        self.ahk_func_library = AhkFuncLibrary(
+            Path(__file__).parent / 'ahk_funcs'
+        )
+        # 編譯快取: 積木定義或函式庫版本變動時自動清空
+        self.compile_cache = CompileCache(
+            get_version=lambda: f"{get_block_definition_version()}:{self.ahk_func_library.version}",
+        )
+        # 編譯器: 單一白板於本進程編譯，批次編譯則於子進程池中平行執行
+        self.batch_compiler = BatchCompiler(
+            get_ahk_func_name_list=lambda: list(
+                self.AHK_FUNC_NAME_MAPPING_SCR_DICT.keys()),
+            get_ahk_funcs_script=self.get_ahk_funcs_script,
+            compile_cache=self.compile_cache,
+        )
+
+    @property
+    def AHK_FUNC_NAME_MAPPING_SCR_DICT(self) -> Dict[str, str]:
+        """ AHK 函式名稱與腳本內容字典 (函式庫重新載入時會整體替換，取用一次即為一致的版本) """
+        return self.ahk_func_library.func_name_mapping_scr_dict
+
+    def get_ahk_funcs_script(self, ahk_func_names: Iterable[str]) -> str:
+        """ 獲取 AHK 函式腳本 (含相依函式)，若設定以 #Include 引入函式，則回傳引入函式檔案的腳本
+
+        Args:
+            ahk_func_names (Iterable[str])
+
+        Returns:
+            str
+        """
+        if self.config.ahk_funcs_as_include:
+            return self.ahk_func_library.get_funcs_include_script(
+                ahk_func_names,
+                include_dirpath=self.config.ahk_funcs_include_dirpath(),
+            )
+        return self.ahk_func_library.get_funcs_script(ahk_func_names)
 
 
 # 建立 app 實例
@@ -106,22 +167,78 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 設定前端文件:靜態文件與HTML檔
+# 設定前端文件:靜態文件與HTML檔 (Blockly 媒體檔不常變動，附帶快取標頭；
+# 媒體檔以 `python -m cli fetch-blockly-media` 下載至 static/media/)
+app.mount("/static/media", CachedStaticFiles(directory="static/media"), name="media")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 app.mount("/pysrc", StaticFiles(directory="pysrc"), name="pysrc")
 app.mount("/utils", StaticFiles(directory="utils"), name="utils")
 templates = Jinja2Templates(directory="templates")
 
-# 設定 app 全域變數: AHK 函式名稱與腳本內容字典
-ahk_func_dirpath = Path(__file__).parent / 'ahk_funcs'
-app.AHK_FUNC_NAME_MAPPING_SCR_DICT = {
-    f.stem: f.read_text('utf-8') for f in ahk_func_dirpath.glob('*.ahk')
-}
+
+@app.on_event("startup")
+def start_watching_ahk_func_library():
+    """ 啟動 AHK 函式庫監看 """
+    app.ahk_func_library.start_watching()
+
+
+@app.on_event("shutdown")
+def stop_watching_ahk_func_library():
+    """ 停止 AHK 函式庫監看 """
+    app.ahk_func_library.stop_watching()
+
+
+@app.on_event("shutdown")
+def shutdown_batch_compiler():
+    """ 關閉批次編譯的子進程池 """
+    app.batch_compiler.shutdown()
+
+
+# 設定 app 全域變數: Service Worker 預快取清單 (編輯器外殼)
+app.precache_manifest = PrecacheManifest(
+    root_dirpath=Path(__file__).parent,
+    page_url_mapping_filepath_dict={
+        "/": "templates/index.html",
+    },
+    static_glob_patterns=[
+        "static/js/dependent/brython.min.js",
+        "static/js/dependent/brython_stdlib.min.js",
+        "static/js/dependent/blockly_compressed.js",
+        "static/js/dependent/blocks_compressed.js",
+        "static/js/dependent/zh_tw.js",
+        "static/js/utils.js",
+        "static/css/*.css",
+        "static/media/*",
+        "pysrc/**/*.py",
+        "utils/**/*.py",
+    ],
+)
 
 
 @app.get("/", response_class=HTMLResponse, tags=['HTML頁面'])
 async def root_page(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    return templates.TemplateResponse("index.html", {
+        "request": request,
+        "blockly_media_path": app.config.blockly_media_path,
+        "blockly_sounds": app.config.blockly_sounds,
+    })
+
+
+@app.get("/sw.js", include_in_schema=False)
+async def service_worker():
+    """ Service Worker 腳本 (需置於根路徑下才能控制整個網站) """
+    return FileResponse(
+        Path(__file__).parent / 'static/js/sw.js',
+        media_type='application/javascript',
+        headers={'Cache-Control': 'no-cache'},
+    )
+
+
+@app.get("/api/precache_manifest")
+async def get_precache_manifest():
+    """ 獲取 Service Worker 預快取清單 (版本雜湊與網址列表)
+    """
+    return app.precache_manifest.get()
 
 
 class RunAhkscrPost(BaseModel):
@@ -159,27 +276,214 @@ async def get_ahk_funcions():
     return list(app.AHK_FUNC_NAME_MAPPING_SCR_DICT.keys())
 
 
+@app.get("/api/ahk_funcs_version")
+async def get_ahk_funcions_version():
+    """ 獲取 AHK 函式庫版本 (函式檔案內容變動時改變，可用於清除前端快取)
+    """
+    return {"version": app.ahk_func_library.version}
+
+
 @app.get('/api/ahk_funcs_script', response_model=str)
 async def get_ahk_funcions_script(ahk_func_names: str):
-    """ 獲取 AHK 函式腳本
+    """ 獲取 AHK 函式腳本 (含相依函式)
+    """
+    return app.get_ahk_funcs_script(ahk_func_names.split(','))
+
+
+class CompileOptionsPost(BaseModel):
+    # 編譯選項: 未指定 (None) 時依白板的腳本設定積木，指定時優先於腳本設定積木
+    # 熱字串數量達到此門檻時改用熱字串分派器 (0 表示不使用)
+    hotstring_dispatch_threshold: Optional[int] = None
+    # 送出的常數文字長度達到此門檻時改為經由剪貼簿貼上 (會暫時覆蓋剪貼簿；0 表示一律逐字送出)
+    paste_text_min_length: Optional[int] = None
+    # 是否將所有等待改為精確等待
+    precise_sleep: Optional[bool] = None
+    # 是否依工作負載於置頂程式碼加入執行期設定 (SetBatchLines、ListLines、#KeyHistory 等)
+    runtime_tuning: Optional[bool] = None
+    # 自訂的執行期設定，如 {"SetBatchLines": "20ms", "#UseHook": null} (null 表示不輸出該設定)
+    runtime_tuning_overrides: Optional[Dict[str, Optional[str]]] = None
+
+    def get_compile_options(self) -> compiler.CompileOptions:
+        """ 獲取編譯選項 """
+        unknown_tuning_name_list = [
+            name for name in self.runtime_tuning_overrides or {}
+            if name not in optimizer.RUNTIME_TUNING_NAMES
+        ]
+        if unknown_tuning_name_list:
+            raise HTTPException(
+                status_code=422,
+                detail=f"未知的執行期設定: {', '.join(unknown_tuning_name_list)} "
+                f"(可用: {', '.join(optimizer.RUNTIME_TUNING_NAMES)})",
+            )
+        return compiler.CompileOptions(
+            hotstring_dispatch_threshold=self.hotstring_dispatch_threshold,
+            paste_text_min_length=self.paste_text_min_length,
+            precise_sleep=self.precise_sleep,
+            runtime_tuning=self.runtime_tuning,
+            runtime_tuning_overrides=self.runtime_tuning_overrides,
+        )
+
+
+class CompilePost(CompileOptionsPost):
+    # 白板的 xml 字串 (舊格式)
+    xml_str: Optional[str] = None
+    # 白板的 json 字典 (Blockly 的 json 序列化格式，較 xml 精簡且不需解析 DOM)
+    workspace_json: Optional[dict] = None
+    # 是否使用管理員權限執行
+    run_as_admin: bool = False
+
+    def get_workspace(self) -> Union[str, dict]:
+        """ 獲取白板 (json 字典優先) """
+        if self.workspace_json is not None:
+            return self.workspace_json
+        if self.xml_str is not None:
+            return self.xml_str
+        raise HTTPException(status_code=422, detail="需提供 xml_str 或 workspace_json")
+
+
+@app.post("/api/compile", response_model=str)
+def compile_xml_str(compilePost: CompilePost):
+    """ 編譯白板 xml 字串或 json 字典 (相同內容的白板會直接回傳快取的腳本)
+    """
+    return app.batch_compiler.compile_xml_str(
+        compilePost.get_workspace(),
+        run_as_admin=compilePost.run_as_admin,
+        compile_options=compilePost.get_compile_options(),
+    )
+
+
+class CompileStreamPost(CompilePost):
+    # 是否執行整個程式的最佳化 (模式設定提升、共用動作)；否則解析白板後即開始串流，逐一編譯積木
+    whole_program: bool = True
+
+
+@app.post("/api/compile/stream")
+def compile_xml_str_stream(compilePost: CompileStreamPost):
+    """ 編譯白板 xml 字串或 json 字典，並以分塊傳輸依序串流腳本段落: 置頂程式碼、各頂層積木的代碼段落、函式腳本
+    (適用於大型白板: 不需等待整個腳本組合完成即可收到第一段；已快取的白板直接回傳快取的腳本)
+
+    預設執行整個程式的最佳化，需先降階並最佳化所有積木才開始串流 (內容同 `/api/compile`)；
+    whole_program 為 false 且未啟用依工作負載的執行期設定與熱字串分派器時，解析白板後即開始串流，
+    並逐一降階、最佳化積木 (不提升模式設定、不共用動作)
+    """
+    return StreamingResponse(
+        app.batch_compiler.iter_compile_xml_str(
+            compilePost.get_workspace(),
+            run_as_admin=compilePost.run_as_admin,
+            compile_options=compilePost.get_compile_options(),
+            whole_program=compilePost.whole_program,
+        ),
+        media_type="text/plain; charset=utf-8",
+    )
+
+
+@app.post("/api/compile/run")
+async def compile_and_run(compilePost: CompilePost, background_tasks: BackgroundTasks):
+    """ 編譯白板並直接執行: 腳本段落逐段寫入腳本檔案後執行 (不需將腳本傳回瀏覽器再送回伺服器)
+    """
+    workspace = compilePost.get_workspace()
+    compile_options = compilePost.get_compile_options()
+
+    def _run():
+        # 終止先前的腳本
+        app.config.stop_ahk_script()
+        app.config.run_ahk_script(app.batch_compiler.iter_compile_xml_str(
+            workspace,
+            run_as_admin=compilePost.run_as_admin,
+            compile_options=compile_options,
+        ))
+
+    background_tasks.add_task(_run)
+    return
+
+
+@app.post("/api/compile/profile")
+def profile_compile(compilePost: CompilePost):
+    """ 編譯白板並回傳效能分析報告: 白板各編譯階段的耗時，與各積木類的實例化、產生 AHK 代碼與序列化的
+    呼叫次數、累計時間與自身時間 (依自身時間排序，不使用編譯快取)
     """
-    # 根據提供的函式名稱列表獲取腳本字串
-    ahk_func_name_set = set(ahk_func_names.split(','))
-    ahk_func_script_list = [
-        app.AHK_FUNC_NAME_MAPPING_SCR_DICT[func_name] for func_name in ahk_func_name_set
-        if func_name in app.AHK_FUNC_NAME_MAPPING_SCR_DICT
-    ]
-    ahk_func_script = '\n\n'.join(ahk_func_script_list)
-
-    # 分析函數列表的腳本內容，若有提到新的函式名稱，則添加到腳本列表中
-    used_ahk_func_name_set = set(
-        func_name for func_name in (await get_ahk_funcions())
-        if f"{func_name}(" in ahk_func_script
+    return app.batch_compiler.profile(
+        compilePost.get_workspace(),
+        compile_options=compilePost.get_compile_options(),
     )
-    if len(used_ahk_func_name_set) > len(ahk_func_name_set):
-        return await get_ahk_funcions_script(','.join(used_ahk_func_name_set))
 
-    return ahk_func_script
+
+class WorkspaceConvertPost(BaseModel):
+    # 白板的 xml 字串 (轉換成 json 字典)
+    xml_str: Optional[str] = None
+    # 白板的 json 字典 (轉換成 xml 字串)
+    workspace_json: Optional[dict] = None
+
+
+@app.post("/api/workspace/convert")
+def convert_workspace(workspaceConvertPost: WorkspaceConvertPost):
+    """ 白板 xml 字串與 json 字典無損互轉 (用於轉換舊的 xml 檔)
+    """
+    if workspaceConvertPost.xml_str is not None:
+        return {"workspace_json": workspace_json.xml_str_to_workspace_json(workspaceConvertPost.xml_str)}
+    if workspaceConvertPost.workspace_json is not None:
+        return {"xml_str": workspace_json.workspace_json_to_xml_str(workspaceConvertPost.workspace_json)}
+    raise HTTPException(status_code=422, detail="需提供 xml_str 或 workspace_json")
+
+
+@app.post("/api/hotstrings/import")
+async def import_hotstrings(
+        request: Request,
+        output_format: str = 'ahk',
+        delimiter: str = ',',
+        run_as_admin: bool = False):
+    """ 將 CSV/TSV 縮寫字典 (請求內容為字典檔文字) 匯入成熱字串，逐列處理並串流輸出 AHK 腳本或白板 xml/json 字串
+
+    字典檔的欄位依序為縮寫、展開文字，與選填的熱字串設定 (case_sensitive、in_words、immediately、contain_ending_character)；
+    第一列含 abbr 與 text 時視為欄位名稱列
+    """
+    if output_format not in hotstring_import.OUTPUT_FORMATS:
+        raise HTTPException(
+            status_code=422, detail=f"output_format 需為 {', '.join(hotstring_import.OUTPUT_FORMATS)}")
+    dict_str = (await request.body()).decode('utf-8-sig')
+    return StreamingResponse(
+        hotstring_import.iter_import_chunks(
+            io.StringIO(dict_str, newline=''),
+            output_format=output_format,
+            delimiter=delimiter,
+            ahk_func_names=app.AHK_FUNC_NAME_MAPPING_SCR_DICT,
+            get_ahk_funcs_script=app.get_ahk_funcs_script,
+            run_as_admin=run_as_admin,
+        ),
+        media_type=hotstring_import.OUTPUT_FORMAT_MAPPING_MEDIA_TYPE_DICT[output_format],
+    )
+
+
+@app.get("/api/compile/cache_stats")
+async def get_compile_cache_stats():
+    """ 獲取編譯快取統計 (項目數、總字元數、命中/未命中次數)
+    """
+    return app.compile_cache.get_stats()
+
+
+class BatchCompilePost(CompileOptionsPost):
+    # 白板的 xml 字串或 json 字典列表
+    xml_strs: List[Union[str, dict]]
+    # 是否使用管理員權限執行
+    run_as_admin: bool = False
+
+
+@app.post("/api/compile/batch")
+async def compile_batch(batchCompilePost: BatchCompilePost):
+    """ 批次編譯白板 xml 字串或 json 字典，以 NDJSON 依完成順序逐行回傳結果
+    (每行為 {"index": 序號, "ahkscr": AHK 腳本} 或 {"index": 序號, "error": 錯誤訊息})
+    """
+    return StreamingResponse(
+        (
+            json.dumps(result, ensure_ascii=False) + "\n"
+            for result in app.batch_compiler.compile(
+                batchCompilePost.xml_strs,
+                run_as_admin=batchCompilePost.run_as_admin,
+                compile_options=batchCompilePost.get_compile_options(),
+            )
+        ),
+        media_type="application/x-ndjson",
+    )
 
 
 def main():
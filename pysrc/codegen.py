@@ -0,0 +1,192 @@
+"""
+AHK 代碼產生器: 將 IR (`pysrc.ir`) 轉換成 AHK 代碼
+"""
+from typing import Iterator, List, Optional, Union
+
+from pysrc import ir
+from pysrc.utils import TAB4_INDENT
+
+# 運算元不需加上括號的優先順序 (字面值、函式呼叫)
+ATOM_PRECEDENCE = 10
+# 負數作為運算元時一律加上括號 (避免產生 `2--3`)
+NEGATIVE_NUMBER_PRECEDENCE = 0
+
+
+def get_precedence(expr: ir.Expr) -> int:
+    """ 獲取運算式的優先順序
+
+    Args:
+        expr (ir.Expr)
+
+    Returns:
+        int
+    """
+    if isinstance(expr, ir.BinaryOp):
+        return ir.BinaryOp.OP_MAPPING_PRECEDENCE_DICT[expr.op]
+    if isinstance(expr, ir.Number):
+        return NEGATIVE_NUMBER_PRECEDENCE if expr.text.lstrip().startswith('-') else ATOM_PRECEDENCE
+    if isinstance(expr, ir.Raw) and not expr.atomic:
+        return 0
+    return ATOM_PRECEDENCE
+
+
+def need_parens(parent: ir.BinaryOp, child: ir.Expr, is_right: bool) -> bool:
+    """ 判斷子運算式作為運算元時是否需要加上括號
+
+    Args:
+        parent (ir.BinaryOp): 上層運算
+        child (ir.Expr): 子運算式
+        is_right (bool): 是否為右運算元
+
+    Returns:
+        bool
+    """
+    parent_precedence = get_precedence(parent)
+    child_precedence = get_precedence(child)
+    if child_precedence != parent_precedence:
+        return child_precedence < parent_precedence
+    # 優先順序相同時: `**` 為右結合，其餘為左結合
+    return is_right != (parent.op == '**')
+
+
+def expr_to_ahkscr(expr: Optional[ir.Expr]) -> str:
+    """ 運算式轉換成 AHK 代碼 (以工作堆疊取代遞迴，很深的巢狀運算式也不會超過遞迴上限)
+
+    Args:
+        expr (Optional[ir.Expr]): None 表示空的運算式
+
+    Returns:
+        str
+    """
+    ahkscr_buffer: List[str] = []
+    work_stack: List[Union[str, ir.Expr, None]] = [expr]
+    while work_stack:
+        work = work_stack.pop()
+        if work is None:
+            continue
+        if isinstance(work, str):
+            ahkscr_buffer.append(work)
+        elif isinstance(work, ir.Number):
+            ahkscr_buffer.append(work.text)
+        elif isinstance(work, ir.String):
+            ahkscr_buffer.append(f'"{work.value}"')
+        elif isinstance(work, ir.Raw):
+            ahkscr_buffer.append(work.text)
+        elif isinstance(work, ir.BinaryOp):
+            sub_work_list = []
+            for operand, is_right in [(work.left, False), (work.right, True)]:
+                if is_right:
+                    sub_work_list.append(' . ' if work.op == '.' else work.op)
+                if need_parens(work, operand, is_right):
+                    sub_work_list.extend(['(', operand, ')'])
+                else:
+                    sub_work_list.append(operand)
+            work_stack.extend(reversed(sub_work_list))
+        elif isinstance(work, ir.Call):
+            sub_work_list = [f"{work.func_name}("]
+            for arg_i, arg in enumerate(work.args):
+                if arg_i:
+                    sub_work_list.append(', ')
+                sub_work_list.append(arg)
+            sub_work_list.append(')')
+            work_stack.extend(reversed(sub_work_list))
+        else:
+            raise TypeError(f"未知的運算式節點: {type(work).__name__}")
+    return ''.join(ahkscr_buffer)
+
+
+def stmt_to_ahkscr(stmt: ir.Stmt) -> str:
+    """ 陳述式轉換成一行 AHK 代碼
+
+    Args:
+        stmt (ir.Stmt)
+
+    Returns:
+        str
+    """
+    if isinstance(stmt, ir.Command):
+        com_ahkscr = stmt.name
+        for arg_i, arg in enumerate(stmt.args):
+            is_expr = arg is None or isinstance(arg, ir.Expr)
+            # 第一個參數若為運算式，命令名稱後可省略逗號 (如 `Msgbox % "Hi"`)
+            if arg_i or not is_expr:
+                com_ahkscr += ','
+            com_ahkscr += f" % {expr_to_ahkscr(arg)}" if is_expr else f" {arg}"
+    elif isinstance(stmt, ir.Assign):
+        com_ahkscr = f"{stmt.var_name} := {expr_to_ahkscr(stmt.expr)}"
+    elif isinstance(stmt, ir.CallStatement):
+        com_ahkscr = expr_to_ahkscr(stmt.call)
+    elif isinstance(stmt, ir.RawStatement):
+        com_ahkscr = stmt.text
+    else:
+        raise TypeError(f"未知的陳述式節點: {type(stmt).__name__}")
+    return ";"*stmt.disabled + com_ahkscr
+
+
+def body_to_ahkscr(body: List[ir.Stmt], one_line: bool = True) -> str:
+    """ 熱鍵/熱字串的執行陳述式轉換成 AHK 代碼
+
+    Args:
+        body (List[ir.Stmt])
+        one_line (bool, optional): 只有一行陳述式時是否直接接在 `::` 之後. Defaults to True.
+
+    Returns:
+        str: 單行時為 ` 陳述式`，多行時為縮排的陳述式並於結尾加上 Return
+    """
+    line_list = [stmt_to_ahkscr(stmt) for stmt in body]
+    if one_line and len(line_list) == 1:
+        return f" {line_list[0]}"
+    return ''.join(
+        f"\n{TAB4_INDENT}{line}" for line in line_list + ["Return"]
+    )
+
+
+def top_level_to_ahkscr(item: ir.TopLevel) -> str:
+    """ 頂層項目轉換成 AHK 代碼段落
+
+    Args:
+        item (ir.TopLevel)
+
+    Returns:
+        str
+    """
+    if isinstance(item, ir.Hotkey):
+        com_ahkscr = f"{item.key}::{body_to_ahkscr(item.body)}"
+    elif isinstance(item, ir.Hotstring):
+        com_ahkscr = f":{item.options}:{item.abbr}::{{TEXT}}{item.text}"
+    elif isinstance(item, ir.HotstringAction):
+        com_ahkscr = f":{item.options}:{item.abbr}::{body_to_ahkscr(item.body, one_line=False)}"
+    elif isinstance(item, ir.Label):
+        com_ahkscr = f"{item.name}:{body_to_ahkscr(item.body, one_line=False)}"
+    elif isinstance(item, ir.Sequence):
+        com_ahkscr = "\n".join(stmt_to_ahkscr(stmt) for stmt in item.body)
+    else:
+        raise TypeError(f"未知的頂層節點: {type(item).__name__}")
+    return ";"*item.disabled + com_ahkscr
+
+
+def iter_program_ahkscr(program: ir.Program) -> Iterator[str]:
+    """ 依序產生程式中各頂層項目的 AHK 代碼段落 (略過沒有代碼的項目)
+
+    Args:
+        program (ir.Program)
+
+    Yields:
+        str
+    """
+    for item in program.items:
+        item_ahkscr = top_level_to_ahkscr(item)
+        if item_ahkscr:
+            yield item_ahkscr
+
+
+def program_to_ahkscr(program: ir.Program) -> str:
+    """ 程式轉換成 AHK 代碼
+
+    Args:
+        program (ir.Program)
+
+    Returns:
+        str: 不同頂層項目的 AHK 代碼段落之間隔一行空白
+    """
+    return "\n\n".join(iter_program_ahkscr(program))
@@ -0,0 +1,498 @@
+"""
+積木 AHK 編譯 (瀏覽器與伺服器端共用): 將積木 xml 字串編譯成 AHK 腳本
+"""
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
+
+from utils import AHK_PROCESS_PID_FILENAME
+from pysrc import codegen, ir, optimizer
+from pysrc.models.block_bases import (
+    BlockBase,
+    ObjectBlockBase,
+    SettingBlockBase,
+)
+from pysrc.models.blocks import ScriptSettingBlock
+
+# 動態引入所有積木類，以便自 xml 字串建立積木實例
+BlockBase.import_block_classes()
+
+
+class CompileOptions(NamedTuple):
+    """ 編譯選項: 由白板的腳本設定積木或編譯請求指定 (見 `get_compile_options`)，None 表示未指定 (不啟用) """
+    # 熱字串數量達到此門檻時改用熱字串分派器 (見 `optimizer.dispatch_hotstrings`；0 表示不使用)
+    hotstring_dispatch_threshold: Optional[int] = None
+    # 送出的常數文字長度達到此門檻時改為經由剪貼簿貼上 (見 `optimizer.paste_long_texts`；0 表示一律逐字送出)
+    paste_text_min_length: Optional[int] = None
+    # 是否將所有等待改為精確等待 (見 `optimizer.use_precise_sleeps`；個別的等待積木可勾選精確等待)
+    precise_sleep: Optional[bool] = None
+    # 是否依工作負載選擇執行期設定，由置頂程式碼輸出 (見 `optimizer.select_runtime_tuning`)
+    runtime_tuning: Optional[bool] = None
+    # 自訂的執行期設定，如 {"SetBatchLines": "20ms", "#UseHook": None} (None 表示不輸出該設定)
+    runtime_tuning_overrides: Optional[Dict[str, Optional[str]]] = None
+
+    def get_optimize_kwargs(self) -> dict:
+        """ 取得 `optimizer.optimize_program` 的關鍵字參數 (未指定的選項皆不啟用)
+
+        Returns:
+            dict
+        """
+        return dict(
+            hotstring_dispatch_threshold=self.hotstring_dispatch_threshold or None,
+            paste_text_min_length=self.paste_text_min_length or None,
+            precise_sleep=bool(self.precise_sleep),
+        )
+
+
+def get_compile_options(blocks: Iterable[BlockBase], compile_options: Optional[CompileOptions] = None) -> CompileOptions:
+    """ 取得白板的編譯選項: 白板上的腳本設定積木 (有多個時以第一個為準)，再套用編譯請求指定的選項
+
+    Args:
+        blocks (Iterable[BlockBase]): 白板上的積木
+        compile_options (Optional[CompileOptions], optional): 編譯請求指定的選項 (優先於腳本設定積木). Defaults to None.
+
+    Returns:
+        CompileOptions
+    """
+    com_compile_options = CompileOptions()
+    for block in blocks:
+        if isinstance(block, ScriptSettingBlock):
+            com_compile_options = CompileOptions(**block.get_compile_option_dict())
+            break
+    if compile_options is None:
+        return com_compile_options
+    return com_compile_options._replace(**{
+        option_name: option_value
+        for option_name, option_value in compile_options._asdict().items()
+        if option_value is not None
+    })
+
+
+def get_header_ahkscr(run_as_admin: bool = False, runtime_tuning_dict: Optional[Dict[str, str]] = None) -> str:
+    """ 取得 AHK 置頂程式碼: 腳本設定
+
+    Args:
+        run_as_admin (bool, optional): 是否使用管理員權限執行. Defaults to False.
+        runtime_tuning_dict (Optional[Dict[str, str]], optional): 執行期設定名稱與其值字典
+            (見 `optimizer.select_runtime_tuning`). Defaults to None.
+
+    Returns:
+        str
+    """
+    return "\n".join([
+        "#SingleInstance, Force",
+        "#NoEnv",
+        "SendMode Input",
+        "SetWorkingDir, %A_ScriptDir%",
+        f'pid_filepath:=A_Temp . "/{AHK_PROCESS_PID_FILENAME}.txt"',
+        'FileDelete % pid_filepath',
+        'FileAppend, % DllCall("GetCurrentProcessId"), %pid_filepath%',
+        *[
+            f"{name} {value}".rstrip()
+            for name, value in (runtime_tuning_dict or {}).items()
+        ],
+        "SwitchToAdmin()"*run_as_admin,
+        "\n",
+    ])
+
+
+def get_blocks_ahkscr(xml_str: str) -> str:
+    """ 將 xml 字串解析成多個積木，再逐一取得積木 AHK 代碼
+
+    Args:
+        xml_str (str): 白板的 xml 字串
+
+    Returns:
+        str: 不同積木的 AHK 代碼段落之間隔一行空白
+    """
+    return blocks_to_ahkscr(BlockBase.create_blocks_from_xml_str(xml_str))
+
+
+def get_blocks_ahkscr_from_workspace_json(workspace_json: Union[str, dict]) -> str:
+    """ 將白板的 json 字典 (Blockly 的 json 序列化格式) 解析成多個積木，再逐一取得積木 AHK 代碼
+
+    Args:
+        workspace_json (Union[str, dict]): 白板的 json 字典或 json 字串
+
+    Returns:
+        str: 不同積木的 AHK 代碼段落之間隔一行空白
+    """
+    return blocks_to_ahkscr(BlockBase.create_blocks_from_workspace_json(workspace_json))
+
+
+def create_workspace_blocks(workspace: Union[str, dict]) -> List[BlockBase]:
+    """ 自白板的 xml 字串或 json 字典建立積木實例
+
+    Args:
+        workspace (Union[str, dict]): 白板的 xml 字串或 json 字典
+
+    Returns:
+        List[BlockBase]
+    """
+    if isinstance(workspace, dict):
+        return BlockBase.create_blocks_from_workspace_json(workspace)
+    return BlockBase.create_blocks_from_xml_str(workspace)
+
+
+def get_workspace_ahkscr(workspace: Union[str, dict], compile_options: Optional[CompileOptions] = None) -> str:
+    """ 取得白板的積木 AHK 代碼
+
+    Args:
+        workspace (Union[str, dict]): 白板的 xml 字串或 json 字典
+        compile_options (Optional[CompileOptions], optional): 編譯請求指定的選項 (見 `get_compile_options`). Defaults to None.
+
+    Returns:
+        str
+    """
+    return blocks_to_ahkscr(create_workspace_blocks(workspace), compile_options=compile_options)
+
+
+def lower_blocks(blocks: Iterable[BlockBase]) -> ir.Program:
+    """ 將白板上的積木降階成 IR 程式
+
+    Args:
+        blocks (Iterable[BlockBase]): 白板上的積木 (已解析的積木實例)
+
+    Returns:
+        ir.Program
+    """
+    item_list: List[ir.TopLevel] = []
+    for block in blocks:
+        # 排除不能單獨編譯的積木: 物件型積木、設定型積木
+        if isinstance(block, (ObjectBlockBase, SettingBlockBase)):
+            continue
+        block.prepare_lower_expr()
+        node_list = block.profiled_lower()
+        # 排除積木沒有 ahk 代碼的積木(如:空積木)
+        if not node_list:
+            continue
+        # 頂層的動作型積木: 以陳述式串列作為一個段落
+        if all(isinstance(node, ir.Stmt) for node in node_list):
+            item_list.append(ir.Sequence(node_list))
+        else:
+            item_list.extend(node_list)
+    return ir.Program(item_list)
+
+
+def iter_separated_ahkscr(item_ahkscr_iter: Iterable[str]) -> Iterator[str]:
+    """ 依序產生 AHK 代碼段落，第二段起以一行空白開頭 (組合後段落之間隔一行空白)
+
+    Args:
+        item_ahkscr_iter (Iterable[str]): 頂層項目的 AHK 代碼段落
+
+    Yields:
+        str
+    """
+    separator = ""
+    for item_ahkscr in item_ahkscr_iter:
+        yield separator + item_ahkscr
+        separator = "\n\n"
+
+
+def iter_blocks_ahkscr(
+        blocks: Iterable[BlockBase],
+        optimize: bool = True,
+        compile_options: Optional[CompileOptions] = None) -> Iterator[str]:
+    """ 依序產生積木 AHK 代碼段落 (第二段起以一行空白開頭，組合後同 `blocks_to_ahkscr`)
+
+    最佳化需要整個程式的 IR，但 AHK 代碼逐段產生，不會再組合成一整個字串；
+    不最佳化時則逐一降階積木，積木可為逐一產生的迭代器 (記憶體用量不隨積木數增加)；
+    執行期設定由置頂程式碼輸出，不在積木代碼中 (見 `compile_blocks`)
+
+    Args:
+        blocks (Iterable[BlockBase]): 白板上的積木 (已解析的積木實例)
+        optimize (bool, optional): 是否最佳化 IR (常數摺疊、共用子運算式). Defaults to True.
+        compile_options (Optional[CompileOptions], optional): 編譯請求指定的選項，與白板的腳本設定積木合併
+            (見 `get_compile_options`；最佳化時才套用). Defaults to None.
+
+    Yields:
+        str
+    """
+    if optimize:
+        blocks = list(blocks)
+        item_ahkscr_iter = codegen.iter_program_ahkscr(optimizer.optimize_program(
+            lower_blocks(blocks),
+            **get_compile_options(blocks, compile_options).get_optimize_kwargs(),
+        ))
+    else:
+        item_ahkscr_iter = (
+            item_ahkscr
+            for block in blocks
+            for item_ahkscr in codegen.iter_program_ahkscr(lower_blocks([block]))
+        )
+    yield from iter_separated_ahkscr(item_ahkscr_iter)
+
+
+def blocks_to_ahkscr(
+        blocks: Iterable[BlockBase],
+        optimize: bool = True,
+        compile_options: Optional[CompileOptions] = None) -> str:
+    """ 逐一取得積木 AHK 代碼
+
+    Args:
+        blocks (Iterable[BlockBase]): 白板上的積木 (已解析的積木實例)
+        optimize (bool, optional): 是否最佳化 IR (常數摺疊、共用子運算式). Defaults to True.
+        compile_options (Optional[CompileOptions], optional): 編譯請求指定的選項，與白板的腳本設定積木合併
+            (見 `get_compile_options`). Defaults to None.
+
+    Returns:
+        str: 不同積木的 AHK 代碼段落之間隔一行空白
+    """
+    return "".join(iter_blocks_ahkscr(
+        blocks,
+        optimize,
+        compile_options,
+    ))
+
+
+def optimize_blocks(
+        blocks: List[BlockBase],
+        compile_options: Optional[CompileOptions] = None) -> Tuple[ir.Program, Dict[str, str]]:
+    """ 降階並最佳化白板上的積木，再依最終的程式 (含貼上、分派器等函式呼叫) 選擇執行期設定
+
+    Args:
+        blocks (List[BlockBase]): 白板上的積木 (已解析的積木實例)
+        compile_options (Optional[CompileOptions], optional): 編譯請求指定的選項，與白板的腳本設定積木合併
+            (見 `get_compile_options`). Defaults to None.
+
+    Returns:
+        Tuple[ir.Program, Dict[str, str]]: (最佳化後的程式, 執行期設定名稱與其值字典 (見 `get_header_ahkscr`))
+    """
+    compile_options = get_compile_options(blocks, compile_options)
+    program = optimizer.optimize_program(
+        lower_blocks(blocks),
+        **compile_options.get_optimize_kwargs(),
+    )
+    runtime_tuning_dict = optimizer.select_runtime_tuning(
+        program,
+        auto_tuning=bool(compile_options.runtime_tuning),
+        tuning_overrides=compile_options.runtime_tuning_overrides,
+    )
+    return program, runtime_tuning_dict
+
+
+def compile_blocks(
+        blocks: List[BlockBase],
+        run_as_admin: bool = False,
+        compile_options: Optional[CompileOptions] = None) -> Tuple[str, str]:
+    """ 編譯白板上的積木: 取得置頂程式碼 (含執行期設定) 與積木 AHK 代碼
+
+    Args:
+        blocks (List[BlockBase]): 白板上的積木 (已解析的積木實例)
+        run_as_admin (bool, optional): 是否使用管理員權限執行. Defaults to False.
+        compile_options (Optional[CompileOptions], optional): 編譯請求指定的選項，與白板的腳本設定積木合併
+            (見 `get_compile_options`). Defaults to None.
+
+    Returns:
+        Tuple[str, str]: (置頂程式碼, 積木 AHK 代碼)
+    """
+    program, runtime_tuning_dict = optimize_blocks(blocks, compile_options)
+    return (
+        get_header_ahkscr(run_as_admin, runtime_tuning_dict),
+        codegen.program_to_ahkscr(program),
+    )
+
+
+def compile_workspace(
+        workspace: Union[str, dict],
+        run_as_admin: bool = False,
+        compile_options: Optional[CompileOptions] = None) -> Tuple[str, str]:
+    """ 編譯白板: 取得置頂程式碼 (含執行期設定) 與積木 AHK 代碼 (見 `compile_blocks`)
+
+    Args:
+        workspace (Union[str, dict]): 白板的 xml 字串或 json 字典
+        run_as_admin (bool, optional): 是否使用管理員權限執行. Defaults to False.
+        compile_options (Optional[CompileOptions], optional): 編譯請求指定的選項 (見 `get_compile_options`). Defaults to None.
+
+    Returns:
+        Tuple[str, str]: (置頂程式碼, 積木 AHK 代碼)
+    """
+    return compile_blocks(create_workspace_blocks(workspace), run_as_admin, compile_options)
+
+
+def profile_workspace(workspace: Union[str, dict], compile_options: Optional[CompileOptions] = None) -> Tuple[str, dict]:
+    """ 編譯白板並分析效能: 記錄白板各編譯階段的耗時，與各積木類的實例化、產生 AHK 代碼與序列化耗時
+
+    (效能分析器為全域設定，分析期間本進程的其他編譯也會被記錄，伺服器端應於獨立的子進程中執行)
+
+    Args:
+        workspace (Union[str, dict]): 白板的 xml 字串或 json 字典
+        compile_options (Optional[CompileOptions], optional): 編譯請求指定的選項 (見 `get_compile_options`). Defaults to None.
+
+    Returns:
+        Tuple[str, dict]: (積木 AHK 代碼, 分析報告字典 (見 `BlockProfiler.get_report_dict`))
+    """
+    profiler = BlockBase.start_profiling()
+    try:
+        blocks = profiler.measure('parse', create_workspace_blocks, workspace)
+        program = profiler.measure('lower', lower_blocks, blocks)
+        optimize_kwargs = get_compile_options(blocks, compile_options).get_optimize_kwargs()
+        program = profiler.measure(
+            'optimize', lambda: optimizer.optimize_program(program, **optimize_kwargs))
+        block_ahkscr = profiler.measure('codegen', codegen.program_to_ahkscr, program)
+        # 序列化回原本的格式 (同瀏覽器自動儲存白板)
+        if isinstance(workspace, dict):
+            profiler.measure('serialize', BlockBase.get_workspace_json, blocks)
+        else:
+            profiler.measure('serialize', lambda: [
+                block.get_xml_str() for block in blocks
+            ])
+    finally:
+        BlockBase.stop_profiling()
+    return block_ahkscr, profiler.get_report_dict()
+
+
+def get_used_ahk_func_name_set(ahkscr: str, ahk_func_names: Iterable[str]) -> Set[str]:
+    """ 獲取 AHK 代碼中有呼叫到的函式名稱
+
+    Args:
+        ahkscr (str)
+        ahk_func_names (Iterable[str]): 函式庫中所有的函式名稱
+
+    Returns:
+        Set[str]
+    """
+    return set(
+        func_name for func_name in ahk_func_names
+        if f"{func_name}(" in ahkscr
+    )
+
+
+def get_ahk_funcs_section(ahk_funcs_script: str) -> str:
+    """ 取得附加於腳本最後的函式段落 (沒有函式時為空字串)
+
+    Args:
+        ahk_funcs_script (str)
+
+    Returns:
+        str
+    """
+    return (
+        '\n\n;' + ' function '.center(30, "=") + '\n\n'
+        + ahk_funcs_script
+    ) if ahk_funcs_script else ""
+
+
+def join_ahkscr(header_ahkscr: str, block_ahkscr: str, ahk_funcs_script: str) -> str:
+    """ 組合置頂程式碼、積木代碼與函式腳本
+
+    Args:
+        header_ahkscr (str)
+        block_ahkscr (str)
+        ahk_funcs_script (str)
+
+    Returns:
+        str
+    """
+    return header_ahkscr + block_ahkscr + get_ahk_funcs_section(ahk_funcs_script)
+
+
+def link_ahkscr(
+        header_ahkscr: str,
+        block_ahkscr: str,
+        ahk_func_names: Iterable[str],
+        get_ahk_funcs_script: Callable[[Set[str]], str]) -> str:
+    """ 組合置頂程式碼與積木代碼，並附加有呼叫到的函式腳本
+
+    Args:
+        header_ahkscr (str)
+        block_ahkscr (str)
+        ahk_func_names (Iterable[str]): 函式庫中所有的函式名稱
+        get_ahk_funcs_script (Callable[[Set[str]], str]): 根據函式名稱獲取函式腳本 (含相依函式)
+
+    Returns:
+        str
+    """
+    used_ahk_func_name_set = get_used_ahk_func_name_set(
+        header_ahkscr + block_ahkscr,
+        ahk_func_names,
+    )
+    ahk_funcs_script = get_ahk_funcs_script(used_ahk_func_name_set)
+    return join_ahkscr(header_ahkscr, block_ahkscr, ahk_funcs_script)
+
+
+def iter_linked_ahkscr(
+        block_ahkscr_chunks: Iterable[str],
+        ahk_func_names: Iterable[str],
+        get_ahk_funcs_script: Callable[[Set[str]], str],
+        run_as_admin: bool = False,
+        runtime_tuning_dict: Optional[Dict[str, str]] = None) -> Iterator[str]:
+    """ 依序產生完整 AHK 腳本的段落: 置頂程式碼、積木代碼段落，最後為有呼叫到的函式腳本 (組合後同 `link_ahkscr`)
+
+    Args:
+        block_ahkscr_chunks (Iterable[str]): 積木代碼段落 (如 `iter_blocks_ahkscr`)
+        ahk_func_names (Iterable[str]): 函式庫中所有的函式名稱
+        get_ahk_funcs_script (Callable[[Set[str]], str]): 根據函式名稱獲取函式腳本 (含相依函式)
+        run_as_admin (bool, optional): 是否使用管理員權限執行. Defaults to False.
+        runtime_tuning_dict (Optional[Dict[str, str]], optional): 執行期設定 (見 `get_header_ahkscr`). Defaults to None.
+
+    Yields:
+        str
+    """
+    ahk_func_name_list = list(ahk_func_names)
+    header_ahkscr = get_header_ahkscr(run_as_admin, runtime_tuning_dict)
+    used_ahk_func_name_set = get_used_ahk_func_name_set(header_ahkscr, ahk_func_name_list)
+    yield header_ahkscr
+
+    # 函式呼叫不會跨越段落，因此逐段記錄有呼叫到的函式
+    for block_ahkscr in block_ahkscr_chunks:
+        used_ahk_func_name_set |= get_used_ahk_func_name_set(block_ahkscr, ahk_func_name_list)
+        yield block_ahkscr
+
+    ahk_funcs_section = get_ahk_funcs_section(get_ahk_funcs_script(used_ahk_func_name_set))
+    if ahk_funcs_section:
+        yield ahk_funcs_section
+
+
+def iter_workspace_ahkscr(
+        workspace: Union[str, dict],
+        ahk_func_names: Iterable[str],
+        get_ahk_funcs_script: Callable[[Set[str]], str],
+        run_as_admin: bool = False,
+        compile_options: Optional[CompileOptions] = None,
+        whole_program: bool = True) -> Iterator[str]:
+    """ 依序產生白板完整 AHK 腳本的段落: 置頂程式碼、各頂層積木的代碼段落，最後為有呼叫到的函式腳本
+    (組合後同 `link_ahkscr`)，供串流輸出大型白板的腳本，不需先組合成一整個字串
+
+    整個程式的最佳化 (與依工作負載選擇的執行期設定、熱字串分派器) 需要整個程式的 IR，
+    因此會先降階並最佳化所有積木才產生置頂程式碼；
+    不執行整個程式的最佳化時，解析白板後即產生置頂程式碼，再逐一降階、最佳化積木並產生代碼段落
+    (首段的等待時間與 IR 的記憶體用量不隨積木數增加)
+
+    Args:
+        workspace (Union[str, dict]): 白板的 xml 字串或 json 字典
+        ahk_func_names (Iterable[str]): 函式庫中所有的函式名稱
+        get_ahk_funcs_script (Callable[[Set[str]], str]): 根據函式名稱獲取函式腳本 (含相依函式)
+        run_as_admin (bool, optional): 是否使用管理員權限執行. Defaults to False.
+        compile_options (Optional[CompileOptions], optional): 編譯請求指定的選項 (見 `get_compile_options`). Defaults to None.
+        whole_program (bool, optional): 是否執行整個程式的最佳化 (見 `optimizer.optimize_program`)；
+            啟用執行期設定或熱字串分派器時一律執行. Defaults to True.
+
+    Yields:
+        str
+    """
+    blocks = create_workspace_blocks(workspace)
+    merged_compile_options = get_compile_options(blocks, compile_options)
+    if whole_program or merged_compile_options.runtime_tuning \
+            or merged_compile_options.hotstring_dispatch_threshold:
+        program, runtime_tuning_dict = optimize_blocks(blocks, compile_options)
+        item_ahkscr_iter = codegen.iter_program_ahkscr(program)
+    else:
+        # 只有自訂的執行期設定，不需分析整個程式
+        runtime_tuning_dict = optimizer.select_runtime_tuning(
+            ir.Program([]),
+            auto_tuning=False,
+            tuning_overrides=merged_compile_options.runtime_tuning_overrides,
+        )
+        optimize_kwargs = merged_compile_options.get_optimize_kwargs()
+        item_ahkscr_iter = (
+            item_ahkscr
+            for block in blocks
+            for item_ahkscr in codegen.iter_program_ahkscr(optimizer.optimize_program(
+                lower_blocks([block]), whole_program=False, **optimize_kwargs))
+        )
+    yield from iter_linked_ahkscr(
+        iter_separated_ahkscr(item_ahkscr_iter),
+        ahk_func_names,
+        get_ahk_funcs_script,
+        run_as_admin=run_as_admin,
+        runtime_tuning_dict=runtime_tuning_dict,
+    )
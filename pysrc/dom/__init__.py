@@ -0,0 +1,44 @@
+"""
+積木模型使用的 DOM 操作 (解析、子節點、屬性、select/select_one 與序列化)
+
+於匯入時選擇後端:
+    - 瀏覽器 (Brython): 使用 `browser.html.DIV` 解析，節點為 browser.DOMNode
+    - CPython: 使用 lxml (若有安裝) 或 xml.etree 解析，節點為 Element；
+      可用環境變數 AHKBLOCKLY_DOM_BACKEND=etree|lxml 指定
+"""
+from typing import Any
+
+try:
+    import browser
+except ImportError:
+    browser = None
+
+if browser is not None:
+    from pysrc.dom.brython_backend import (
+        BACKEND_NAME,
+        parse_xml_str,
+        get_children,
+        get_tag_name,
+        get_attr,
+        select,
+        select_one,
+        get_inner_xml_str,
+        get_outer_xml_str,
+        prettify_xml_str,
+    )
+else:
+    from pysrc.dom.etree_backend import (
+        BACKEND_NAME,
+        parse_xml_str,
+        get_children,
+        get_tag_name,
+        get_attr,
+        select,
+        select_one,
+        get_inner_xml_str,
+        get_outer_xml_str,
+        prettify_xml_str,
+    )
+
+# 後端的節點型別 (Brython: browser.DOMNode；CPython: Element)
+DomNode = Any
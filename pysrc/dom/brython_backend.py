@@ -0,0 +1,57 @@
+"""
+Brython (瀏覽器) DOM 後端: 以 `browser.html.DIV` 解析積木 xml 字串
+"""
+from typing import List, Optional
+
+from browser import window
+from browser.html import DIV
+
+BACKEND_NAME = 'brython'
+
+
+def parse_xml_str(xml_str: str) -> 'browser.DOMNode':
+    """ 解析 xml 字串，並以 div 節點包裹
+
+    Args:
+        xml_str (str)
+
+    Returns:
+        browser.DOMNode
+    """
+    return DIV(xml_str)
+
+
+def get_children(node: 'browser.DOMNode') -> List['browser.DOMNode']:
+    return node.children
+
+
+def get_tag_name(node: 'browser.DOMNode') -> str:
+    """ 獲取大寫的標籤名稱 (如 'BLOCK') """
+    return node.tagName
+
+
+def get_attr(node: 'browser.DOMNode', attr_name: str) -> Optional[str]:
+    return node.attrs.get(attr_name)
+
+
+def select(node: 'browser.DOMNode', selector: str) -> List['browser.DOMNode']:
+    return node.select(selector)
+
+
+def select_one(node: 'browser.DOMNode', selector: str) -> Optional['browser.DOMNode']:
+    return node.select_one(selector)
+
+
+def get_inner_xml_str(node: 'browser.DOMNode') -> str:
+    """ 獲取節點的內部內容字串 (innerHTML) """
+    return node.innerHTML
+
+
+def get_outer_xml_str(node: 'browser.DOMNode') -> str:
+    """ 獲取節點本身的字串 (outerHTML) """
+    return node.outerHTML
+
+
+def prettify_xml_str(xml_str: str) -> str:
+    """ 格式化 xml 字串 (便於檢視用) """
+    return window.prettify_xml(xml_str)
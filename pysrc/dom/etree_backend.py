@@ -0,0 +1,131 @@
+"""
+CPython DOM 後端: 以 lxml (若有安裝) 或 xml.etree 解析積木 xml 字串，節點即為 Element
+
+提供與 Brython 後端相同的操作結果 (標籤名稱為大寫、內部內容字串與 innerHTML 相同的跳脫方式)，
+可用環境變數 AHKBLOCKLY_DOM_BACKEND=etree|lxml 指定解析器
+"""
+import os
+import re
+import xml.dom.minidom
+from typing import List, Optional
+from xml.sax.saxutils import escape, quoteattr
+
+_backend_name = os.environ.get('AHKBLOCKLY_DOM_BACKEND', '').lower()
+if _backend_name not in ('', 'lxml', 'etree'):
+    raise ValueError(f"未知的 DOM 後端: {_backend_name}")
+
+ET = None
+if _backend_name in ('', 'lxml'):
+    try:
+        from lxml import etree as ET
+    except ImportError:
+        if _backend_name == 'lxml':
+            raise
+
+if ET is not None:
+    BACKEND_NAME = 'lxml'
+    # 很長的積木串列會產生很深的巢狀節點，需解除 libxml2 的深度限制
+    _XML_PARSER = ET.XMLParser(huge_tree=True)
+else:
+    import xml.etree.ElementTree as ET
+    BACKEND_NAME = 'etree'
+    _XML_PARSER = None
+
+XML_DECLARATION_PATTERN = re.compile(R'^\s*<\?xml[^>]*\?>')
+
+
+def _strip_namespace(element: 'ET.Element'):
+    """ 移除元素與子元素標籤的命名空間 (如 Blockly 的 xmlns) """
+    for sub_element in element.iter():
+        if isinstance(sub_element.tag, str) and '}' in sub_element.tag:
+            sub_element.tag = sub_element.tag.split('}', 1)[1]
+
+
+def get_outer_xml_str(element: 'ET.Element') -> str:
+    """ 元素轉換成字串 (與 outerHTML 相同: 空元素也以成對的標籤表示) """
+    attrs_str = ''.join(
+        f" {attr_name}={quoteattr(attr_value)}"
+        for attr_name, attr_value in element.attrib.items()
+    )
+    return f"<{element.tag}{attrs_str}>{get_inner_xml_str(element)}</{element.tag}>"
+
+
+def parse_xml_str(xml_str: str) -> 'ET.Element':
+    """ 解析 xml 字串，並以 div 節點包裹 (對應 Brython 的 `DIV(xml_str)`)
+
+    Args:
+        xml_str (str)
+
+    Returns:
+        ET.Element
+    """
+    # 移除 xml 宣告 (如 <?xml version="1.0"?>)
+    xml_str = XML_DECLARATION_PATTERN.sub('', xml_str)
+    element = ET.fromstring(f"<div>{xml_str}</div>", _XML_PARSER)
+    _strip_namespace(element)
+    return element
+
+
+def get_children(element: 'ET.Element') -> List['ET.Element']:
+    """ 獲取子元素 (排除 lxml 的註解與處理指令節點) """
+    return [
+        sub_element for sub_element in element
+        if isinstance(sub_element.tag, str)
+    ]
+
+
+def get_tag_name(element: 'ET.Element') -> str:
+    """ 獲取大寫的標籤名稱 (如 'BLOCK') """
+    return element.tag.upper()
+
+
+def get_attr(element: 'ET.Element', attr_name: str) -> Optional[str]:
+    return element.get(attr_name)
+
+
+def select(element: 'ET.Element', selector: str) -> List['ET.Element']:
+    """ 以 CSS 選擇器選取子孫元素 (僅支援標籤名稱與子代選擇器 `>`，如 'xml>block')
+
+    Args:
+        element (ET.Element)
+        selector (str)
+
+    Returns:
+        List[ET.Element]: 依文件順序排列的元素列表
+    """
+    tag_name_tuple = tuple(
+        tag_name.strip().lower() for tag_name in selector.split('>')
+    )
+    com_element_list = []
+    # 以堆疊遍歷子孫元素，並記錄最近幾層祖先元素的標籤名稱 (僅保留比對選擇器所需的層數)
+    stack = [
+        (sub_element, (element.tag.lower(),))
+        for sub_element in reversed(get_children(element))
+    ]
+    while stack:
+        sub_element, ancestor_tag_names = stack.pop()
+        tag_name_path = (ancestor_tag_names + (sub_element.tag.lower(),))[-len(tag_name_tuple):]
+        if tag_name_path == tag_name_tuple:
+            com_element_list.append(sub_element)
+        stack.extend(
+            (child_element, tag_name_path)
+            for child_element in reversed(get_children(sub_element))
+        )
+    return com_element_list
+
+
+def select_one(element: 'ET.Element', selector: str) -> Optional['ET.Element']:
+    return next(iter(select(element, selector)), None)
+
+
+def get_inner_xml_str(element: 'ET.Element') -> str:
+    """ 獲取元素的內部內容字串 (與 innerHTML 相同的跳脫方式) """
+    return escape(element.text or '') + ''.join(
+        get_outer_xml_str(sub_element) + escape(sub_element.tail or '')
+        for sub_element in get_children(element)
+    )
+
+
+def prettify_xml_str(xml_str: str) -> str:
+    """ 格式化 xml 字串 (便於檢視用) """
+    return xml.dom.minidom.parseString(xml_str).toprettyxml(indent='  ')
@@ -12,8 +12,15 @@ from browser.html import (
     TEXTAREA,
     INPUT,
     SPAN,
+    DETAILS,
+    SUMMARY,
+    TABLE,
+    TR,
+    TH,
+    TD,
 )
 
+from pysrc import compiler
 from pysrc.models.block_bases import BlockBase
 from pysrc.models.blockly_board import BlocklyBoard
 from pysrc.models.blocks import *
@@ -88,8 +95,72 @@ def operation_div(blocklyBoard):
     return com_div  # + DIV(style=dict(float="clear"))
 
 
-def code_view_div():
-    """ 瀏覽編譯後的 xml 與 ahk 程式碼 DIV 元素 """
+def profile_report_table(report_dict: dict):
+    """ 效能分析報告表格: 白板各編譯階段耗時，與各積木類的呼叫次數、累計時間與自身時間 (毫秒) """
+    com_table = TABLE(style=dict(borderCollapse="collapse", fontSize="12px"))
+    workspace_dict = report_dict['workspace']
+    com_table <= TR(TH(
+        f"共 {workspace_dict['block_count']} 個積木，總耗時 {workspace_dict['total_ms']:.1f} ms: "
+        + "、".join(
+            f"{stage_name} {stage_ms:.1f}"
+            for stage_name, stage_ms in workspace_dict['stages'].items()
+        ),
+        colspan=5,
+        style=dict(textAlign="left"),
+    ))
+    com_table <= TR(
+        [TH("積木類"), TH("自身時間")]
+        + [TH(f"{stage_name} 次數/累計/自身") for stage_name in ('create', 'ahkscr', 'serialize')]
+    )
+    for block_report_dict in report_dict['blocks']:
+        stage_td_list = []
+        for stage_name in ('create', 'ahkscr', 'serialize'):
+            stage_dict = block_report_dict['stages'].get(stage_name)
+            stage_td_list.append(TD(
+                f"{stage_dict['call_count']} / {stage_dict['cumulative_ms']:.2f} / {stage_dict['self_ms']:.2f}"
+                if stage_dict else "-"
+            ))
+        com_table <= TR(
+            [TD(block_report_dict['block_class']), TD(f"{block_report_dict['self_ms']:.2f}")]
+            + stage_td_list
+        )
+    return com_table
+
+
+def profile_details(blocklyBoard: BlocklyBoard):
+    """ 效能分析面板 (可收合): 分析瀏覽器或伺服器編譯白板時，各積木類的耗時 """
+    async def profile(on_server: bool):
+        workspace_json_dict = blocklyBoard.get_workspace_json()
+        if on_server:
+            # POST 請求: 由伺服器編譯並回傳分析報告
+            res = await aio.post(
+                '/api/compile/profile',
+                data=json.dumps(dict(workspace_json=workspace_json_dict)),
+            )
+            report_dict = json.loads(res.data)
+        else:
+            _, report_dict = compiler.profile_workspace(workspace_json_dict)
+        report_div = doc['profile_report_div']
+        report_div.clear()
+        report_div <= profile_report_table(report_dict)
+
+    return DETAILS(
+        [
+            SUMMARY("效能分析"),
+            BUTTON("Profile (瀏覽器)").bind(
+                "click", lambda _: aio.run(profile(on_server=False))
+            ),
+            BUTTON("Profile (伺服器)").bind(
+                "click", lambda _: aio.run(profile(on_server=True))
+            ),
+            DIV(id="profile_report_div", style=dict(overflowX="auto")),
+        ],
+        style=dict(clear="both"),
+    )
+
+
+def code_view_div(blocklyBoard: BlocklyBoard):
+    """ 瀏覽編譯後的 xml 與 ahk 程式碼 DIV 元素 (下方附效能分析面板) """
     return DIV(
         [
             DIV(
@@ -121,7 +192,8 @@ def code_view_div():
                     float="left",
                     height="300px",
                 ),
-            )
+            ),
+            profile_details(blocklyBoard),
         ]
     )
 
@@ -206,6 +278,14 @@ def main():
                     # 熱字串: 輸入 btw, 展開為 by the way
                     HotStringBlock(
                         ABBR=TextBlock(TEXT="btw"), TEXT=TextBlock(TEXT="by the way")),
+                    # 腳本設定: 整個腳本的編譯選項
+                    ScriptSettingBlock(
+                        HOTSTRING_DISPATCH_THRESHOLD="0",
+                        PASTE_TEXT_MIN_LENGTH="0",
+                        PRECISE_SLEEP="FALSE",
+                        RUNTIME_TUNING="FALSE",
+                        RUNTIME_TUNING_OVERRIDES="",
+                    ),
 
                 ],
             ),
@@ -278,6 +358,9 @@ def main():
 
         ]),
         # endregion 白板積木工具欄
+        # Blockly 媒體檔設定 (由伺服器設定檔注入至 body 的 data 屬性)
+        media=doc.body.attrs.get('data-blockly-media', 'static/media/'),
+        sounds=doc.body.attrs.get('data-blockly-sounds') == 'true',
         block=ShortCutBlock(
             KEY=NormalKeyBlock(
                 KEY="A",
@@ -295,7 +378,7 @@ def main():
     doc <= operation_div(blocklyBoard)
 
     # 置入編譯後的 xml 與 ahk 程式碼 DIV 區塊
-    doc <= code_view_div()
+    doc <= code_view_div(blocklyBoard)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,212 @@
+"""
+積木與 AHK 代碼之間的中間表示 (IR)
+
+積木先降階 (lower) 成 IR 節點，再由 `pysrc.codegen` 產生 AHK 代碼；
+最佳化、快取與統計皆在 IR 上進行，不需再解析或拼接 AHK 字串
+
+    Program
+     └─ Hotkey / Hotstring / HotstringAction / Label / Sequence (頂層項目)
+         └─ Command / Assign / CallStatement / RawStatement (陳述式)
+             └─ Number / String / Raw / BinaryOp / Call (運算式)
+"""
+import re
+from typing import List, Optional, Sequence as SequenceType, Union
+
+
+class Node:
+    """ IR 節點 """
+    __slots__ = ()
+
+
+# region 運算式
+
+class Expr(Node):
+    """ 運算式節點 """
+    __slots__ = ()
+
+
+class Number(Expr):
+    """ 數字字面值 (保留輸入的文字，如 '1.50') """
+    __slots__ = ('text',)
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class String(Expr):
+    """ 字串字面值 (產生時加上雙引號) """
+    __slots__ = ('value',)
+
+    def __init__(self, value: str):
+        self.value = value
+
+
+class Raw(Expr):
+    """ 原始 AHK 運算式文字 (如變數 `Clipboard`、下拉選單提供的運算式)
+
+    atomic 為 False 時，作為運算元會加上括號；
+    未指定時，單一字串字面值、變數名稱或數字視為 atomic
+    """
+    __slots__ = ('text', 'atomic')
+
+    ATOMIC_TEXT_PATTERN = re.compile(R'\s*(?:"[^"]*"|\w+)\s*')
+
+    def __init__(self, text: str, atomic: Optional[bool] = None):
+        self.text = text
+        self.atomic = atomic if atomic is not None \
+            else self.ATOMIC_TEXT_PATTERN.fullmatch(text) is not None
+
+
+class BinaryOp(Expr):
+    """ 二元運算 (`.` 為字串串接) """
+    __slots__ = ('op', 'left', 'right')
+
+    # 運算子優先順序 (數字越大越優先)
+    OP_MAPPING_PRECEDENCE_DICT = {
+        '**': 7,
+        '*': 5,
+        '/': 5,
+        '//': 5,
+        '+': 4,
+        '-': 4,
+        '.': 3,
+    }
+
+    def __init__(self, op: str, left: Expr, right: Expr):
+        assert op in self.OP_MAPPING_PRECEDENCE_DICT, f"未知的運算子: {op}"
+        self.op = op
+        self.left = left
+        self.right = right
+
+
+class Call(Expr):
+    """ 函式呼叫 """
+    __slots__ = ('func_name', 'args')
+
+    def __init__(self, func_name: str, args: SequenceType[Optional[Expr]] = ()):
+        self.func_name = func_name
+        self.args = list(args)
+
+# endregion 運算式
+
+
+# region 陳述式
+
+class Stmt(Node):
+    """ 陳述式節點 (disabled 為 True 時產生註解掉的代碼) """
+    __slots__ = ('disabled',)
+
+
+class Command(Stmt):
+    """ AHK 命令，如 `SendInput, {a}`、`Msgbox % "Hi"`
+
+    參數為字串時直接輸出，為運算式時以 `% 運算式` 輸出，為 None 時表示空的運算式
+    """
+    __slots__ = ('name', 'args')
+
+    def __init__(
+            self,
+            name: str,
+            args: SequenceType[Union[str, Expr, None]] = (),
+            disabled: bool = False):
+        self.name = name
+        self.args = list(args)
+        self.disabled = disabled
+
+
+class Assign(Stmt):
+    """ 變數賦值，如 `Clipboard := "Hi"` """
+    __slots__ = ('var_name', 'expr')
+
+    def __init__(self, var_name: str, expr: Optional[Expr], disabled: bool = False):
+        self.var_name = var_name
+        self.expr = expr
+        self.disabled = disabled
+
+
+class CallStatement(Stmt):
+    """ 函式呼叫陳述式 (不使用回傳值)，如 `PreciseSleep(5)` """
+    __slots__ = ('call',)
+
+    def __init__(self, call: Call, disabled: bool = False):
+        self.call = call
+        self.disabled = disabled
+
+
+class RawStatement(Stmt):
+    """ 原始 AHK 陳述式文字 (如下拉選單提供的整行代碼) """
+    __slots__ = ('text',)
+
+    def __init__(self, text: str, disabled: bool = False):
+        self.text = text
+        self.disabled = disabled
+
+# endregion 陳述式
+
+
+# region 頂層項目
+
+class TopLevel(Node):
+    """ 頂層項目: 程式中以空行分隔的段落 """
+    __slots__ = ('disabled',)
+
+
+class Hotkey(TopLevel):
+    """ 熱鍵: `按鍵:: 陳述式` """
+    __slots__ = ('key', 'body')
+
+    def __init__(self, key: str, body: List[Stmt], disabled: bool = False):
+        self.key = key
+        self.body = body
+        self.disabled = disabled
+
+
+class Hotstring(TopLevel):
+    """ 熱字串: `:選項:縮寫::{TEXT}展開字詞` """
+    __slots__ = ('options', 'abbr', 'text')
+
+    def __init__(self, options: str, abbr: str, text: str, disabled: bool = False):
+        self.options = options
+        self.abbr = abbr
+        self.text = text
+        self.disabled = disabled
+
+
+class HotstringAction(TopLevel):
+    """ 熱字串動作: `:選項:縮寫::` 後接陳述式 """
+    __slots__ = ('options', 'abbr', 'body')
+
+    def __init__(self, options: str, abbr: str, body: List[Stmt], disabled: bool = False):
+        self.options = options
+        self.abbr = abbr
+        self.body = body
+        self.disabled = disabled
+
+
+class Label(TopLevel):
+    """ 標籤: `名稱:` 後接陳述式 (以 Gosub 呼叫) """
+    __slots__ = ('name', 'body')
+
+    def __init__(self, name: str, body: List[Stmt]):
+        self.name = name
+        self.body = body
+        self.disabled = False
+
+
+class Sequence(TopLevel):
+    """ 頂層的陳述式串列 (腳本載入時自動執行) """
+    __slots__ = ('body',)
+
+    def __init__(self, body: List[Stmt]):
+        self.body = body
+        self.disabled = False
+
+
+class Program(Node):
+    """ 整個白板的程式 """
+    __slots__ = ('items',)
+
+    def __init__(self, items: List[TopLevel]):
+        self.items = items
+
+# endregion 頂層項目
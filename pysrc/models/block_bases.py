@@ -1,36 +1,237 @@
 import abc
+import functools
+import html
+import json
 from typing import (
+    Callable,
     List,
     Literal,
     Optional,
+    Tuple,
+    Type,
     Union,
 )
 import uuid
 import re
-import javascript
-import browser
-from browser import (
-    doc,
-)
-from browser.html import (
-    DIV,
-)
+
+try:
+    import javascript
+except ImportError:
+    # 於 CPython 下執行時沒有 javascript 模組 (僅註冊積木至 Blockly 時使用)
+    javascript = None
+
+from pysrc import codegen, dom, ir
+from pysrc.dom import DomNode
+from pysrc.profiling import BlockProfiler
 
 from pysrc.utils import (
     Blockly,
     to_snake_case,
     to_camel_case,
-    xml_to_str,
+    escape_xml_attr,
+    escape_xml_text,
+    prettify_xml_str,
 )
 
 
 class BuildInBlockBase:
     """ 內建積木
     """
-    pass
+    __slots__ = ()
+
+
+def cache_lower_expr(lower_expr_func: Callable[['BlockBase'], Optional[ir.Expr]]) -> Callable[['BlockBase'], Optional[ir.Expr]]:
+    """ 快取積木 `lower_expr()` 的結果 (積木實例建立後即不再變動)
+
+    Args:
+        lower_expr_func (Callable[[BlockBase], Optional[ir.Expr]]): 積木類的 lower_expr 方法
+
+    Returns:
+        Callable[[BlockBase], Optional[ir.Expr]]
+    """
+    @functools.wraps(lower_expr_func)
+    def cached_lower_expr(self: 'BlockBase') -> Optional[ir.Expr]:
+        try:
+            return self._lower_expr_cache
+        except AttributeError:
+            pass
+        profiler = BlockBase.profiler
+        if profiler is None:
+            expr = lower_expr_func(self)
+        else:
+            profiler.start(self.__class__.__name__, 'ahkscr')
+            try:
+                expr = lower_expr_func(self)
+            finally:
+                profiler.stop()
+        self._lower_expr_cache = expr
+        return expr
+
+    return cached_lower_expr
+
+
+class BlockNodeFrame:
+    """ 自 block node 建立積木實例時的工作框: 逐一處理積木參數，並記錄等待實例化的子層積木節點 """
+
+    def __init__(self, block_node: DomNode):
+        self.block_node = block_node
+        self.block_class: Type[BlockBase] = BlockBase.get_block_class(block_node)
+        self.block_kwargs = {}
+        self._arg_item_iter = iter(self.block_class._arg_name_and_type_list)
+        # 等待實例化的子層積木: (參數名稱, 子層積木節點, 是否為 statement 參數)
+        self._pending: Optional[Tuple[str, DomNode, bool]] = None
+
+    def get_next_sub_block_node(self) -> Optional[DomNode]:
+        """ 處理積木參數直到遇到需要實例化的子層積木節點 (field 值與空參數直接賦值)
+
+        Returns:
+            Optional[DomNode]: 參數皆已處理完畢時回傳 None
+        """
+        if self._pending is not None:
+            return self._pending[1]
+
+        for arg_name, arg_type in self._arg_item_iter:
+            # 若 arg 類型為 input_value 或 input_statement，就找出子層積木節點
+            if arg_type in ('input_value', 'input_statement'):
+                is_statement = arg_type == 'input_statement'
+                # 獲取對應參數名稱的節點
+                input_node = BlockBase.get_sub_node(self.block_node, name=arg_name)
+                sub_block_node = BlockBase.get_sub_node(
+                    input_node, 'BLOCK') if input_node is not None else None
+                # 若無對應名稱的節點，或該節點並無積木，則賦值空積木
+                if sub_block_node is None:
+                    empty_block = eval('EmptyBlock()')
+                    self.block_kwargs[arg_name] = [empty_block] if is_statement else empty_block
+                    continue
+                if is_statement:
+                    self.block_kwargs[arg_name] = []
+                self._pending = (arg_name, sub_block_node, is_statement)
+                return sub_block_node
+
+            # 若 arg 類型為 field 類，就獲取 field 值
+            elif arg_type.startswith('field_'):
+                field_node = BlockBase.get_sub_node(
+                    self.block_node, 'FIELD', name=arg_name)
+                if field_node is None:
+                    self.block_kwargs[arg_name] = eval('EmptyBlock()')
+                    continue
+                # field 值以反跳脫後的原始文字保存 (寫回 xml 時才跳脫)
+                self.block_kwargs[arg_name] = html.unescape(dom.get_inner_xml_str(field_node))
+        return None
+
+    def receive(self, sub_block: 'BlockBase'):
+        """ 接收已實例化的子層積木；statement 參數則接著處理以 next node 關聯的下一個積木
+
+        Args:
+            sub_block (BlockBase)
+        """
+        arg_name, sub_block_node, is_statement = self._pending
+        if not is_statement:
+            self.block_kwargs[arg_name] = sub_block
+            self._pending = None
+            return
+
+        self.block_kwargs[arg_name].append(sub_block)
+        next_block_node = BlockBase.get_next_block_node(sub_block_node)
+        self._pending = (
+            arg_name, next_block_node, True
+        ) if next_block_node is not None else None
+
+    def create_block(self) -> 'BlockBase':
+        """ 實例化積木 """
+        return self.block_class(**self.block_kwargs)
+
+
+class BlockJsonFrame:
+    """ 自積木 json 字典建立積木實例時的工作框 (同 `BlockNodeFrame`，積木節點改為 Blockly 的 json 格式) """
+
+    def __init__(self, block_json: dict):
+        self.block_json = block_json
+        self.block_class: Type[BlockBase] = BlockBase.get_block_class_by_type(block_json['type'])
+        self.block_kwargs = {}
+        self._arg_item_iter = iter(self.block_class._arg_name_and_type_list)
+        # 等待實例化的子層積木: (參數名稱, 子層積木 json 字典, 是否為 statement 參數)
+        self._pending: Optional[Tuple[str, dict, bool]] = None
+
+    def get_next_sub_block_json(self) -> Optional[dict]:
+        """ 處理積木參數直到遇到需要實例化的子層積木 (field 值與空參數直接賦值)
+
+        Returns:
+            Optional[dict]: 參數皆已處理完畢時回傳 None
+        """
+        if self._pending is not None:
+            return self._pending[1]
+
+        input_name_mapping_input_json_dict = self.block_json.get('inputs') or {}
+        field_name_mapping_value_dict = self.block_json.get('fields') or {}
+        for arg_name, arg_type in self._arg_item_iter:
+            if arg_type in ('input_value', 'input_statement'):
+                is_statement = arg_type == 'input_statement'
+                sub_block_json = (input_name_mapping_input_json_dict.get(arg_name) or {}).get('block')
+                # 若無對應名稱的輸入，或該輸入並無積木，則賦值空積木
+                if sub_block_json is None:
+                    empty_block = eval('EmptyBlock()')
+                    self.block_kwargs[arg_name] = [empty_block] if is_statement else empty_block
+                    continue
+                if is_statement:
+                    self.block_kwargs[arg_name] = []
+                self._pending = (arg_name, sub_block_json, is_statement)
+                return sub_block_json
+
+            elif arg_type.startswith('field_'):
+                if arg_name not in field_name_mapping_value_dict:
+                    self.block_kwargs[arg_name] = eval('EmptyBlock()')
+                    continue
+                # 與自 xml 字串載入相同: field 值為原始文字
+                self.block_kwargs[arg_name] = str(field_name_mapping_value_dict[arg_name])
+        return None
+
+    def receive(self, sub_block: 'BlockBase'):
+        """ 接收已實例化的子層積木；statement 參數則接著處理以 next 關聯的下一個積木
+
+        Args:
+            sub_block (BlockBase)
+        """
+        arg_name, sub_block_json, is_statement = self._pending
+        if not is_statement:
+            self.block_kwargs[arg_name] = sub_block
+            self._pending = None
+            return
+
+        self.block_kwargs[arg_name].append(sub_block)
+        next_block_json = BlockBase.get_next_block_json(sub_block_json)
+        self._pending = (
+            arg_name, next_block_json, True
+        ) if next_block_json is not None else None
+
+    def create_block(self) -> 'BlockBase':
+        """ 實例化積木 """
+        return self.block_class(**self.block_kwargs)
+
+
+class BlockMeta(abc.ABCMeta):
+    """ 積木類的元類: 依 arg_dicts 產生 __slots__，積木實例以 slot 存放參數而不建立 __dict__ """
+
+    def __new__(mcls, name: str, bases: tuple, namespace: dict, **kwargs):
+        if '__slots__' not in namespace:
+            # 僅新增父類尚未定義的參數 slot (子類覆寫 arg_dicts 時沿用父類的 slot)
+            inherited_slot_name_set = {
+                slot_name
+                for base in bases
+                for base_class in base.__mro__
+                for slot_name in base_class.__dict__.get('__slots__', ())
+            }
+            namespace['__slots__'] = tuple(
+                arg_name for arg_name in namespace.get('arg_dicts', {})
+                if arg_name not in inherited_slot_name_set
+            )
+        return super().__new__(mcls, name, bases, namespace, **kwargs)
 
 
-class BlockBase(metaclass=abc.ABCMeta):
+class BlockBase(metaclass=BlockMeta):
+    # 實例屬性: lower_expr() 的快取 (參數的 slot 由 BlockMeta 依 arg_dicts 產生)
+    __slots__ = ('_lower_expr_cache',)
+
     # 顯示訊息和變數的位置, 如: '調出訊息 {NAME} 的 {VALUE}'
     template: Union[str, List[str]] = None
     # 參數字典集: 註冊 block 時的 arg0 列表裡的對應 arg 設定字典
@@ -39,6 +240,18 @@ class BlockBase(metaclass=abc.ABCMeta):
     colour: Union[str, int] = None
     # 是否為空積木
     is_empty = False
+    # 效能分析器: 設定後 (見 `start_profiling`) 依積木類記錄實例化、產生 AHK 代碼與序列化的耗時
+    profiler: Optional[BlockProfiler] = None
+
+    # 以下為定義積木類時預先編譯的積木結構 (見 `__init_subclass__`)
+    # type 屬性的值 (類名稱不是以 Block 結尾時為 None)
+    _type_attr: Optional[str] = None
+    # 依 arg_dicts 順序排列的 (參數名稱, 參數類型) 列表
+    _arg_name_and_type_list: List[Tuple[str, str]] = []
+    # input_value、input_statement 與 field 類參數名稱
+    _input_value_arg_names: Tuple[str, ...] = ()
+    _input_statement_arg_names: Tuple[str, ...] = ()
+    _field_arg_names: Tuple[str, ...] = ()
 
     def __init__(self, **kwargs):
         """
@@ -50,24 +263,52 @@ class BlockBase(metaclass=abc.ABCMeta):
                 - 數字
                 - 其他 BlockBase 物件
         """
+        # 將 arg 數值賦予至 self 的屬性 (參數名稱已於定義積木類時檢查)
+        v: Union[str, BlockBase, List[BlockBase]] = ""
+        for k, v in kwargs.items():
+            setattr(self, k, v)
+
+    def __init_subclass__(cls, **kwargs):
+        """ 定義積木類時: 檢查 template 參數，並預先編譯積木結構；
+        子類定義的 lower_expr 方法皆快取結果
+        """
+        super().__init_subclass__(**kwargs)
+
         # 檢查 template 中是否有重複的參數
-        if self.template:
-            template = self.template if isinstance(
-                self.template, str) else ''.join(self.template)
+        if cls.template:
+            template = cls.template if isinstance(
+                cls.template, str) else ''.join(cls.template)
             template_arg_name_list = re.findall(R"\{(.+?)\}", template)
             assert len(template_arg_name_list) == len(set(template_arg_name_list)),\
-                f"重複的參數名稱: [{', '.join(template_arg_name_list)}]"
+                f"{cls.__name__} 重複的參數名稱: [{', '.join(template_arg_name_list)}]"
             # 檢查是否有缺少的 arg
-            assert set(template_arg_name_list) == self.arg_dicts.keys(),\
-                f"缺少參數定義;"\
+            assert set(template_arg_name_list) == cls.arg_dicts.keys(),\
+                f"{cls.__name__} 缺少參數定義;"\
                 f"template_arg_name_list: [{', '.join(template_arg_name_list)}];"\
-                f"arg_dicts: [{', '.join(self.arg_dicts.keys())}]; "\
-
-        # 將 arg 數值賦予至 self 的屬性
+                f"arg_dicts: [{', '.join(cls.arg_dicts.keys())}]; "\
+
+        # 預先編譯積木結構
+        cls._type_attr = to_snake_case(cls.__name__[:-len('Block')]) \
+            if cls.__name__.endswith("Block") else None
+        cls._arg_name_and_type_list = [
+            (arg_name, arg_dict['type'])
+            for arg_name, arg_dict in cls.arg_dicts.items()
+        ]
+        cls._input_value_arg_names = tuple(
+            arg_name for arg_name, arg_type in cls._arg_name_and_type_list
+            if arg_type == 'input_value'
+        )
+        cls._input_statement_arg_names = tuple(
+            arg_name for arg_name, arg_type in cls._arg_name_and_type_list
+            if arg_type == 'input_statement'
+        )
+        cls._field_arg_names = tuple(
+            arg_name for arg_name, arg_type in cls._arg_name_and_type_list
+            if arg_type.startswith('field_')
+        )
 
-        v: Union[str, BlockBase, List[BlockBase]] = ""
-        for k, v in kwargs.items():
-            setattr(self, k, v)
+        if 'lower_expr' in cls.__dict__:
+            cls.lower_expr = cache_lower_expr(cls.__dict__['lower_expr'])
 
     @classmethod
     def _get_register_messages(cls) -> str:
@@ -93,8 +334,8 @@ class BlockBase(metaclass=abc.ABCMeta):
         Returns:
             str: 類名稱的 snake case
         """
-        assert cls.__name__.endswith("Block")
-        return to_snake_case(cls.__name__[:-len('Block')])
+        assert cls._type_attr is not None
+        return cls._type_attr
 
     @classmethod
     def _get_register_dict(cls) -> dict:
@@ -156,10 +397,10 @@ class BlockBase(metaclass=abc.ABCMeta):
         if issubclass(cls, BuildInBlockBase):
             return None
 
-        # 註冊 block
-        # print('cls._get_register_dict()', cls._get_register_dict())
+        # 註冊 block (註冊用的 dict 只產生一次，每個積木實例初始化時共用)
+        register_dict = cls._get_register_dict()
         Blockly.Blocks[cls._get_type_attr()] = {
-            "init": lambda: javascript.this().jsonInit(cls._get_register_dict()),
+            "init": lambda: javascript.this().jsonInit(register_dict),
         }
         return cls
 
@@ -179,10 +420,14 @@ class BlockBase(metaclass=abc.ABCMeta):
                 if _registered_subclass:
                     com_registered_subclass_list.append(_registered_subclass)
 
-        # 動態引入所有積木類
-        exec(f"from pysrc.models.blocks import *", globals())
+        BlockBase.import_block_classes()
         return com_registered_subclass_list
 
+    @staticmethod
+    def import_block_classes():
+        """ 動態引入所有積木類 (建立積木實例時以類名稱取得積木類) """
+        exec(f"from pysrc.models.blocks import *", globals())
+
     def get_xml_str(
             self,
             formatting: bool = False,
@@ -196,116 +441,208 @@ class BlockBase(metaclass=abc.ABCMeta):
         Returns:
             str
         """
+        # 將整個積木樹的 xml 片段依序寫入同一個緩衝串列，最後再一次組合成字串
+        xml_str_buffer: List[str] = []
+        self._write_xml_str(xml_str_buffer, next_block_list)
+        com_xml_str = ''.join(xml_str_buffer)
+        if formatting:
+            return prettify_xml_str(com_xml_str)
+        return com_xml_str
+
+    def _write_xml_str(
+            self,
+            xml_str_buffer: List[str],
+            next_block_list: List['BlockBase'] = None):
+        """ 將 block 的 xml 片段寫入緩衝串列
 
-        # 建立內容為空的 block node
-        xml = doc.implementation.createDocument("", "", None)
-        block_node = xml.createElement("block")
-        block_node.setAttribute("type", self.__class__._get_type_attr())
-        block_node.setAttribute("id", uuid.uuid4().hex)
-
-        # 遍歷所有參數，並將參數值設置為 block node 的子節點
-        for arg_name, arg_dict in self.arg_dicts.items():
-            node_tag_name: Literal['value', 'statement'] = "unknow"
-            inner_html: str = ""
-
-            # 獲取 block node 的 inner html: 若該參數為 input 型參數 (有外接積木輸入參數)
-            if arg_dict['type'].startswith('input_'):
-                # 獲取參數類型名稱 (`value` or `statement`)
-                _, node_tag_name = arg_dict['type'].split('_')
-                # 嘗試獲取該參數的 attr: 若找不到，則設置 inner html 為空字串
-                if not hasattr(self, arg_name):
-                    inner_html = " "
-                else:
-                    arg_obj = getattr(self, arg_name)
-                    assert isinstance(
-                        arg_obj, BlockBase) or isinstance(arg_obj, list)
-                    # 若該參數的 attr 為 BlockBase 型別，則設置 inner html 為 xml 字串
-                    if isinstance(arg_obj, BlockBase):
-                        inner_html = arg_obj.get_xml_str()
-                    # 若該參數的 attr 為 List['BlockBase'] 型別，則使用迭代方法逐個處理積木列表
-                    elif isinstance(arg_obj, list):
-                        block_list: List['BlockBase'] = arg_obj
-                        if not block_list:
-                            inner_html = " "
-                        else:
-                            inner_html = block_list[0].get_xml_str(
-                                next_block_list=block_list[1:]
-                            )
-            # 若該參數為 field 型參數 (沒有外接積木輸入參數)，就直接設置 inner html 為參數值
-            elif arg_dict['type'].startswith('field_'):
-                node_tag_name = "field"
-                inner_html = getattr(self, arg_name, " ")
-
-            # 建立 block node 的子節點，並將 inner html 設置為子節點的 inner html
-            sub_block_node = xml.createElement(node_tag_name)
-            sub_block_node.innerHTML = inner_html
-            sub_block_node.setAttribute("name", arg_name)
-            block_node.appendChild(sub_block_node)
-
-        # 若需要處理 next node，則使用迭代方法逐個處理積木列表
-        if next_block_list:
-            next_block_node = xml.createElement("next")
-            next_block_node.innerHTML = next_block_list[0].get_xml_str(
-                next_block_list=next_block_list[1:]
+        以工作堆疊取代遞迴: 堆疊中的項目為待寫入的 xml 片段字串，
+        或待展開的積木 (積木, 所屬的積木串列, 下一個積木於串列中的索引)，
+        因此很長的積木串列或很深的巢狀積木也不會超過遞迴上限，且不需複製串列
+
+        Args:
+            xml_str_buffer (List[str]): xml 片段緩衝串列
+            next_block_list (List['BlockBase']): 使用 next node 關聯的積木串列. Defaults to None.
+        """
+        profiler = BlockBase.profiler
+        # 啟用效能分析時，None 表示該積木 (不含以 next node 關聯的積木) 已寫入完畢
+        work_stack: List[Union[str, Tuple['BlockBase', List['BlockBase'], int], None]] = [
+            (self, next_block_list or [], 0)
+        ]
+        while work_stack:
+            work = work_stack.pop()
+            if isinstance(work, str):
+                xml_str_buffer.append(work)
+                continue
+            if work is None:
+                profiler.stop()
+                continue
+
+            block, block_list, next_block_index = work
+            if profiler is not None:
+                profiler.start(block.__class__.__name__, 'serialize')
+            # 建立 block node 的開頭標籤
+            xml_str_buffer.append(
+                f'<block type="{escape_xml_attr(block._get_type_attr())}" id="{uuid.uuid4().hex}">'
             )
-            block_node.appendChild(next_block_node)
 
-        return xml_to_str(block_node, formatting)
+            # 依序記錄 block node 的子節點內容，最後再反向推入堆疊
+            sub_work_list = []
+            # 遍歷所有參數，並將參數值寫入為 block node 的子節點
+            for arg_name, arg_type in block._arg_name_and_type_list:
+                # 若該參數為 input 型參數 (有外接積木輸入參數)
+                if arg_type.startswith('input_'):
+                    # 獲取參數類型名稱 (`value` or `statement`)
+                    _, node_tag_name = arg_type.split('_')
+                    sub_work_list.append(
+                        f'<{node_tag_name} name="{escape_xml_attr(arg_name)}">')
+                    arg_obj = getattr(block, arg_name, None)
+                    # 若找不到該參數的 attr，或為空的積木列表，則子節點內容為空白
+                    if arg_obj is None or (isinstance(arg_obj, list) and not arg_obj):
+                        sub_work_list.append(" ")
+                    # 若該參數的 attr 為 BlockBase 型別，則寫入積木的 xml 片段
+                    elif isinstance(arg_obj, BlockBase):
+                        sub_work_list.append((arg_obj, [], 0))
+                    # 若該參數的 attr 為 List['BlockBase'] 型別，則使用 next node 關聯積木列表
+                    else:
+                        assert isinstance(arg_obj, list)
+                        sub_work_list.append((arg_obj[0], arg_obj, 1))
+                    sub_work_list.append(f'</{node_tag_name}>')
+                # 若該參數為 field 型參數 (沒有外接積木輸入參數)，就直接寫入參數值；
+                # 舊版白板沒有的 field (載入時為空積木) 不寫入 (同 `get_json_dict`)
+                elif arg_type.startswith('field_'):
+                    if isinstance(getattr(block, arg_name, None), BlockBase):
+                        continue
+                    sub_work_list.append(
+                        f'<field name="{escape_xml_attr(arg_name)}">'
+                        f'{escape_xml_text(str(getattr(block, arg_name, " ")))}'
+                        '</field>'
+                    )
+                # 其他類型的參數 (不應出現) 寫入為空的 unknow 節點 (同舊版的 DOM 序列化)
+                else:
+                    sub_work_list.append(
+                        f'<unknow name="{escape_xml_attr(arg_name)}"></unknow>')
+
+            if profiler is not None:
+                sub_work_list.append(None)
+
+            # 若積木串列中還有下一個積木，則以 next node 關聯
+            if next_block_index < len(block_list):
+                sub_work_list.extend([
+                    '<next>',
+                    (block_list[next_block_index], block_list, next_block_index + 1),
+                    '</next>',
+                ])
+
+            sub_work_list.append('</block>')
+            work_stack.extend(reversed(sub_work_list))
 
     @staticmethod
-    def create_from_block_node(
-            block_node: browser.DOMNode,
-            arg_name: str,
-            find_all_next_block: bool = False) -> Union['BlockBase', List['BlockBase']]:
-        """ 從 block node 建立積木實例
+    def get_block_class(block_node: DomNode) -> Type['BlockBase']:
+        """ 根據 block node 的 type 屬性獲取積木類
 
         Args:
-            block_node(browser.DOMNode)
-            arg_name(str): 參數名稱
-            find_all_next_block(bool): 是否找出所有下一個 block, 若為 True 則會回傳積木串列. Defaults to False.
+            block_node (DomNode)
 
         Returns:
-            Union[BlockBase, List[BlockBase]
+            Type[BlockBase]
         """
+        return BlockBase.get_block_class_by_type(dom.get_attr(block_node, 'type'))
 
-        # 獲取對應參數名稱的節點
-        input_node = next(
-            (
-                sub_block_node for sub_block_node in block_node.children
-                if sub_block_node.attrs.get("name") == arg_name
-            ), None
-        )
-        # 若無對應名稱的節點，或該節點蟹無積木，則回傳空積木
-        if input_node is None:
-            return eval('EmptyBlock()') if not find_all_next_block else [eval('EmptyBlock()')]
-        input_block_node = input_node.select_one('block')
-        if input_block_node is None:
-            return eval('EmptyBlock()') if not find_all_next_block else [eval('EmptyBlock()')]
-
-        # 將節點積木實例化 (若不可實例化則實例化空積木)
-        input_block_type: str = input_block_node.attrs['type']
-        input_block_class_name = f"{to_camel_case(input_block_type)}Block"
-        input_block_class: BlockBase = eval(input_block_class_name)
-        input_block = next(iter(
-            input_block_class.create_blocks_from_xml_str(
-                input_node.innerHTML
-            )), eval('EmptyBlock()')
-        )
+    @staticmethod
+    def get_block_class_by_type(block_type: str) -> Type['BlockBase']:
+        """ 根據 type 屬性的值 (類名稱的 snake case) 獲取積木類
 
-        # 若設定不再尋找下一個積木，則回傳實例化積木
-        if not find_all_next_block:
-            return input_block
-
-        # 若設定尋找所有下一個積木，則遍歷所有下一個積木進行實例化
-        input_block_list = [input_block]
-        statement_next_node = input_node.select_one('next')
-        if statement_next_node:
-            input_block_list.extend(
-                BlockBase.create_blocks_from_xml_str(
-                    statement_next_node.innerHTML
-                )
-            )
-        return input_block_list
+        Args:
+            block_type (str)
+
+        Returns:
+            Type[BlockBase]
+        """
+        return eval(f"{to_camel_case(block_type)}Block")
+
+    @staticmethod
+    def get_sub_node(
+            node: DomNode,
+            tag_name: Optional[str] = None,
+            name: Optional[str] = None) -> Optional[DomNode]:
+        """ 獲取第一個符合標籤名稱與 name 屬性的直接子節點
+
+        Args:
+            node (DomNode)
+            tag_name (Optional[str], optional): 大寫的標籤名稱 (如 'BLOCK')，None 表示不限. Defaults to None.
+            name (Optional[str], optional): name 屬性，None 表示不限. Defaults to None.
+
+        Returns:
+            Optional[DomNode]
+        """
+        for sub_node in dom.get_children(node):
+            if tag_name is not None and dom.get_tag_name(sub_node) != tag_name:
+                continue
+            if name is not None and dom.get_attr(sub_node, 'name') != name:
+                continue
+            return sub_node
+        return None
+
+    @staticmethod
+    def get_next_block_node(block_node: DomNode) -> Optional[DomNode]:
+        """ 獲取以 next node 關聯的下一個 block node (next>block)
+
+        Args:
+            block_node (DomNode)
+
+        Returns:
+            Optional[DomNode]
+        """
+        next_node = BlockBase.get_sub_node(block_node, 'NEXT')
+        if next_node is None:
+            return None
+        return BlockBase.get_sub_node(next_node, 'BLOCK')
+
+    @staticmethod
+    def create_from_block_node(block_node: DomNode) -> 'BlockBase':
+        """ 從 block node 建立積木實例 (含所有子層積木)
+
+        以工作框堆疊取代遞迴: 子層積木節點實例化完成後，再回到上層工作框繼續處理其餘參數，
+        statement 中以 next node 關聯的積木串列則於同一個工作框中依序處理
+
+        Args:
+            block_node(DomNode)
+
+        Returns:
+            BlockBase: 積木實例 (若該積木為停用，則回傳空積木)
+        """
+        # 若該積木為停用，則置入空積木
+        if dom.get_attr(block_node, 'disabled') == 'true':
+            return eval('EmptyBlock()')
+
+        profiler = BlockBase.profiler
+        frame_stack = [BlockNodeFrame(block_node)]
+        if profiler is not None:
+            profiler.start(frame_stack[-1].block_class.__name__, 'create')
+        sub_block: Optional[BlockBase] = None
+        while True:
+            frame = frame_stack[-1]
+            # 將剛實例化完成的子層積木交給上層工作框
+            if sub_block is not None:
+                frame.receive(sub_block)
+                sub_block = None
+
+            sub_block_node = frame.get_next_sub_block_node()
+            # 工作框中的參數皆已處理完畢: 實例化積木
+            if sub_block_node is None:
+                frame_stack.pop()
+                sub_block = frame.create_block()
+                if profiler is not None:
+                    profiler.stop()
+                if not frame_stack:
+                    return sub_block
+            # 子層積木為停用，則置入空積木
+            elif dom.get_attr(sub_block_node, 'disabled') == 'true':
+                sub_block = eval('EmptyBlock()')
+            else:
+                frame_stack.append(BlockNodeFrame(sub_block_node))
+                if profiler is not None:
+                    profiler.start(frame_stack[-1].block_class.__name__, 'create')
 
     @staticmethod
     def create_blocks_from_xml_str(xml_str: str) -> List['BlockBase']:
@@ -320,76 +657,311 @@ class BlockBase(metaclass=abc.ABCMeta):
         Returns:
             BlockBase: 積木實例
         """
-        com_block_list = []
-
         # 遍歷所有獨立的 blocks
-        xml_div = DIV(xml_str)
-        _block_node_list = xml_div.select('xml>block') or [
-            child_note for child_note in xml_div.children
-            if child_note.tagName == 'BLOCK'
+        xml_div = dom.parse_xml_str(xml_str)
+        _block_node_list = dom.select(xml_div, 'xml>block') or [
+            child_note for child_note in dom.get_children(xml_div)
+            if dom.get_tag_name(child_note) == 'BLOCK'
         ]
 
         # 遍歷所有 next blocks
         block_node_list = []
         for block_node in _block_node_list:
-            block_node_list.append(block_node)
             # 不斷取得下一個 block node (next>block)
-            while True:
-                next_node = next(
-                    (
-                        child_note for child_note in block_node.children
-                        if child_note.tagName == 'NEXT'
-                    ), None
-                )
-                if not next_node:
-                    break
-                block_node = next_node.select_one('block')
+            while block_node is not None:
                 block_node_list.append(block_node)
+                block_node = BlockBase.get_next_block_node(block_node)
 
         # 遍歷積木節點，將節點積木實例化
-        for block_node in block_node_list:
-            # 若該積木為停用，則置入空積木
-            if block_node.attrs.get('disabled') == 'true':
-                com_block_list.append(eval('EmptyBlock()'))
+        return [
+            BlockBase.create_from_block_node(block_node)
+            for block_node in block_node_list
+        ]
+
+    def get_json_dict(self, next_block_list: List['BlockBase'] = None) -> dict:
+        """ 產生 block 的 json 字典 (Blockly 的 json 序列化格式，不含 id 與座標)，如:
+            {
+                "type": "msgbox",
+                "inputs": {"TEXT": {"block": {"type": "text", "fields": {"TEXT": "Hi"}}}},
+                "next": {"block": {...}},
+            }
+
+        以工作堆疊取代遞迴 (同 `_write_xml_str`)
+
+        Args:
+            next_block_list (List['BlockBase']): 使用 next 關聯的積木串列. Defaults to None.
+
+        Returns:
+            dict
+        """
+        profiler = BlockBase.profiler
+        com_block_json = {}
+        # (積木, 寫入的 json 字典, 所屬的積木串列, 下一個積木於串列中的索引)；
+        # 啟用效能分析時，None 表示該積木 (不含以 next 關聯的積木) 已寫入完畢
+        work_stack: List[Optional[Tuple['BlockBase', dict, List['BlockBase'], int]]] = [
+            (self, com_block_json, next_block_list or [], 0)
+        ]
+        while work_stack:
+            work = work_stack.pop()
+            if work is None:
+                profiler.stop()
                 continue
 
-            # 分析 block 的 type，並準備建立積木實例的參數字典
-            block_type: str = block_node.attrs['type']
-            block_class_name = f"{to_camel_case(block_type)}Block"
-            block_class: BlockBase = eval(block_class_name)
-            block_kwargs = {}
-
-            # 遍歷 block 的 args: 將子層積木實例化 或者獲取 field 值
-            for arg_name, arg_dict in block_class.arg_dicts.items():
-
-                # 若 arg 類型為 input_value ，就賦值 [實例化子層積木] 至 block_kwargs
-                if arg_dict['type'] == 'input_value':
-                    value_block: BlockBase = BlockBase.create_from_block_node(
-                        block_node, arg_name)
-                    block_kwargs[arg_name] = value_block
-
-                # 若 arg 類型為 input_statement，就賦值 [實例化子層積木列表] 至 block_kwargs
-                elif arg_dict['type'] == 'input_statement':
-                    statement_block_list: List[BlockBase] = BlockBase.create_from_block_node(
-                        block_node, arg_name, find_all_next_block=True)
-                    block_kwargs[arg_name] = statement_block_list
-
-                # 若 arg 類型為 field 類，就獲取 field 值
-                elif arg_dict['type'].startswith('field_'):
-                    node_tag_name = "field"
-                    field_node = next(
-                        (
-                            sub_block_node for sub_block_node in block_node.children
-                            if sub_block_node.tagName == node_tag_name.upper() and sub_block_node.getAttribute('name') == arg_name
-                        ), None
-                    )
-                    if field_node is None:
-                        block_kwargs[arg_name] = eval('EmptyBlock()')
+            block, block_json, block_list, next_block_index = work
+            if profiler is not None:
+                profiler.start(block.__class__.__name__, 'serialize')
+            block_json['type'] = block._get_type_attr()
+            field_name_mapping_value_dict = {}
+            input_name_mapping_input_json_dict = {}
+            sub_work_list = []
+            for arg_name, arg_type in block._arg_name_and_type_list:
+                arg_obj = getattr(block, arg_name, None)
+                if arg_type.startswith('input_'):
+                    # 空的輸入不寫入 (空積木與空的積木列表)
+                    if isinstance(arg_obj, list):
+                        arg_obj = [sub_block for sub_block in arg_obj if not sub_block.is_empty]
+                        if not arg_obj:
+                            continue
+                        sub_block, sub_block_list, sub_next_block_index = arg_obj[0], arg_obj, 1
+                    elif isinstance(arg_obj, BlockBase) and not arg_obj.is_empty:
+                        sub_block, sub_block_list, sub_next_block_index = arg_obj, [], 0
+                    else:
                         continue
-                    block_kwargs[arg_name] = field_node.innerHTML
+                    sub_block_json = {}
+                    input_name_mapping_input_json_dict[arg_name] = {'block': sub_block_json}
+                    sub_work_list.append((sub_block, sub_block_json, sub_block_list, sub_next_block_index))
+                elif arg_type.startswith('field_') and arg_obj is not None \
+                        and not isinstance(arg_obj, BlockBase):
+                    field_name_mapping_value_dict[arg_name] = str(arg_obj)
+            if field_name_mapping_value_dict:
+                block_json['fields'] = field_name_mapping_value_dict
+            if input_name_mapping_input_json_dict:
+                block_json['inputs'] = input_name_mapping_input_json_dict
+
+            # 若積木串列中還有下一個積木，則以 next 關聯 (最後才處理，不計入本積木的累計時間)
+            if next_block_index < len(block_list):
+                next_block_json = {}
+                block_json['next'] = {'block': next_block_json}
+                work_stack.append(
+                    (block_list[next_block_index], next_block_json, block_list, next_block_index + 1)
+                )
+            if profiler is not None:
+                work_stack.append(None)
+            work_stack.extend(sub_work_list)
+        return com_block_json
+
+    @staticmethod
+    def get_workspace_json(blocks: List['BlockBase']) -> dict:
+        """ 產生白板的 json 字典 (Blockly 的 json 序列化格式)
+
+        Args:
+            blocks (List[BlockBase]): 白板上的積木
+
+        Returns:
+            dict: {"blocks": {"languageVersion": 0, "blocks": [積木 json 字典, ...]}}
+        """
+        return {
+            'blocks': {
+                'languageVersion': 0,
+                'blocks': [
+                    block.get_json_dict() for block in blocks
+                    if not block.is_empty
+                ],
+            },
+        }
+
+    @staticmethod
+    def get_next_block_json(block_json: dict) -> Optional[dict]:
+        """ 獲取以 next 關聯的下一個積木 json 字典
+
+        Args:
+            block_json (dict)
+
+        Returns:
+            Optional[dict]
+        """
+        return (block_json.get('next') or {}).get('block')
+
+    @staticmethod
+    def create_from_block_json(block_json: dict) -> 'BlockBase':
+        """ 從積木 json 字典建立積木實例 (含所有子層積木)，以工作框堆疊取代遞迴 (同 `create_from_block_node`)
+
+        Args:
+            block_json (dict)
+
+        Returns:
+            BlockBase: 積木實例 (若該積木為停用，則回傳空積木)
+        """
+        if block_json.get('enabled') is False:
+            return eval('EmptyBlock()')
+
+        profiler = BlockBase.profiler
+        frame_stack = [BlockJsonFrame(block_json)]
+        if profiler is not None:
+            profiler.start(frame_stack[-1].block_class.__name__, 'create')
+        sub_block: Optional[BlockBase] = None
+        while True:
+            frame = frame_stack[-1]
+            if sub_block is not None:
+                frame.receive(sub_block)
+                sub_block = None
+
+            sub_block_json = frame.get_next_sub_block_json()
+            if sub_block_json is None:
+                frame_stack.pop()
+                sub_block = frame.create_block()
+                if profiler is not None:
+                    profiler.stop()
+                if not frame_stack:
+                    return sub_block
+            elif sub_block_json.get('enabled') is False:
+                sub_block = eval('EmptyBlock()')
+            else:
+                frame_stack.append(BlockJsonFrame(sub_block_json))
+                if profiler is not None:
+                    profiler.start(frame_stack[-1].block_class.__name__, 'create')
 
-            com_block_list.append(block_class(**block_kwargs))
-        return com_block_list
+    @staticmethod
+    def create_blocks_from_workspace_json(workspace_json: Union[str, dict]) -> List['BlockBase']:
+        """ 從白板的 json 字典 (或 json 字串) 建立積木實例
+
+        Args:
+            workspace_json (Union[str, dict]): Blockly 的 json 序列化格式
+
+        Returns:
+            List[BlockBase]: 積木實例 (以 next 關聯的積木各自成為一個積木)
+        """
+        if isinstance(workspace_json, str):
+            workspace_json = json.loads(workspace_json)
+
+        block_json_list = []
+        for block_json in (workspace_json.get('blocks') or {}).get('blocks') or []:
+            while block_json is not None:
+                block_json_list.append(block_json)
+                block_json = BlockBase.get_next_block_json(block_json)
+        return [
+            BlockBase.create_from_block_json(block_json)
+            for block_json in block_json_list
+        ]
+
+    def get_sub_block_list(self) -> List['BlockBase']:
+        """ 獲取直接子層積木: input_value 參數的積木，與 input_statement 參數的積木串列
+
+        Returns:
+            List[BlockBase]
+        """
+        com_sub_block_list = []
+        for arg_name in self._input_value_arg_names:
+            arg_obj = getattr(self, arg_name, None)
+            if isinstance(arg_obj, BlockBase):
+                com_sub_block_list.append(arg_obj)
+        for arg_name in self._input_statement_arg_names:
+            arg_obj = getattr(self, arg_name, None)
+            if isinstance(arg_obj, BlockBase):
+                com_sub_block_list.append(arg_obj)
+            elif isinstance(arg_obj, list):
+                com_sub_block_list.extend(arg_obj)
+        return com_sub_block_list
+
+    def prepare_lower_expr(self):
+        """ 由最深層的子積木開始，預先降階 (並快取) 所有物件型子積木的運算式
+
+        以後序遍歷的工作堆疊取代遞迴，之後上層積木呼叫子積木的 `lower_expr()` 時直接取得快取，
+        因此很深的巢狀運算積木也不會超過遞迴上限
+        """
+        work_stack: List[Tuple['BlockBase', bool]] = [(self, False)]
+        while work_stack:
+            block, sub_blocks_visited = work_stack.pop()
+            if sub_blocks_visited:
+                if isinstance(block, ObjectBlockBase):
+                    block.lower_expr()
+                continue
+            work_stack.append((block, True))
+            work_stack.extend(
+                (sub_block, False) for sub_block in block.get_sub_block_list()
+            )
+
+    def lower(self) -> List[ir.Node]:
+        """ 將積木降階成 IR 節點: 動作型積木為陳述式，熱鍵/熱字串積木為頂層項目
+
+        Returns:
+            List[ir.Node]
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} 無法降階成 IR")
+
+    def profiled_lower(self) -> List[ir.Node]:
+        """ 將積木降階成 IR 節點 (啟用效能分析時記錄該積木類的耗時)
+
+        Returns:
+            List[ir.Node]
+        """
+        profiler = BlockBase.profiler
+        if profiler is None:
+            return self.lower()
+        profiler.start(self.__class__.__name__, 'ahkscr')
+        try:
+            return self.lower()
+        finally:
+            profiler.stop()
+
+    @staticmethod
+    def start_profiling() -> BlockProfiler:
+        """ 開始效能分析: 之後建立、降階與序列化積木時，皆依積木類記錄耗時
+
+        Returns:
+            BlockProfiler
+        """
+        BlockBase.profiler = BlockProfiler()
+        return BlockBase.profiler
+
+    @staticmethod
+    def stop_profiling() -> Optional[BlockProfiler]:
+        """ 結束效能分析
+
+        Returns:
+            Optional[BlockProfiler]: 結束前的效能分析器
+        """
+        profiler = BlockBase.profiler
+        BlockBase.profiler = None
+        return profiler
+
+    def lower_expr(self) -> Optional[ir.Expr]:
+        """ 將物件型積木降階成 IR 運算式
+
+        Returns:
+            Optional[ir.Expr]: 沒有值時 (如空積木) 回傳 None
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} 無法降階成運算式")
+
+    @staticmethod
+    def lower_statements(blocks: List['BlockBase']) -> List[ir.Stmt]:
+        """ 將 statement 參數的積木串列降階成陳述式串列
+
+        Args:
+            blocks (List[BlockBase])
+
+        Returns:
+            List[ir.Stmt]
+        """
+        return [
+            stmt
+            for block in blocks
+            for stmt in block.profiled_lower()
+        ]
+
+    def ahkscr(self) -> str:
+        """ 積木的 AHK 代碼 (由 IR 產生)
+
+        Returns:
+            str
+        """
+        com_ahkscr_list = []
+        for node in self.profiled_lower():
+            if isinstance(node, ir.Stmt):
+                com_ahkscr_list.append(codegen.stmt_to_ahkscr(node))
+            else:
+                com_ahkscr_list.append(codegen.top_level_to_ahkscr(node))
+        return "\n".join(com_ahkscr_list)
 
     class Colour:
         String = 160
@@ -438,6 +1010,10 @@ class InputsExternalBlockBase(BlockBase):
 
 class ObjectBlockBase(BlockBase):
     """ 物件型積木: 有 output """
+
+    def ahkscr(self) -> str:
+        return codegen.expr_to_ahkscr(self.lower_expr())
+
     @classmethod
     def _get_register_dict(cls):
         return {
@@ -479,6 +1055,10 @@ class NormalKeyBlockBase(ObjectBlockBase):
             "output": "normal_key",
         }
 
+    def lower_expr(self) -> None:
+        """ 按鍵積木不是運算式 (上層積木以 `ahkscr(to_be_send=...)` 取得按鍵文字) """
+        return None
+
 
 class HotKeyBlockBase(ObjectBlockBase):
     """ 熱鍵型積木 """
@@ -489,6 +1069,10 @@ class HotKeyBlockBase(ObjectBlockBase):
             "output": "hot_key",
         }
 
+    def lower_expr(self) -> None:
+        """ 按鍵積木不是運算式 (上層積木以 `ahkscr(to_be_send=...)` 取得按鍵文字) """
+        return None
+
 
 class FilepathBlockBase(ObjectBlockBase):
     """ 檔案型積木 """
@@ -1,4 +1,4 @@
-from typing import Iterable, List
+from typing import Dict, Iterable, List, Optional, Union
 import uuid
 import json
 
@@ -13,10 +13,11 @@ from browser.local_storage import storage
 
 from pysrc.utils import (
     Blockly,
+    escape_xml_attr,
     xml_to_str,
-    AHK_PROCESS_PID_FILENAME,
 )
 from pysrc.models.block_bases import BlockBase
+from pysrc import codegen, compiler, workspace_json
 
 
 class BlocklyBoard:
@@ -28,19 +29,19 @@ class BlocklyBoard:
     # AHK 置頂程式碼: 腳本設定
 
     @classmethod
-    def get_header_ahkscr(cls) -> str:
-        """ 取得 AHK 置頂程式碼: 腳本設定 """
-        return "\n".join([
-            "#SingleInstance, Force",
-            "#NoEnv",
-            "SendMode Input",
-            "SetWorkingDir, %A_ScriptDir%",
-            f'pid_filepath:=A_Temp . "/{AHK_PROCESS_PID_FILENAME}.txt"',
-            'FileDelete % pid_filepath',
-            'FileAppend, % DllCall("GetCurrentProcessId"), %pid_filepath%',
-            "SwitchToAdmin()"*doc['run_as_admin_checkbox'].checked,
-            "\n",
-        ])
+    def get_header_ahkscr(cls, runtime_tuning_dict: Optional[Dict[str, str]] = None) -> str:
+        """ 取得 AHK 置頂程式碼: 腳本設定
+
+        Args:
+            runtime_tuning_dict (Optional[Dict[str, str]], optional): 執行期設定 (見 `compiler.optimize_blocks`). Defaults to None.
+
+        Returns:
+            str
+        """
+        return compiler.get_header_ahkscr(
+            run_as_admin=doc['run_as_admin_checkbox'].checked,
+            runtime_tuning_dict=runtime_tuning_dict,
+        )
 
     class Toolbox:
         """ Blockly 工具箱 """
@@ -55,11 +56,11 @@ class BlocklyBoard:
 
             def get_xml_str(self) -> str:
                 """ 取得 XML 字串 """
-                xml_str = f'<category name="{self.name}" colour="{self.colour}">'
-                for block in self.blocks:
-                    xml_str += block.get_xml_str()
-                xml_str += '</category>'
-                return xml_str
+                return ''.join([
+                    f'<category name="{escape_xml_attr(self.name)}" colour="{escape_xml_attr(self.colour)}">',
+                    *[block.get_xml_str() for block in self.blocks],
+                    '</category>',
+                ])
 
         def __init__(self, categories: List[Category]):
             self.categories = categories
@@ -83,10 +84,10 @@ class BlocklyBoard:
             "horizontalLayout": False,
             "toolboxPosition": 'start',
             "css": True,
-            "media": 'https://blockly-demo.appspot.com/static/media/',
+            "media": self.media,
             "rtl": False,
             "scrollbars": True,
-            "sounds": True,
+            "sounds": self.sounds,
             "oneBasedIndex": True,
             "grid": {
                 "spacing": 20,
@@ -107,16 +108,23 @@ class BlocklyBoard:
     def __init__(
             self,
             toolbox: Toolbox,
-            block: BlockBase = None,):  # TODO: 要改為初始化多個白板上的積木
+            block: BlockBase = None,  # TODO: 要改為初始化多個白板上的積木
+            media: str = 'static/media/',
+            sounds: bool = False,):
         """ Blockly 白板
 
         Args:
             toolbox (Toolbox): 積木工具欄
             block (BlockBase, optional): 初始化後白板上的積木. Defaults to None.
+            media (str, optional): Blockly 媒體檔 (精靈圖、音效) 路徑. Defaults to 'static/media/'.
+            sounds (bool, optional): 是否啟用音效 (啟用後載入時會下載音效檔，
+                若使用本地媒體路徑，需另將 click/delete/disconnect 音效檔置於該目錄). Defaults to False.
         """
         self.blockly_id = f"_{uuid.uuid4().hex}"
         self.toolbox = toolbox
         self.block = block
+        self.media = media
+        self.sounds = sounds
 
     def inject(self):
         """ 注入白板、工具箱、積木至網頁中 """
@@ -126,10 +134,11 @@ class BlocklyBoard:
             doc['ahkscr_textarea'].value = ''
             doc['xml_textarea'].value = ''
 
-        def _save_xml_to_local_storage(ev):
-            """ 儲存 XML 字串至 local storage """
+        def _save_workspace_json_to_local_storage(ev):
+            """ 儲存白板的 json 字串至 local storage (不含積木 id，較 XML 字串精簡) """
             if ev.type not in ['ui', 'finished_loading']:
-                storage['xml'] = self.get_xml_str()
+                storage['workspace_json'] = workspace_json.dumps(
+                    self.get_workspace_json())
 
         # 檢驗是否 html 已有對應的白板 id 元素
         assert doc.select_one(f"#{self.blockly_id}") != None,\
@@ -141,23 +150,32 @@ class BlocklyBoard:
             self._get_option_dict(),
         )
 
-        # 建立 Blockly 白板裡的積木內容 (自 local_storage 或參數 block 取得)
-        if storage.get('xml'):
+        # 建立 Blockly 白板裡的積木內容 (自 local_storage 或參數 block 取得；舊版儲存的 XML 字串於下次儲存時改為 json)
+        if storage.get('workspace_json'):
+            self.load_workspace_json(storage['workspace_json'])
+        elif storage.get('xml'):
             self.load_xml_str(storage['xml'])
+            del storage['xml']
         elif self.block:
-            self.load_xml_str(self.block.get_xml_str())
+            self.load_workspace_json(
+                BlockBase.get_workspace_json([self.block]))
 
         # 設定監聽事件: 積木更改時，清空 xml 與 ahk 代碼區塊
         self.workspace.addChangeListener(_clear_xml_and_ahk_code_area)
 
-        # 設定監聽事件: 積木更改時，紀錄 xml 至 local_storage
-        self.workspace.addChangeListener(_save_xml_to_local_storage)
+        # 設定監聽事件: 積木更改時，紀錄 json 至 local_storage
+        self.workspace.addChangeListener(_save_workspace_json_to_local_storage)
 
     def get_xml_str(self) -> str:
         """ 取得 XML 字串 """
         xml = Blockly.Xml.workspaceToDom(self.workspace)
         return xml_to_str(xml)
 
+    def get_workspace_json(self) -> dict:
+        """ 取得白板的 json 字典 (Blockly 的 json 序列化格式，不含積木 id) """
+        return workspace_json.xml_str_to_workspace_json(
+            self.get_xml_str(), keep_ids=False)
+
     async def get_ahk_func_name_list(self) -> List[str]:
         """ 獲取 AHK 函式名稱列表
 
@@ -183,39 +201,49 @@ class BlocklyBoard:
         return json.loads(res.data)
 
     async def get_ahkscr(self) -> str:
-        """ 取得 AHK 代碼 """
-        from pysrc.models.block_bases import ObjectBlockBase, SettingBlockBase
-
-        # 獲取 AHK 置頂程式碼: 腳本設定
-        header_ahkscr = self.get_header_ahkscr()
-
-        # 獲取 AHK 積木程式碼腳本字串: 先自白板獲取 xml 字串
-        xml_str = self.get_xml_str()
-        # 將 xml 字串解析成多個積木元素，再逐一取得積木 AHK 字串
-        block_ahkscr_list = [
-            block.ahkscr()
-            for block in BlockBase.create_blocks_from_xml_str(xml_str)
-            # 排除不能單獨編譯的積木: 物件型積木、設定型積木
-            if not issubclass(block.__class__, ObjectBlockBase) and not issubclass(block.__class__, SettingBlockBase)
-            # 排除積木沒有 ahk 代碼的積木(如:空積木)
-            if block.ahkscr()
-        ]
-        # 將不同積木的 AHK 代碼段落之間隔一行空白
-        block_ahkscr = "\n\n".join(block_ahkscr_list)
+        """ 取得 AHK 代碼: 優先由伺服器編譯 (有編譯快取)，伺服器無回應時改於瀏覽器編譯 """
+        workspace_json_dict = self.get_workspace_json()
+
+        # POST 請求: 送出白板的 json 字典由伺服器編譯
+        res = await aio.post(
+            '/api/compile',
+            data=workspace_json.dumps(dict(
+                workspace_json=workspace_json_dict,
+                run_as_admin=doc['run_as_admin_checkbox'].checked,
+            )),
+        )
+        if res.status == 200:
+            return json.loads(res.data)
+
+        return await self.compile_ahkscr(workspace_json_dict)
+
+    async def compile_ahkscr(self, workspace_json_dict: dict) -> str:
+        """ 於瀏覽器編譯 AHK 代碼
+
+        Args:
+            workspace_json_dict (dict): 白板的 json 字典
+
+        Returns:
+            str
+        """
+        # 將 json 字典解析成多個積木，降階並最佳化 (依白板的腳本設定積木)
+        program, runtime_tuning_dict = compiler.optimize_blocks(
+            compiler.create_workspace_blocks(workspace_json_dict))
+
+        # 獲取 AHK 置頂程式碼: 腳本設定 (含依工作負載選擇的執行期設定)
+        header_ahkscr = self.get_header_ahkscr(runtime_tuning_dict)
+
+        # 獲取 AHK 積木程式碼腳本字串
+        block_ahkscr = codegen.program_to_ahkscr(program)
 
         # 獲取關聯的 AHK 函數腳本字串
-        ahk_func_name_list = await self.get_ahk_func_name_list()
-        used_ahk_func_name_set = set(
-            func_name for func_name in ahk_func_name_list
-            if f"{func_name}(" in (header_ahkscr + block_ahkscr)
+        used_ahk_func_name_set = compiler.get_used_ahk_func_name_set(
+            header_ahkscr + block_ahkscr,
+            await self.get_ahk_func_name_list(),
         )
         ahk_funcs_script = await self.get_ahk_funcs_script(used_ahk_func_name_set)
-        ahk_funcs_script = (
-            '\n\n;' + ' function '.center(30, "=") + '\n\n'
-            + ahk_funcs_script
-        ) if ahk_funcs_script else ""
 
-        return header_ahkscr + block_ahkscr + ahk_funcs_script
+        return compiler.join_ahkscr(header_ahkscr, block_ahkscr, ahk_funcs_script)
 
     def load_xml_str(self, xml_str: str):
         """ 載入 XML 字串 """
@@ -230,6 +258,18 @@ class BlocklyBoard:
             self.workspace
         )
 
+    def load_workspace_json(self, workspace_json_dict: Union[str, dict]):
+        """ 載入白板的 json 字典 (或 json 字串)
+
+        Blockly 有 json 序列化 API 時直接載入，否則轉換成 XML 字串載入
+        """
+        if isinstance(workspace_json_dict, str):
+            workspace_json_dict = json.loads(workspace_json_dict)
+        if getattr(Blockly, 'serialization', None):
+            Blockly.serialization.workspaces.load(workspace_json_dict, self.workspace)
+            return
+        self.load_xml_str(workspace_json.workspace_json_to_xml_str(workspace_json_dict))
+
     def get_div(self) -> DIV:
         """ 取得 DIV 元素 """
         return DIV(id=self.blockly_id, style=dict(width="100%", height="600px"))
@@ -1,10 +1,9 @@
-import html
 import itertools
 import string
-from typing import Literal
+from typing import List, Literal, Optional
 
+from pysrc import ir, optimizer
 from pysrc.models.block_bases import *
-from pysrc.utils import TAB4_INDENT
 
 # TODO: ~擴充英文版積木
 
@@ -16,6 +15,12 @@ class EmptyBlock(BlockBase):
     def ahkscr(self, *args, **kwargs) -> Literal['']:
         return ''
 
+    def lower(self) -> List[ir.Node]:
+        return []
+
+    def lower_expr(self) -> None:
+        return None
+
 
 class TextBlock(StringBlockBase, BuildInBlockBase):
     """ 文字積木 """
@@ -27,9 +32,12 @@ class TextBlock(StringBlockBase, BuildInBlockBase):
 
     def ahkscr(self, with_quotes: bool = True) -> str:
         if with_quotes:
-            return f'"{self.TEXT}"'
+            return super().ahkscr()
         return self.TEXT
 
+    def lower_expr(self) -> ir.String:
+        return ir.String(self.TEXT)
+
 
 class MathNumberBlock(NumberBlockBase, BuildInBlockBase):
     """ 數字積木 """
@@ -39,8 +47,8 @@ class MathNumberBlock(NumberBlockBase, BuildInBlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
-        return str(self.NUM)
+    def lower_expr(self) -> ir.Number:
+        return ir.Number(str(self.NUM))
 
 
 class MsgboxBlock(ActionBlockBase):
@@ -54,8 +62,8 @@ class MsgboxBlock(ActionBlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
-        return f"Msgbox % {self.TEXT.ahkscr() or '\"\"'}"
+    def lower(self) -> List[ir.Stmt]:
+        return [ir.Command('Msgbox', [self.TEXT.lower_expr() or ir.String('')])]
 
 
 class NormalKeyBlock(NormalKeyBlockBase):
@@ -224,20 +232,48 @@ class HotKeyBlock(HotKeyBlockBase):
             self,
             to_be_send: bool = False,
             send_arg_str: str = None,) -> str:
-        # 獲取 A B 按鍵名稱
-        # AHK 中沒有 {Win} 按鍵，要改為 {LWin}
-        key_a_ahkscr = self.KEY_A if self.KEY_A != "Win" else "LWin"
-        key_b_ahkscr = self.KEY_B.ahkscr(
+        # 沿 B 按鍵收集巢狀的熱鍵積木 (以迭代取代遞迴，深層巢狀時不會超出遞迴上限)
+        hot_key_block_list: List[HotKeyBlock] = []
+        key_block = self
+        while isinstance(key_block, HotKeyBlock):
+            hot_key_block_list.append(key_block)
+            key_block = key_block.KEY_B
+
+        # 由最內層的按鍵開始，逐層往外組合按鍵文字
+        key_ahkscr = key_block.ahkscr(
             to_be_send=to_be_send,
             send_arg_str=send_arg_str,
         )
+        for hot_key_block in reversed(hot_key_block_list):
+            key_ahkscr = hot_key_block._join_key_ahkscr(
+                key_ahkscr,
+                to_be_send=to_be_send,
+                send_arg_str=send_arg_str,
+            )
+        return key_ahkscr
+
+    def _join_key_ahkscr(
+            self,
+            key_b_ahkscr: str,
+            to_be_send: bool = False,
+            send_arg_str: str = None,) -> str:
+        """ 組合 A 按鍵與 B 按鍵的文字
+
+        Args:
+            key_b_ahkscr (str): B 按鍵的文字 (無 B 按鍵時為空字串)
+            to_be_send (bool, optional): 是否以模擬按鍵的形式呼叫. Defaults to False.
+            send_arg_str (str, optional): 模擬按鍵的參數 (如按鍵次數). Defaults to None.
 
+        Returns:
+            str
+        """
+        # 獲取 A 按鍵名稱
+        # AHK 中沒有 {Win} 按鍵，要改為 {LWin}
+        key_a_ahkscr = self.KEY_A if self.KEY_A != "Win" else "LWin"
         # 獲取 A 按鍵符號
         key_a_chr_ahkscr = self.KEY_A
         for key_name, chr_key in self.KEY_AND_CHR_MAPPING_DICT.items():
             key_a_chr_ahkscr = key_a_chr_ahkscr.replace(key_name, chr_key)
-        # 解決 html 解碼問題
-        key_a_chr_ahkscr = html.unescape(key_a_chr_ahkscr)
 
         # 若以模擬按鍵的形式呼叫
         if to_be_send:
@@ -269,19 +305,8 @@ class ShortCutBlock(BlockBase):
         }
     }
 
-    def ahkscr(self) -> str:
-        do_block_ahksrc_line_str = [
-            do_block_ahksrc_line_str
-            for do_block in self.DO
-            for do_block_ahksrc_line_str in do_block.ahkscr().splitlines()
-        ]
-        # 根據執行積木的ahk指令行數，決定是否需要換行(縮排)，並於結尾加上Return
-        if len(do_block_ahksrc_line_str) == 1:
-            do_ahkscr = do_block_ahksrc_line_str[0]
-        else:
-            do_ahkscr = f"\n{TAB4_INDENT}" + \
-                f"\n{TAB4_INDENT}".join(do_block_ahksrc_line_str + ["Return"])
-        return ";"*(do_ahkscr == "") + f"{self.KEY.ahkscr()}:: {do_ahkscr}"
+    def lower(self) -> List[ir.Hotkey]:
+        return [ir.Hotkey(self.KEY.ahkscr(), self.lower_statements(self.DO))]
 
 
 class DisableShortCutBlock(BlockBase):
@@ -295,9 +320,9 @@ class DisableShortCutBlock(BlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
+    def lower(self) -> List[ir.Hotkey]:
         key_ahkscr = self.KEY.ahkscr()
-        return ";"*(key_ahkscr == "") + f"{key_ahkscr}:: Return"
+        return [ir.Hotkey(key_ahkscr, [ir.Command('Return')], disabled=key_ahkscr == "")]
 
 
 class ShortCutWithSettingBlock(BlockBase):
@@ -318,7 +343,7 @@ class ShortCutWithSettingBlock(BlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
+    def lower(self) -> List[ir.Hotkey]:
         # 獲取設定字符串
         setting_block = next(iter(self.SETTING))
         # 獲取按鍵積木: 套用設定字符串
@@ -327,20 +352,7 @@ class ShortCutWithSettingBlock(BlockBase):
             if not setting_block.is_empty else self.KEY.ahkscr()
         )
 
-        # 獲取執行積木 ahk 指令行
-        do_block_ahksrc_line_str = [
-            do_block_ahksrc_line_str
-            for do_block in self.DO
-            for do_block_ahksrc_line_str in do_block.ahkscr().splitlines()
-        ]
-        # 根據執行積木的ahk指令行數，決定是否需要換行(縮排)，並於結尾加上Return
-        if len(do_block_ahksrc_line_str) == 1:
-            do_ahkscr = do_block_ahksrc_line_str[0]
-        else:
-            do_ahkscr = f"\n{TAB4_INDENT}" + \
-                f"\n{TAB4_INDENT}".join(do_block_ahksrc_line_str + ["Return"])
-
-        return ";"*(do_ahkscr == "") + f"{key_ahksrc}:: {do_ahkscr}"
+        return [ir.Hotkey(key_ahksrc, self.lower_statements(self.DO))]
 
 
 class ShortCutSettingBlock(SettingBlockBase):
@@ -408,8 +420,8 @@ class OptionFileBlock(FilepathBlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
-        return self.OBJ
+    def lower_expr(self) -> ir.Raw:
+        return ir.Raw(self.OBJ)
 
 
 class OptionDirBlock(DirpathBlockBase):
@@ -430,8 +442,8 @@ class OptionDirBlock(DirpathBlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
-        return self.OBJ
+    def lower_expr(self) -> ir.Raw:
+        return ir.Raw(self.OBJ)
 
 
 class OptionLinkBlock(LinkBlockBase):
@@ -456,8 +468,8 @@ class OptionLinkBlock(LinkBlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
-        return self.OBJ
+    def lower_expr(self) -> ir.Raw:
+        return ir.Raw(self.OBJ)
 
 
 class FilepathBlock(FilepathBlockBase):
@@ -470,8 +482,8 @@ class FilepathBlock(FilepathBlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
-        return f'"{self.PATH.strip()}"' if self.PATH.strip() else ''
+    def lower_expr(self) -> Optional[ir.String]:
+        return ir.String(self.PATH.strip()) if self.PATH.strip() else None
 
 
 class DirpathBlock(DirpathBlockBase):
@@ -484,8 +496,8 @@ class DirpathBlock(DirpathBlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
-        return f'"{self.PATH.strip()}"' if self.PATH.strip() else ''
+    def lower_expr(self) -> Optional[ir.String]:
+        return ir.String(self.PATH.strip()) if self.PATH.strip() else None
 
 
 class LinkBlock(LinkBlockBase):
@@ -498,8 +510,8 @@ class LinkBlock(LinkBlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
-        return f'"{self.URL.strip()}"' if self.URL.strip() else ''
+    def lower_expr(self) -> Optional[ir.String]:
+        return ir.String(self.URL.strip()) if self.URL.strip() else None
 
 
 class PathCombinedBlock(DirpathBlockBase, InputsInlineBlockBase):
@@ -517,13 +529,12 @@ class PathCombinedBlock(DirpathBlockBase, InputsInlineBlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
-        path_a_ahkscr = self.PATH_A.ahkscr()
-        path_b_ahkscr = self.PATH_B.ahkscr()
-        if path_a_ahkscr == "" or path_b_ahkscr == "":
-            return ""
-
-        return f'{path_a_ahkscr} . "/" . {path_b_ahkscr}'
+    def lower_expr(self) -> Optional[ir.BinaryOp]:
+        path_a_expr = self.PATH_A.lower_expr()
+        path_b_expr = self.PATH_B.lower_expr()
+        if path_a_expr is None or path_b_expr is None:
+            return None
+        return ir.BinaryOp('.', ir.BinaryOp('.', path_a_expr, ir.String('/')), path_b_expr)
 
 
 class RunBlock(ActionBlockBase):
@@ -537,8 +548,9 @@ class RunBlock(ActionBlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
-        return ";"*(self.OBJ.ahkscr().strip() == "") + f"Run % {self.OBJ.ahkscr()}"
+    def lower(self) -> List[ir.Stmt]:
+        obj_expr = self.OBJ.lower_expr()
+        return [ir.Command('Run', [obj_expr], disabled=obj_expr is None)]
 
 
 class ClipboardBlock(StringBlockBase):
@@ -546,8 +558,8 @@ class ClipboardBlock(StringBlockBase):
     template = '剪貼簿內容'
     colour = BlockBase.Colour.String
 
-    def ahkscr(self) -> str:
-        return f'Clipboard'
+    def lower_expr(self) -> ir.Raw:
+        return ir.Raw('Clipboard')
 
 
 class OptionTimeBlock(NumberBlockBase):
@@ -568,8 +580,8 @@ class OptionTimeBlock(NumberBlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
-        return f"{self.TIME}"
+    def lower_expr(self) -> ir.Raw:
+        return ir.Raw(f"{self.TIME}", atomic=True)
 
 
 class TrayTipBlock(ActionBlockBase):
@@ -582,9 +594,9 @@ class TrayTipBlock(ActionBlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
-        text_ahkscr = self.TEXT.ahkscr()
-        return ";"*(text_ahkscr == "") + f"TrayTip,,% {text_ahkscr}"
+    def lower(self) -> List[ir.Stmt]:
+        text_expr = self.TEXT.lower_expr()
+        return [ir.Command('TrayTip', ['', text_expr], disabled=text_expr is None)]
 
 
 class OptionalSendKeyBlock(ActionBlockBase):
@@ -606,9 +618,9 @@ class OptionalSendKeyBlock(ActionBlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
+    def lower(self) -> List[ir.Stmt]:
         key_ahksrc = self.KEY.ahkscr(to_be_send=True)
-        return ";"*(key_ahksrc == "") + f"{self.SEND_MODE}, {key_ahksrc}"
+        return [ir.Command(self.SEND_MODE, [key_ahksrc], disabled=key_ahksrc == "")]
 
 
 class SendInputKeyBlock(ActionBlockBase, InputsInlineBlockBase):
@@ -622,9 +634,9 @@ class SendInputKeyBlock(ActionBlockBase, InputsInlineBlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
+    def lower(self) -> List[ir.Stmt]:
         key_ahksrc = self.KEY.ahkscr(to_be_send=True)
-        return ";"*(key_ahksrc == "") + f"SendInput, {key_ahksrc}"
+        return [ir.Command('SendInput', [key_ahksrc], disabled=key_ahksrc == "")]
 
 
 class SendInputNTimeKeyBlock(ActionBlockBase, InputsInlineBlockBase):
@@ -642,13 +654,13 @@ class SendInputNTimeKeyBlock(ActionBlockBase, InputsInlineBlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
+    def lower(self) -> List[ir.Stmt]:
         send_arg_str = str(int(float(
             self.N.ahkscr()
         ))) if not self.N.is_empty else "0"
         key_ahksrc = self.KEY.ahkscr(
             to_be_send=True, send_arg_str=send_arg_str)
-        return ";"*(key_ahksrc == "") + f"SendInput, {key_ahksrc}"
+        return [ir.Command('SendInput', [key_ahksrc], disabled=key_ahksrc == "")]
 
 
 class SendInputKeyUpOrDownBlock(ActionBlockBase, InputsInlineBlockBase):
@@ -669,11 +681,11 @@ class SendInputKeyUpOrDownBlock(ActionBlockBase, InputsInlineBlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
+    def lower(self) -> List[ir.Stmt]:
         send_arg_str = self.UP_OR_DOWN or None
         key_ahksrc = self.KEY.ahkscr(
             to_be_send=True, send_arg_str=send_arg_str)
-        return ";"*(key_ahksrc == "") + f"SendInput, {key_ahksrc}"
+        return [ir.Command('SendInput', [key_ahksrc], disabled=key_ahksrc == "")]
 
 
 class SendInputTextBlock(ActionBlockBase):
@@ -686,9 +698,13 @@ class SendInputTextBlock(ActionBlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
-        text_ahksrc = self.TEXT.ahkscr()
-        return ";"*(text_ahksrc == "") + f'SendInput % "{{TEXT}}" . {text_ahksrc}'
+    def lower(self) -> List[ir.Stmt]:
+        text_expr = self.TEXT.lower_expr()
+        return [ir.Command(
+            'SendInput',
+            [ir.BinaryOp('.', ir.String('{TEXT}'), text_expr or ir.String(''))],
+            disabled=text_expr is None,
+        )]
 
 
 class FileRecycleEmptyBlock(ActionBlockBase):
@@ -696,8 +712,8 @@ class FileRecycleEmptyBlock(ActionBlockBase):
     template = '清空資源回收桶'
     colour = BlockBase.Colour.action
 
-    def ahkscr(self) -> str:
-        return "FileRecycleEmpty"
+    def lower(self) -> List[ir.Stmt]:
+        return [ir.Command('FileRecycleEmpty')]
 
 
 class ReloadBlock(ActionBlockBase):
@@ -705,8 +721,8 @@ class ReloadBlock(ActionBlockBase):
     template = '刷新AHK腳本'
     colour = BlockBase.Colour.action
 
-    def ahkscr(self) -> str:
-        return "Reload"
+    def lower(self) -> List[ir.Stmt]:
+        return [ir.Command('Reload')]
 
 
 class RunFileByProgramBlock(ActionBlockBase, InputsInlineBlockBase):
@@ -723,12 +739,18 @@ class RunFileByProgramBlock(ActionBlockBase, InputsInlineBlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
-        program_ahkscr = self.PROGRAM.ahkscr().strip()
-        file_ahkscr = self.FILE.ahkscr().strip()
-        return ";"*(
-            program_ahkscr == "" or file_ahkscr == ""
-        ) + f'Run % {program_ahkscr} . " " . {file_ahkscr}'
+    def lower(self) -> List[ir.Stmt]:
+        program_expr = self.PROGRAM.lower_expr()
+        file_expr = self.FILE.lower_expr()
+        return [ir.Command(
+            'Run',
+            [ir.BinaryOp(
+                '.',
+                ir.BinaryOp('.', program_expr or ir.String(''), ir.String(' ')),
+                file_expr or ir.String(''),
+            )],
+            disabled=program_expr is None or file_expr is None,
+        )]
 
 
 class ProcessCloseBlock(ActionBlockBase):
@@ -742,9 +764,9 @@ class ProcessCloseBlock(ActionBlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
-        process_ahkscr = self.PROCESS.ahkscr().strip()
-        return ";"*(process_ahkscr == "") + f'Process, Close, % {process_ahkscr}'
+    def lower(self) -> List[ir.Stmt]:
+        process_expr = self.PROCESS.lower_expr()
+        return [ir.Command('Process', ['Close', process_expr], disabled=process_expr is None)]
 
 
 class WinActivateBlock(ActionBlockBase):
@@ -758,18 +780,20 @@ class WinActivateBlock(ActionBlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
-        win_title_ahkscr = self.WIN_TITLE.ahkscr().strip()
-        return "\n".join([
-            "SetTitleMatchMode, 2",
-            ";"*(win_title_ahkscr == "") + f'WinActivate % {win_title_ahkscr}',
-        ])
+    def lower(self) -> List[ir.Stmt]:
+        win_title_expr = self.WIN_TITLE.lower_expr()
+        return [
+            ir.Command('SetTitleMatchMode', ['2']),
+            ir.Command('WinActivate', [win_title_expr], disabled=win_title_expr is None),
+        ]
 
 
 class SleepBlock(ActionBlockBase):
     """ 等待毫秒時間積木 """
-    template = '等待{TIME}{UNIT}'
+    template = '等待{TIME}{UNIT} {PRECISE}精確等待'
     colour = "#80ADC4"
+    # 精確等待的函式 (ahk_funcs/PreciseSleep.ahk): 不受系統計時器約 10~15.6 毫秒的間隔限制
+    PRECISE_SLEEP_FUNC_NAME = 'PreciseSleep'
     arg_dicts = {
         'TIME': {
             'type': 'input_value',
@@ -784,11 +808,24 @@ class SleepBlock(ActionBlockBase):
                 ['小時', ' * 1000 * 60 * 60'],
             ],
         },
+        'PRECISE': {
+            'type': 'field_checkbox',
+            'checked': False,
+        },
     }
 
-    def ahkscr(self) -> str:
-        time_ms_ahkscr = self.TIME.ahkscr()
-        return ";"*(time_ms_ahkscr == "") + f'Sleep % {time_ms_ahkscr}{self.UNIT}'
+    def lower(self) -> List[ir.Stmt]:
+        time_expr = self.TIME.lower_expr()
+        if time_expr is None:
+            return [ir.Command('Sleep', [None], disabled=True)]
+        # 時間單位為毫秒的倍數，如 ' * 1000 * 60'
+        time_ms_expr = time_expr
+        for factor_str in self.UNIT.split('*')[1:]:
+            time_ms_expr = ir.BinaryOp('*', time_ms_expr, ir.Number(factor_str.strip()))
+        # 舊的白板沒有 PRECISE 欄位 (為空積木)、程式建立的積木可能未指定，皆視為未勾選
+        if getattr(self, 'PRECISE', None) == "TRUE":
+            return [ir.CallStatement(ir.Call(self.PRECISE_SLEEP_FUNC_NAME, [time_ms_expr]))]
+        return [ir.Command('Sleep', [time_ms_expr])]
 
 
 class SetClipboardBlock(ActionBlockBase):
@@ -801,9 +838,9 @@ class SetClipboardBlock(ActionBlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
-        text_ahksrc = self.TEXT.ahkscr()
-        return ";"*(text_ahksrc == "") + f'Clipboard := {text_ahksrc}'
+    def lower(self) -> List[ir.Stmt]:
+        text_expr = self.TEXT.lower_expr()
+        return [ir.Assign('Clipboard', text_expr, disabled=text_expr is None)]
 
 
 class HotStringBlock(BlockBase):
@@ -823,10 +860,13 @@ class HotStringBlock(BlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
+    def lower(self) -> List[ir.Hotstring]:
         abbr_ahksrc = self.ABBR.ahkscr(with_quotes=False)
         text_ahksrc = self.TEXT.ahkscr(with_quotes=False)
-        return ";"*(not all([abbr_ahksrc, text_ahksrc])) + f'::{abbr_ahksrc}::{{TEXT}}{text_ahksrc}'
+        return [ir.Hotstring(
+            '', abbr_ahksrc, text_ahksrc,
+            disabled=not all([abbr_ahksrc, text_ahksrc]),
+        )]
 
 
 class HotStringWithSettingBlock(BlockBase):
@@ -850,14 +890,17 @@ class HotStringWithSettingBlock(BlockBase):
         }
     }
 
-    def ahkscr(self) -> str:
+    def lower(self) -> List[ir.Hotstring]:
         # 獲取縮寫與展開字詞
         abbr_ahksrc = self.ABBR.ahkscr(with_quotes=False)
         text_ahksrc = self.TEXT.ahkscr(with_quotes=False)
         # 獲取設定字符串
         setting_block = next(iter(self.SETTING), None)
         setting_ahkscr = setting_block.ahkscr() if not setting_block.is_empty else "oc?"
-        return ";"*(not all([abbr_ahksrc, text_ahksrc])) + f':{setting_ahkscr}:{abbr_ahksrc}::{{TEXT}}{text_ahksrc}'
+        return [ir.Hotstring(
+            setting_ahkscr, abbr_ahksrc, text_ahksrc,
+            disabled=not all([abbr_ahksrc, text_ahksrc]),
+        )]
 
 
 class HotStringActionWithSettingBlock(BlockBase):
@@ -880,7 +923,7 @@ class HotStringActionWithSettingBlock(BlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
+    def lower(self) -> List[ir.HotstringAction]:
         # 獲取縮寫
         abbr_ahksrc = self.ABBR.ahkscr(with_quotes=False)
 
@@ -888,18 +931,10 @@ class HotStringActionWithSettingBlock(BlockBase):
         setting_block = next(iter(self.SETTING), None)
         setting_ahkscr = setting_block.ahkscr() if not setting_block.is_empty else "oc?"
 
-        # 獲取執行語法
-        do_block_ahksrc_line_str = [
-            do_block_ahksrc_line_str
-            for do_block in self.DO
-            for do_block_ahksrc_line_str in do_block.ahkscr().splitlines()
-        ]
-
-        # 進行換行(縮排)，並於結尾加上Return
-        do_ahkscr = f"\n{TAB4_INDENT}" + \
-            f"\n{TAB4_INDENT}".join(do_block_ahksrc_line_str + ["Return"])
-
-        return ";"*(not all([abbr_ahksrc, do_ahkscr])) + f':{setting_ahkscr}:{abbr_ahksrc}::{do_ahkscr}'
+        return [ir.HotstringAction(
+            setting_ahkscr, abbr_ahksrc, self.lower_statements(self.DO),
+            disabled=not abbr_ahksrc,
+        )]
 
 
 class HotStringSettingBlock(SettingBlockBase):
@@ -947,6 +982,92 @@ class HotStringSettingBlock(SettingBlockBase):
         ])
 
 
+class ScriptSettingBlock(SettingBlockBase):
+    """ 腳本設定積木: 置於白板上 (不需連接其他積木)，設定整個腳本的編譯選項 (見 `compiler.get_compile_options`) """
+    template = [
+        '腳本設定',
+        '熱字串達{HOTSTRING_DISPATCH_THRESHOLD}個時改用熱字串分派器 (0 為不使用)',
+        '送出文字達{PASTE_TEXT_MIN_LENGTH}字時經由剪貼簿貼上 (0 為不使用)',
+        '{PRECISE_SLEEP}所有等待皆精確等待',
+        '{RUNTIME_TUNING}依工作負載加入執行期設定',
+        '自訂執行期設定{RUNTIME_TUNING_OVERRIDES}',
+    ]
+    colour = BlockBase.Colour.black
+    arg_dicts = {
+        'HOTSTRING_DISPATCH_THRESHOLD': {
+            'type': 'field_number',
+            'value': 0,
+            'min': 0,
+            'precision': 1,
+        },
+        'PASTE_TEXT_MIN_LENGTH': {
+            'type': 'field_number',
+            'value': 0,
+            'min': 0,
+            'precision': 1,
+        },
+        'PRECISE_SLEEP': {
+            'type': 'field_checkbox',
+            'checked': False,
+        },
+        'RUNTIME_TUNING': {
+            'type': 'field_checkbox',
+            'checked': False,
+        },
+        # 以逗號分隔的 名稱=值，如 `SetBatchLines=20ms, #UseHook=` (值為空表示不輸出該設定)
+        'RUNTIME_TUNING_OVERRIDES': {
+            'type': 'field_input',
+            'text': '',
+        },
+    }
+
+    def _get_int_field(self, arg_name: str) -> Optional[int]:
+        """ 獲取整數欄位值
+
+        Args:
+            arg_name (str)
+
+        Returns:
+            Optional[int]: 舊版白板沒有的欄位 (為空積木)、程式建立的積木未指定或不是數字時回傳 None
+        """
+        value = getattr(self, arg_name, None)
+        if not isinstance(value, str):
+            return None
+        try:
+            return int(float(value))
+        except ValueError:
+            return None
+
+    def get_compile_option_dict(self) -> dict:
+        """ 取得編譯選項字典 (`compiler.CompileOptions` 的關鍵字參數，不含未指定的選項)
+
+        Raises:
+            ValueError: 自訂執行期設定的格式錯誤或未知的設定名稱
+
+        Returns:
+            dict
+        """
+        com_option_dict = {}
+        for option_name, arg_name in (
+                ('hotstring_dispatch_threshold', 'HOTSTRING_DISPATCH_THRESHOLD'),
+                ('paste_text_min_length', 'PASTE_TEXT_MIN_LENGTH')):
+            option_value = self._get_int_field(arg_name)
+            if option_value is not None:
+                com_option_dict[option_name] = option_value
+        # 舊版白板沒有的欄位 (為空積木)、程式建立的積木未指定時不列入
+        for option_name, arg_name in (
+                ('precise_sleep', 'PRECISE_SLEEP'),
+                ('runtime_tuning', 'RUNTIME_TUNING')):
+            option_value = getattr(self, arg_name, None)
+            if isinstance(option_value, str):
+                com_option_dict[option_name] = option_value == "TRUE"
+        runtime_tuning_overrides = getattr(self, 'RUNTIME_TUNING_OVERRIDES', None)
+        if isinstance(runtime_tuning_overrides, str) and runtime_tuning_overrides.strip():
+            com_option_dict['runtime_tuning_overrides'] = optimizer.parse_runtime_tuning_overrides(
+                runtime_tuning_overrides)
+        return com_option_dict
+
+
 class ShutdownBlock(ActionBlockBase):
     """ 關機/登出/重新啟動 積木 """
     template = '電腦{ACTION} {FORCE}強制執行'
@@ -971,7 +1092,7 @@ class ShutdownBlock(ActionBlockBase):
         }
     }
 
-    def ahkscr(self) -> str:
+    def lower(self) -> List[ir.Stmt]:
         com_ahkscr = self.ACTION
         if "Shutdown" in com_ahkscr and self.FORCE == "TRUE":
             com_ahkscr = com_ahkscr.replace(
@@ -980,7 +1101,7 @@ class ShutdownBlock(ActionBlockBase):
                 "1", "5"
             ).replace(
                 "2", "6")
-        return com_ahkscr
+        return [ir.RawStatement(com_ahkscr)]
 
 
 class MousePosBlock(NumberBlockBase):
@@ -998,8 +1119,12 @@ class MousePosBlock(NumberBlockBase):
         }
     }
 
-    def ahkscr(self) -> str:
-        return f"GetMousePos({self.POS})"
+    def lower_expr(self) -> ir.Call:
+        # POS 如 '"x", "Screen"': 座標軸與座標模式
+        axis, coord_mode = (
+            pos_arg.strip().strip('"') for pos_arg in self.POS.split(',')
+        )
+        return ir.Call('GetMousePos', [ir.String(axis), ir.String(coord_mode)])
 
 
 class MathConstantBlock(NumberBlockBase):
@@ -1016,8 +1141,8 @@ class MathConstantBlock(NumberBlockBase):
         }
     }
 
-    def ahkscr(self) -> str:
-        return self.CONSTANT
+    def lower_expr(self) -> ir.Raw:
+        return ir.Raw(self.CONSTANT)
 
 
 class MathOperatorBlock(NumberBlockBase, InputsInlineBlockBase):
@@ -1044,12 +1169,12 @@ class MathOperatorBlock(NumberBlockBase, InputsInlineBlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
-        num_a_ahkscr = self.NUM_A.ahkscr() or "0"
-        num_b_ahkscr = self.NUM_B.ahkscr() or "0"
+    def lower_expr(self) -> ir.Expr:
+        num_a_expr = self.NUM_A.lower_expr() or ir.Number("0")
+        num_b_expr = self.NUM_B.lower_expr() or ir.Number("0")
         if self.OPERATOR == 'Mod':
-            return f"Mod({num_a_ahkscr}, {num_b_ahkscr})"
-        return f"{num_a_ahkscr}{self.OPERATOR}{num_b_ahkscr}"
+            return ir.Call('Mod', [num_a_expr, num_b_expr])
+        return ir.BinaryOp(self.OPERATOR, num_a_expr, num_b_expr)
 
 
 class MathFunctionBlock(NumberBlockBase):
@@ -1082,9 +1207,9 @@ class MathFunctionBlock(NumberBlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
-        num_ahkscr = self.NUM.ahkscr() or "0"
-        return f"{self.FUNCTION}({num_ahkscr})"
+    def lower_expr(self) -> ir.Call:
+        num_expr = self.NUM.lower_expr() or ir.Number("0")
+        return ir.Call(self.FUNCTION, [num_expr])
 
 
 class MathRoundBlock(NumberBlockBase):
@@ -1099,10 +1224,10 @@ class MathRoundBlock(NumberBlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
-        num_ahkscr = self.NUM.ahkscr() or "0"
-        n_ahkscr = self.N.ahkscr() or "0"
-        return f"Round({num_ahkscr}, {n_ahkscr})"
+    def lower_expr(self) -> ir.Call:
+        num_expr = self.NUM.lower_expr() or ir.Number("0")
+        n_expr = self.N.lower_expr() or ir.Number("0")
+        return ir.Call('Round', [num_expr, n_expr])
 
 # GetRandomNum
 
@@ -1126,8 +1251,7 @@ class MathRandomBlock(NumberBlockBase, InputsInlineBlockBase):
         },
     }
 
-    def ahkscr(self) -> str:
-        method_ahkscr = self.METHOD
-        min_ahkscr = self.MIN.ahkscr() or "0"
-        max_ahkscr = self.MAX.ahkscr() or "0"
-        return f"GetRandomNum({min_ahkscr}, {max_ahkscr}, {method_ahkscr})"
+    def lower_expr(self) -> ir.Call:
+        min_expr = self.MIN.lower_expr() or ir.Number("0")
+        max_expr = self.MAX.lower_expr() or ir.Number("0")
+        return ir.Call('GetRandomNum', [min_expr, max_expr, ir.Raw(self.METHOD)])
@@ -0,0 +1,1273 @@
+"""
+IR 最佳化: 於產生 AHK 代碼前改寫 IR (`pysrc.ir`)
+
+積木的 `lower_expr()` 結果會快取於積木實例上，因此最佳化一律建立新的節點，不修改傳入的 IR
+"""
+import math
+import re
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from pysrc import codegen, ir
+
+# AHK 的整數為 64 位元，超出範圍的運算結果不摺疊
+INT64_MIN, INT64_MAX = -2**63, 2**63 - 1
+INT_TEXT_PATTERN = re.compile(R'[+-]?\d+')
+FLOAT_TEXT_PATTERN = re.compile(R'[+-]?(?:\d+\.\d*|\.\d+)')
+
+# 數學常數積木的運算式與數值
+CONSTANT_TEXT_MAPPING_VALUE_DICT = {
+    '4*atan(1)': math.pi,
+    'exp(1)': math.e,
+    '(1+sqrt(5))/2': (1 + math.sqrt(5)) / 2,
+}
+
+# 回傳浮點數的 AHK 數學函式 (名稱為小寫)
+FLOAT_FUNC_NAME_MAPPING_FUNC_DICT: Dict[str, Callable[[float], float]] = {
+    'sin': math.sin,
+    'cos': math.cos,
+    'tan': math.tan,
+    'asin': math.asin,
+    'acos': math.acos,
+    'atan': math.atan,
+    'log': math.log10,
+    'ln': math.log,
+    'exp': math.exp,
+    'sqrt': math.sqrt,
+}
+# 沒有副作用的 AHK 函式 (名稱為小寫): 可摺疊或共用
+PURE_FUNC_NAME_SET = set(FLOAT_FUNC_NAME_MAPPING_FUNC_DICT) | {
+    'ceil', 'floor', 'abs', 'round', 'mod',
+}
+
+MOUSE_POS_FUNC_NAME = 'GetMousePos'
+# 共用運算式的暫存變數名稱前綴
+CSE_VAR_NAME_PREFIX = 'cse_'
+# 共用動作的標籤名稱前綴
+SHARED_ACTION_LABEL_NAME_PREFIX = 'shared_action_'
+# 可合併的送出命令；之後的內容都視為文字的按鍵
+SEND_COMMAND_NAME_SET = {'SendInput', 'Send', 'SendPlay'}
+SEND_TEXT_MODE_KEY = '{TEXT}'
+# 經由剪貼簿貼上文字的函式 (ahk_funcs/PasteText.ahk)，與改用貼上的建議文字長度 (會暫時覆蓋剪貼簿，預設不啟用)
+PASTE_TEXT_FUNC_NAME = 'PasteText'
+PASTE_TEXT_MIN_LENGTH = 1000
+# 精確等待的函式 (ahk_funcs/PreciseSleep.ahk)
+PRECISE_SLEEP_FUNC_NAME = 'PreciseSleep'
+# 依工作負載調整的執行期設定名稱 (依輸出順序)
+RUNTIME_TUNING_NAMES = ('SetBatchLines', 'ListLines', '#KeyHistory', '#MaxHotkeysPerInterval', '#UseHook')
+# 滑鼠按鍵與滾輪的熱鍵按鍵名稱
+MOUSE_KEY_PATTERN = re.compile(R'[LRM]Button|XButton[12]|Wheel(?:Up|Down|Left|Right)', re.IGNORECASE)
+WHEEL_KEY_PATTERN = re.compile(R'Wheel(?:Up|Down|Left|Right)', re.IGNORECASE)
+# 熱鍵數量達到此數量時 (或有滾輪熱鍵時)，提高每個間隔內允許觸發的熱鍵次數 (AHK 預設 2 秒內 70 次，超過會跳出警告)
+MANY_HOTKEY_COUNT = 20
+MAX_HOTKEYS_PER_INTERVAL = 500
+# 模式設定命令
+MODE_COMMAND_PATTERN = re.compile(R'\b(?:SetTitleMatchMode|CoordMode)\b', re.IGNORECASE)
+# 熱字串分派器函式 (ahk_funcs/HotstringDispatcher.ahk) 與其資料變數名稱
+HOTSTRING_DISPATCHER_FUNC_NAME = 'HotstringDispatcher'
+HOTSTRING_DISPATCH_DATA_VAR_NAME = 'hotstring_dispatch_data'
+# 熱字串分派器支援的熱字串選項 (同熱字串設定積木)
+HOTSTRING_DISPATCH_OPTION_CHAR_SET = set('*?oc')
+# 每個資料段落的熱字串數量 (避免單一續行段落過長)
+HOTSTRING_DISPATCH_CHUNK_SIZE = 500
+
+Num = Union[int, float]
+
+
+# region 常數摺疊
+
+def get_number_value(expr: Optional[ir.Expr]) -> Optional[Num]:
+    """ 獲取數字字面值的數值
+
+    Args:
+        expr (Optional[ir.Expr])
+
+    Returns:
+        Optional[Num]: 不是十進位數字字面值時回傳 None
+    """
+    if not isinstance(expr, ir.Number):
+        return None
+    text = expr.text.strip()
+    if INT_TEXT_PATTERN.fullmatch(text):
+        return int(text)
+    if FLOAT_TEXT_PATTERN.fullmatch(text):
+        return float(text)
+    return None
+
+
+def make_number(value: Num, numeric_context: bool) -> Optional[ir.Number]:
+    """ 數值轉換成數字字面值
+
+    AHK 顯示浮點數運算結果時會依 A_FormatFloat 格式化 (如 0.500000)，而字面值會保留原文字，
+    因此浮點數結果只在作為其他數學運算的運算元時才摺疊
+
+    Args:
+        value (Num)
+        numeric_context (bool): 是否作為其他數學運算的運算元
+
+    Returns:
+        Optional[ir.Number]: 不能安全表示時回傳 None
+    """
+    if isinstance(value, int):
+        if not INT64_MIN <= value <= INT64_MAX:
+            return None
+        return ir.Number(str(value))
+    if not numeric_context:
+        return None
+    # AHK 不支援 1e-05 格式 (科學記號須含小數點)，也沒有 inf、nan
+    text = repr(value)
+    if not FLOAT_TEXT_PATTERN.fullmatch(text):
+        return None
+    return ir.Number(text)
+
+
+def fold_binary_op(op: str, a: Num, b: Num) -> Optional[Num]:
+    """ 依 AHK 的規則計算二元運算
+
+    Args:
+        op (str)
+        a (Num)
+        b (Num)
+
+    Returns:
+        Optional[Num]: 結果不確定 (如除以零) 時回傳 None
+    """
+    is_int = isinstance(a, int) and isinstance(b, int)
+    if op == '+':
+        return a + b
+    if op == '-':
+        return a - b
+    if op == '*':
+        return a * b
+    if op == '/':
+        # AHK 的 `/` 一律回傳浮點數
+        return float(a) / b if b != 0 else None
+    if op == '//':
+        if b == 0:
+            return None
+        if is_int:
+            # 整數相除時向零截斷 (與 Python 的 `//` 向下取整不同)
+            quotient = abs(a) // abs(b)
+            return -quotient if (a < 0) != (b < 0) else quotient
+        return float(math.floor(a / b))
+    if op == '**':
+        if a == 0 and b < 0:
+            return None
+        if is_int and b >= 0:
+            # 避免計算極大的整數
+            return a ** b if b * math.log2(abs(a) or 1) < 64 else None
+        if a < 0 and not float(b).is_integer():
+            return None
+        return float(a) ** b
+    return None
+
+
+def fold_call(func_name: str, values: List[Num]) -> Optional[Num]:
+    """ 依 AHK 的規則計算數學函式
+
+    Args:
+        func_name (str)
+        values (List[Num]): 參數數值
+
+    Returns:
+        Optional[Num]: 無法計算時回傳 None
+    """
+    func_name = func_name.lower()
+    try:
+        if func_name in FLOAT_FUNC_NAME_MAPPING_FUNC_DICT and len(values) == 1:
+            return float(FLOAT_FUNC_NAME_MAPPING_FUNC_DICT[func_name](values[0]))
+        if func_name in ('ceil', 'floor') and len(values) == 1:
+            return int((math.ceil if func_name == 'ceil' else math.floor)(values[0]))
+        if func_name == 'abs' and len(values) == 1:
+            return abs(values[0])
+        if func_name == 'mod' and len(values) == 2:
+            a, b = values
+            if b == 0:
+                return None
+            if isinstance(a, int) and isinstance(b, int):
+                # 餘數的正負號與被除數相同
+                remainder = abs(a) % abs(b)
+                return -remainder if a < 0 else remainder
+            return math.fmod(a, b)
+        if func_name == 'round' and len(values) == 2 and values[1] == 0:
+            # 四捨五入至整數 (遠離零)
+            a = values[0]
+            return int(math.floor(abs(a) + 0.5)) * (-1 if a < 0 else 1)
+    except (ValueError, OverflowError):
+        return None
+    return None
+
+
+def fold_constants(expr: Optional[ir.Expr], numeric_context: bool = False) -> Optional[ir.Expr]:
+    """ 摺疊運算式中的常數子運算式 (以工作堆疊後序遍歷)
+
+    Args:
+        expr (Optional[ir.Expr])
+        numeric_context (bool, optional): 運算式是否作為其他數學運算的運算元. Defaults to False.
+
+    Returns:
+        Optional[ir.Expr]: 未變動的子運算式沿用原節點
+    """
+    if expr is None:
+        return None
+    result_stack: List[ir.Expr] = []
+    # (節點, 是否作為數學運算的運算元, 子節點是否已處理)
+    work_stack: List[Tuple[ir.Expr, bool, bool]] = [(expr, numeric_context, False)]
+    while work_stack:
+        node, is_numeric, sub_nodes_done = work_stack.pop()
+
+        if isinstance(node, ir.BinaryOp):
+            if not sub_nodes_done:
+                work_stack.append((node, is_numeric, True))
+                is_arithmetic = node.op != '.'
+                work_stack.append((node.right, is_arithmetic, False))
+                work_stack.append((node.left, is_arithmetic, False))
+                continue
+            right = result_stack.pop()
+            left = result_stack.pop()
+            a, b = get_number_value(left), get_number_value(right)
+            folded_node = None
+            if a is not None and b is not None and node.op != '.':
+                value = fold_binary_op(node.op, a, b)
+                if value is not None:
+                    folded_node = make_number(value, is_numeric)
+            # 預先相乘整數常數因子: `x*1000*60` → `x*60000` (如等待時間的單位換算)
+            if folded_node is None and node.op == '*' and isinstance(b, int) \
+                    and isinstance(left, ir.BinaryOp) and left.op == '*' \
+                    and isinstance(get_number_value(left.right), int):
+                folded_node = make_number(get_number_value(left.right) * b, is_numeric)
+                if folded_node is not None:
+                    folded_node = ir.BinaryOp('*', left.left, folded_node)
+            if folded_node is None:
+                folded_node = node if (left is node.left and right is node.right) \
+                    else ir.BinaryOp(node.op, left, right)
+            result_stack.append(folded_node)
+
+        elif isinstance(node, ir.Call):
+            if not sub_nodes_done:
+                work_stack.append((node, is_numeric, True))
+                is_math = node.func_name.lower() in PURE_FUNC_NAME_SET
+                work_stack.extend(
+                    (arg, is_math, False) for arg in reversed(node.args)
+                    if arg is not None
+                )
+                continue
+            arg_list = [
+                result_stack.pop() if arg is not None else None
+                for arg in reversed(node.args)
+            ][::-1]
+            values = [get_number_value(arg) for arg in arg_list]
+            folded_node = None
+            if node.func_name.lower() in PURE_FUNC_NAME_SET and None not in values:
+                value = fold_call(node.func_name, values)
+                if value is not None:
+                    folded_node = make_number(value, is_numeric)
+            if folded_node is None:
+                folded_node = node if all(
+                    arg is original_arg for arg, original_arg in zip(arg_list, node.args)
+                ) else ir.Call(node.func_name, arg_list)
+            result_stack.append(folded_node)
+
+        # 數學常數積木
+        elif isinstance(node, ir.Raw) and node.text.strip() in CONSTANT_TEXT_MAPPING_VALUE_DICT:
+            result_stack.append(
+                make_number(CONSTANT_TEXT_MAPPING_VALUE_DICT[node.text.strip()], is_numeric)
+                or node
+            )
+        else:
+            result_stack.append(node)
+    return result_stack[0]
+
+# endregion 常數摺疊
+
+
+# region 共用子運算式
+
+def iter_sub_exprs(expr: ir.Expr) -> List[ir.Expr]:
+    """ 獲取直接子運算式 """
+    if isinstance(expr, ir.BinaryOp):
+        return [expr.left, expr.right]
+    if isinstance(expr, ir.Call):
+        return [arg for arg in expr.args if arg is not None]
+    return []
+
+
+def replace_exprs(
+        expr: Optional[ir.Expr],
+        get_replacement: Callable[[ir.Expr], Optional[ir.Expr]]) -> Optional[ir.Expr]:
+    """ 由上而下替換子運算式: 被替換的節點不再往下處理
+
+    Args:
+        expr (Optional[ir.Expr])
+        get_replacement (Callable[[ir.Expr], Optional[ir.Expr]]): 回傳替換的節點，不替換時回傳 None
+
+    Returns:
+        Optional[ir.Expr]: 未變動的子運算式沿用原節點
+    """
+    if expr is None:
+        return None
+    result_stack: List[ir.Expr] = []
+    work_stack: List[Tuple[ir.Expr, bool]] = [(expr, False)]
+    while work_stack:
+        node, sub_nodes_done = work_stack.pop()
+        if not sub_nodes_done:
+            replacement = get_replacement(node)
+            if replacement is not None:
+                result_stack.append(replacement)
+                continue
+            work_stack.append((node, True))
+            work_stack.extend(
+                (sub_node, False) for sub_node in reversed(iter_sub_exprs(node))
+            )
+            continue
+
+        if isinstance(node, ir.BinaryOp):
+            right = result_stack.pop()
+            left = result_stack.pop()
+            result_stack.append(
+                node if (left is node.left and right is node.right)
+                else ir.BinaryOp(node.op, left, right)
+            )
+        elif isinstance(node, ir.Call):
+            arg_list = [
+                result_stack.pop() if arg is not None else None
+                for arg in reversed(node.args)
+            ][::-1]
+            result_stack.append(
+                node if all(
+                    arg is original_arg for arg, original_arg in zip(arg_list, node.args)
+                ) else ir.Call(node.func_name, arg_list)
+            )
+        else:
+            result_stack.append(node)
+    return result_stack[0]
+
+
+def get_expr_key_dict(exprs: List[ir.Expr]) -> Dict[int, Optional[tuple]]:
+    """ 以後序遍歷為每個子運算式建立結構鍵 (結構相同的運算式有相同的鍵)
+
+    Args:
+        exprs (List[ir.Expr])
+
+    Returns:
+        Dict[int, Optional[tuple]]: id(節點) → 結構鍵；有副作用的運算式 (如隨機數) 為 None
+    """
+    # 以編號取代巢狀的子結構鍵，使鍵的大小與深度無關
+    key_mapping_num_dict: Dict[tuple, int] = {}
+    id_mapping_key_dict: Dict[int, Optional[tuple]] = {}
+    work_stack: List[Tuple[ir.Expr, bool]] = [
+        (expr, False) for expr in exprs if expr is not None
+    ]
+    while work_stack:
+        node, sub_nodes_done = work_stack.pop()
+        if id(node) in id_mapping_key_dict:
+            continue
+        sub_node_list = iter_sub_exprs(node)
+        if not sub_nodes_done:
+            work_stack.append((node, True))
+            work_stack.extend((sub_node, False) for sub_node in sub_node_list)
+            continue
+
+        sub_key_list = [id_mapping_key_dict[id(sub_node)] for sub_node in sub_node_list]
+        if None in sub_key_list:
+            key = None
+        elif isinstance(node, ir.Number):
+            key = ('Number', node.text)
+        elif isinstance(node, ir.String):
+            key = ('String', node.value)
+        elif isinstance(node, ir.Raw):
+            key = ('Raw', node.text)
+        elif isinstance(node, ir.BinaryOp):
+            key = ('BinaryOp', node.op, *(key_mapping_num_dict[sub_key] for sub_key in sub_key_list))
+        elif isinstance(node, ir.Call) and node.func_name.lower() in PURE_FUNC_NAME_SET \
+                and None not in node.args:
+            key = ('Call', node.func_name.lower(), *(key_mapping_num_dict[sub_key] for sub_key in sub_key_list))
+        else:
+            key = None
+        if key is not None:
+            key_mapping_num_dict.setdefault(key, len(key_mapping_num_dict))
+        id_mapping_key_dict[id(node)] = key
+    return id_mapping_key_dict
+
+
+class StmtOptimizer:
+    """ 單一陳述式內的運算式最佳化: 常數摺疊、共用滑鼠位置、共用子運算式
+
+    需要共用的值會於陳述式之前以暫存變數計算一次
+    """
+
+    def __init__(self):
+        self.cse_var_count = 0
+
+    @staticmethod
+    def get_exprs(stmt: ir.Stmt) -> List[Optional[ir.Expr]]:
+        """ 獲取陳述式中的運算式 (Command 的字串參數以 None 表示) """
+        if isinstance(stmt, ir.Command):
+            return [arg if not isinstance(arg, str) else None for arg in stmt.args]
+        if isinstance(stmt, ir.Assign):
+            return [stmt.expr]
+        if isinstance(stmt, ir.CallStatement):
+            return list(stmt.call.args)
+        return []
+
+    @staticmethod
+    def with_exprs(stmt: ir.Stmt, expr_list: List[Optional[ir.Expr]]) -> ir.Stmt:
+        """ 以新的運算式建立陳述式 """
+        if isinstance(stmt, ir.Command):
+            return ir.Command(
+                stmt.name,
+                [
+                    arg if isinstance(arg, str) else expr
+                    for arg, expr in zip(stmt.args, expr_list)
+                ],
+                disabled=stmt.disabled,
+            )
+        if isinstance(stmt, ir.Assign):
+            return ir.Assign(stmt.var_name, expr_list[0], disabled=stmt.disabled)
+        if isinstance(stmt, ir.CallStatement):
+            return ir.CallStatement(ir.Call(stmt.call.func_name, expr_list), disabled=stmt.disabled)
+        return stmt
+
+    @staticmethod
+    def share_mouse_pos(expr_list: List[Optional[ir.Expr]]) -> Tuple[List[ir.Stmt], List[Optional[ir.Expr]]]:
+        """ 同一陳述式中以相同座標模式多次取得鼠標位置時，改為只執行一次 MouseGetPos
+
+        Args:
+            expr_list (List[Optional[ir.Expr]])
+
+        Returns:
+            Tuple[List[ir.Stmt], List[Optional[ir.Expr]]]: 前置陳述式, 改寫後的運算式
+        """
+        def get_axis_and_coord_mode(expr: ir.Expr) -> Optional[Tuple[str, str]]:
+            if isinstance(expr, ir.Call) and expr.func_name == MOUSE_POS_FUNC_NAME \
+                    and len(expr.args) == 2 \
+                    and all(isinstance(arg, ir.String) for arg in expr.args):
+                return expr.args[0].value.lower(), expr.args[1].value
+            return None
+
+        # 計算各座標模式的呼叫次數
+        coord_mode_mapping_count_dict: Dict[str, int] = {}
+        work_stack = [expr for expr in expr_list if expr is not None]
+        while work_stack:
+            expr = work_stack.pop()
+            axis_and_coord_mode = get_axis_and_coord_mode(expr)
+            if axis_and_coord_mode is not None:
+                coord_mode = axis_and_coord_mode[1]
+                coord_mode_mapping_count_dict[coord_mode] = coord_mode_mapping_count_dict.get(coord_mode, 0) + 1
+            work_stack.extend(iter_sub_exprs(expr))
+
+        shared_coord_mode_list = [
+            coord_mode for coord_mode, count in coord_mode_mapping_count_dict.items()
+            if count >= 2
+        ]
+        if not shared_coord_mode_list:
+            return [], expr_list
+
+        pre_stmt_list: List[ir.Stmt] = []
+        for coord_mode in shared_coord_mode_list:
+            pre_stmt_list.extend([
+                ir.Command('CoordMode', ['Mouse', coord_mode]),
+                ir.Command('MouseGetPos', [
+                    f"mouse_x_{coord_mode.lower()}",
+                    f"mouse_y_{coord_mode.lower()}",
+                ]),
+            ])
+
+        def get_replacement(expr: ir.Expr) -> Optional[ir.Expr]:
+            axis_and_coord_mode = get_axis_and_coord_mode(expr)
+            if axis_and_coord_mode is None or axis_and_coord_mode[1] not in shared_coord_mode_list:
+                return None
+            axis, coord_mode = axis_and_coord_mode
+            return ir.Raw(f"mouse_{'x' if axis == 'x' else 'y'}_{coord_mode.lower()}")
+
+        return pre_stmt_list, [replace_exprs(expr, get_replacement) for expr in expr_list]
+
+    def share_common_exprs(self, expr_list: List[Optional[ir.Expr]]) -> Tuple[List[ir.Stmt], List[Optional[ir.Expr]]]:
+        """ 共用重複出現的子運算式 (僅限運算與沒有副作用的函式)
+
+        Args:
+            expr_list (List[Optional[ir.Expr]])
+
+        Returns:
+            Tuple[List[ir.Stmt], List[Optional[ir.Expr]]]: 前置陳述式 (暫存變數賦值), 改寫後的運算式
+        """
+        id_mapping_key_dict = get_expr_key_dict(expr_list)
+        key_mapping_count_dict: Dict[tuple, int] = {}
+        work_stack = [expr for expr in expr_list if expr is not None]
+        while work_stack:
+            expr = work_stack.pop()
+            key = id_mapping_key_dict[id(expr)]
+            if key is not None and isinstance(expr, (ir.BinaryOp, ir.Call)):
+                key_mapping_count_dict[key] = key_mapping_count_dict.get(key, 0) + 1
+            work_stack.extend(iter_sub_exprs(expr))
+
+        if not any(count >= 2 for count in key_mapping_count_dict.values()):
+            return [], expr_list
+
+        # 重複的運算式中的子運算式會隨之共用，只計算不在重複運算式中的出現次數
+        key_mapping_shared_count_dict: Dict[tuple, int] = {}
+        work_stack = [expr for expr in expr_list if expr is not None]
+        while work_stack:
+            expr = work_stack.pop()
+            key = id_mapping_key_dict[id(expr)]
+            if key_mapping_count_dict.get(key, 0) >= 2:
+                key_mapping_shared_count_dict[key] = key_mapping_shared_count_dict.get(key, 0) + 1
+                continue
+            work_stack.extend(iter_sub_exprs(expr))
+
+        pre_stmt_list: List[ir.Stmt] = []
+        key_mapping_var_dict: Dict[tuple, ir.Raw] = {}
+
+        def get_replacement(expr: ir.Expr) -> Optional[ir.Expr]:
+            key = id_mapping_key_dict.get(id(expr))
+            if key is None or key_mapping_shared_count_dict.get(key, 0) < 2:
+                return None
+            if key not in key_mapping_var_dict:
+                self.cse_var_count += 1
+                var_name = f"{CSE_VAR_NAME_PREFIX}{self.cse_var_count}"
+                pre_stmt_list.append(ir.Assign(var_name, expr))
+                key_mapping_var_dict[key] = ir.Raw(var_name)
+            return key_mapping_var_dict[key]
+
+        return pre_stmt_list, [replace_exprs(expr, get_replacement) for expr in expr_list]
+
+    def optimize(self, stmt: ir.Stmt) -> List[ir.Stmt]:
+        """ 最佳化單一陳述式
+
+        Args:
+            stmt (ir.Stmt)
+
+        Returns:
+            List[ir.Stmt]: 前置陳述式與改寫後的陳述式
+        """
+        # 停用 (註解掉) 的陳述式不會執行，不需最佳化
+        if stmt.disabled:
+            return [stmt]
+        expr_list = self.get_exprs(stmt)
+        if not any(expr is not None for expr in expr_list):
+            return [stmt]
+
+        folded_expr_list = [fold_constants(expr) for expr in expr_list]
+        mouse_pos_stmt_list, shared_expr_list = self.share_mouse_pos(folded_expr_list)
+        cse_stmt_list, shared_expr_list = self.share_common_exprs(shared_expr_list)
+        if all(
+            shared_expr is expr for shared_expr, expr in zip(shared_expr_list, expr_list)
+        ):
+            return [stmt]
+        return mouse_pos_stmt_list + cse_stmt_list + [self.with_exprs(stmt, shared_expr_list)]
+
+# endregion 共用子運算式
+
+
+# region 模式設定
+
+def get_mode_setting(stmt: ir.Stmt) -> Optional[Tuple[Tuple[str, str], str]]:
+    """ 獲取模式設定命令 (如 `SetTitleMatchMode, 2`、`CoordMode, Mouse, Screen`) 的設定項目與值
+
+    Args:
+        stmt (ir.Stmt)
+
+    Returns:
+        Optional[Tuple[Tuple[str, str], str]]: (設定項目, 值)，不是模式設定命令時回傳 None
+    """
+    if not isinstance(stmt, ir.Command) or stmt.disabled \
+            or not all(isinstance(arg, str) for arg in stmt.args):
+        return None
+    name = stmt.name.lower()
+    if name == 'settitlematchmode' and len(stmt.args) == 1:
+        value = stmt.args[0].strip().lower()
+        # 比對方式 (1、2、3、RegEx) 與速度 (Fast、Slow) 是兩個獨立的設定
+        return ('SetTitleMatchMode', 'speed' if value in ('fast', 'slow') else 'mode'), value
+    if name == 'coordmode' and len(stmt.args) in (1, 2):
+        target = stmt.args[0].strip().lower()
+        value = stmt.args[1].strip().lower() if len(stmt.args) == 2 else 'screen'
+        return ('CoordMode', target), value
+    return None
+
+
+def is_mode_setting_raw_stmt(stmt: ir.Stmt) -> bool:
+    """ 判斷是否為可能變更模式設定的原始陳述式 """
+    return isinstance(stmt, ir.RawStatement) and not stmt.disabled \
+        and MODE_COMMAND_PATTERN.search(stmt.text) is not None
+
+
+def iter_mouse_coord_modes(stmt: ir.Stmt) -> List[str]:
+    """ 獲取陳述式中 GetMousePos() 設定的鼠標座標模式 (函式內會執行 CoordMode, Mouse) """
+    coord_mode_list = []
+    work_stack = [expr for expr in StmtOptimizer.get_exprs(stmt) if expr is not None]
+    while work_stack:
+        expr = work_stack.pop()
+        if isinstance(expr, ir.Call) and expr.func_name == MOUSE_POS_FUNC_NAME:
+            coord_mode_arg = expr.args[1] if len(expr.args) == 2 else None
+            coord_mode_list.append(
+                coord_mode_arg.value.lower() if isinstance(coord_mode_arg, ir.String) else None
+            )
+        work_stack.extend(iter_sub_exprs(expr))
+    return coord_mode_list
+
+
+def hoist_mode_settings(program: ir.Program) -> ir.Program:
+    """ 將整個程式中一致的模式設定移至腳本開頭 (自動執行區段的設定即為每個熱鍵執行緒的預設值)，
+    並移除熱鍵/熱字串動作中重複的模式設定
+
+    Args:
+        program (ir.Program)
+
+    Returns:
+        ir.Program
+    """
+    item_list = [
+        item for item in program.items
+        if isinstance(item, (ir.Hotkey, ir.HotstringAction, ir.Label, ir.Sequence))
+        and not item.disabled
+    ]
+    # 收集各設定項目的所有值 (None 表示無法確定)
+    setting_mapping_value_set_dict: Dict[Tuple[str, str], set] = {}
+    setting_mapping_stmt_dict: Dict[Tuple[str, str], ir.Command] = {}
+    for item in item_list:
+        for stmt in item.body:
+            if is_mode_setting_raw_stmt(stmt):
+                return map_bodies(program, remove_repeated_mode_settings)
+            mode_setting = get_mode_setting(stmt)
+            if mode_setting is not None:
+                setting, value = mode_setting
+                setting_mapping_value_set_dict.setdefault(setting, set()).add(value)
+                setting_mapping_stmt_dict.setdefault(setting, stmt)
+            for coord_mode in iter_mouse_coord_modes(stmt):
+                setting_mapping_value_set_dict.setdefault(('CoordMode', 'mouse'), set()).add(coord_mode)
+
+    default_setting_dict = {
+        setting: next(iter(value_set))
+        for setting, value_set in setting_mapping_value_set_dict.items()
+        if len(value_set) == 1 and None not in value_set and setting in setting_mapping_stmt_dict
+    }
+    program = map_bodies(
+        program,
+        lambda body: remove_repeated_mode_settings(body, default_setting_dict),
+    )
+    if not default_setting_dict:
+        return program
+    header = ir.Sequence([
+        setting_mapping_stmt_dict[setting] for setting in default_setting_dict
+    ])
+    return ir.Program([header] + program.items)
+
+
+def remove_repeated_mode_settings(
+        body: List[ir.Stmt],
+        default_setting_dict: Optional[Dict[Tuple[str, str], str]] = None) -> List[ir.Stmt]:
+    """ 移除與目前設定相同的模式設定命令
+
+    Args:
+        body (List[ir.Stmt])
+        default_setting_dict (Optional[Dict[Tuple[str, str], str]], optional): 執行緒開始時的設定. Defaults to None.
+
+    Returns:
+        List[ir.Stmt]
+    """
+    setting_mapping_value_dict = dict(default_setting_dict or {})
+    com_stmt_list: List[ir.Stmt] = []
+    for stmt in body:
+        mode_setting = get_mode_setting(stmt)
+        if mode_setting is not None:
+            setting, value = mode_setting
+            if setting_mapping_value_dict.get(setting) == value:
+                continue
+            setting_mapping_value_dict[setting] = value
+        elif is_mode_setting_raw_stmt(stmt):
+            setting_mapping_value_dict.clear()
+        else:
+            for coord_mode in iter_mouse_coord_modes(stmt):
+                setting_mapping_value_dict[('CoordMode', 'mouse')] = coord_mode
+        com_stmt_list.append(stmt)
+    return com_stmt_list
+
+# endregion 模式設定
+
+
+# region 窺孔最佳化
+
+class SendRun:
+    """ 可合併成一個送出命令的連續送出命令 (按鍵在前、文字在後)
+
+    AHK 的 `{Text}` 之後的內容都視為文字，因此送出文字之後不能再合併送出按鍵
+    """
+
+    def __init__(self, stmt: ir.Command):
+        self.name = stmt.name
+        self.stmt_list: List[ir.Command] = []
+        self.keys_list: List[str] = []
+        self.text_expr_list: List[ir.Expr] = []
+        self.add(stmt)
+
+    @staticmethod
+    def get_keys(stmt: ir.Stmt) -> Optional[str]:
+        """ 獲取送出按鍵命令的按鍵 (如 '^{c}')，不是送出按鍵命令時回傳 None """
+        if isinstance(stmt, ir.Command) and stmt.name in SEND_COMMAND_NAME_SET \
+                and not stmt.disabled and len(stmt.args) == 1 and isinstance(stmt.args[0], str):
+            return stmt.args[0]
+        return None
+
+    @staticmethod
+    def get_text_expr(stmt: ir.Stmt) -> Optional[ir.Expr]:
+        """ 獲取送出文字命令 (`SendInput % "{TEXT}" . 文字`) 的文字運算式，不是送出文字命令時回傳 None """
+        if isinstance(stmt, ir.Command) and stmt.name in SEND_COMMAND_NAME_SET \
+                and not stmt.disabled and len(stmt.args) == 1:
+            arg = stmt.args[0]
+            if isinstance(arg, ir.BinaryOp) and arg.op == '.' \
+                    and isinstance(arg.left, ir.String) and arg.left.value == SEND_TEXT_MODE_KEY:
+                return arg.right
+        return None
+
+    def add(self, stmt: ir.Stmt) -> bool:
+        """ 加入送出命令
+
+        Args:
+            stmt (ir.Stmt)
+
+        Returns:
+            bool: 不能合併時回傳 False
+        """
+        if not isinstance(stmt, ir.Command) or stmt.name != self.name:
+            return False
+        keys = self.get_keys(stmt)
+        if keys is not None:
+            if self.text_expr_list:
+                return False
+            self.keys_list.append(keys)
+        else:
+            text_expr = self.get_text_expr(stmt)
+            # 按鍵改以運算式字串送出時，`%` 的意義不同 (命令參數中為變數參照)
+            if text_expr is None or any('%' in keys for keys in self.keys_list):
+                return False
+            self.text_expr_list.append(text_expr)
+        self.stmt_list.append(stmt)
+        return True
+
+    def to_stmt(self) -> ir.Command:
+        """ 合併成一個送出命令 """
+        if len(self.stmt_list) == 1:
+            return self.stmt_list[0]
+        keys = ''.join(self.keys_list)
+        if not self.text_expr_list:
+            return ir.Command(self.name, [keys])
+
+        # 以雙引號跳脫的按鍵與 {Text} 作為字串開頭，並合併相鄰的字串字面值
+        part_list: List[ir.Expr] = [ir.String(keys.replace('"', '""') + SEND_TEXT_MODE_KEY)]
+        for text_expr in self.text_expr_list:
+            if isinstance(text_expr, ir.String) and isinstance(part_list[-1], ir.String):
+                part_list[-1] = ir.String(part_list[-1].value + text_expr.value)
+            else:
+                part_list.append(text_expr)
+        com_expr = part_list[0]
+        for part in part_list[1:]:
+            com_expr = ir.BinaryOp('.', com_expr, part)
+        return ir.Command(self.name, [com_expr])
+
+
+def get_constant_sleep_time(stmt: ir.Stmt) -> Optional[Num]:
+    """ 獲取常數等待時間 (毫秒)，不是常數等待命令時回傳 None """
+    if isinstance(stmt, ir.Command) and stmt.name == 'Sleep' \
+            and not stmt.disabled and len(stmt.args) == 1:
+        value = get_number_value(stmt.args[0])
+        if value is not None and value >= 0:
+            return value
+    return None
+
+
+def is_var_referenced(var_name: str, expr: Optional[ir.Expr]) -> bool:
+    """ 判斷運算式是否參照變數 (原始運算式文字中出現變數名稱即視為參照) """
+    var_name_pattern = re.compile(Rf'\b{re.escape(var_name)}\b', re.IGNORECASE)
+    work_stack = [expr] if expr is not None else []
+    while work_stack:
+        sub_expr = work_stack.pop()
+        if isinstance(sub_expr, ir.Raw) and var_name_pattern.search(sub_expr.text):
+            return True
+        work_stack.extend(iter_sub_exprs(sub_expr))
+    return False
+
+
+def peephole(body: List[ir.Stmt]) -> List[ir.Stmt]:
+    """ 窺孔最佳化: 合併相鄰的陳述式，並移除沒有作用的陳述式
+
+    - 移除停用 (空的輸入而註解掉) 的陳述式與 `Sleep 0`
+    - 相鄰的送出按鍵/文字合併成一個送出命令，一次送出 (中間不會插入其他輸入)
+    - 相鄰的常數等待時間相加
+    - 移除立即被覆寫 (且未被參照) 的變數賦值
+
+    Args:
+        body (List[ir.Stmt])
+
+    Returns:
+        List[ir.Stmt]
+    """
+    com_stmt_list: List[ir.Stmt] = []
+    send_run: Optional[SendRun] = None
+
+    def flush_send_run():
+        nonlocal send_run
+        if send_run is not None:
+            com_stmt_list.append(send_run.to_stmt())
+            send_run = None
+
+    for stmt in body:
+        if stmt.disabled or get_constant_sleep_time(stmt) == 0:
+            continue
+        if send_run is not None and send_run.add(stmt):
+            continue
+        flush_send_run()
+        if SendRun.get_keys(stmt) is not None or SendRun.get_text_expr(stmt) is not None:
+            send_run = SendRun(stmt)
+            continue
+
+        prev_stmt = com_stmt_list[-1] if com_stmt_list else None
+        prev_sleep_time = get_constant_sleep_time(prev_stmt) if prev_stmt is not None else None
+        sleep_time = get_constant_sleep_time(stmt)
+        if prev_sleep_time is not None and sleep_time is not None:
+            com_stmt_list[-1] = ir.Command('Sleep', [fold_constants(
+                ir.BinaryOp('+', prev_stmt.args[0], stmt.args[0])
+            )])
+            continue
+        if isinstance(prev_stmt, ir.Assign) and isinstance(stmt, ir.Assign) \
+                and prev_stmt.var_name.lower() == stmt.var_name.lower() \
+                and not is_var_referenced(stmt.var_name, stmt.expr):
+            com_stmt_list[-1] = stmt
+            continue
+        com_stmt_list.append(stmt)
+    flush_send_run()
+    return com_stmt_list
+
+
+def get_constant_send_text(stmt: ir.Stmt) -> Optional[Tuple[str, str]]:
+    """ 獲取送出常數文字命令的按鍵與文字 (文字為 AHK 字串字面值的內容)，不是送出常數文字命令時回傳 None
+
+    Args:
+        stmt (ir.Stmt): 如 `SendInput % "{TEXT}文字"`、`SendInput % "^a{TEXT}文字"` (合併後的送出命令)
+
+    Returns:
+        Optional[Tuple[str, str]]: (按鍵, 文字)
+    """
+    if not isinstance(stmt, ir.Command) or stmt.name not in SEND_COMMAND_NAME_SET \
+            or stmt.disabled or len(stmt.args) != 1:
+        return None
+    arg = stmt.args[0]
+    if isinstance(arg, ir.BinaryOp) and arg.op == '.' \
+            and isinstance(arg.left, ir.String) and isinstance(arg.right, ir.String):
+        arg = ir.String(arg.left.value + arg.right.value)
+    if not isinstance(arg, ir.String):
+        return None
+    text_index = arg.value.find(SEND_TEXT_MODE_KEY)
+    if text_index < 0:
+        return None
+    return (
+        arg.value[:text_index].replace('""', '"'),
+        arg.value[text_index + len(SEND_TEXT_MODE_KEY):],
+    )
+
+
+def paste_long_texts(body: List[ir.Stmt], min_length: int = PASTE_TEXT_MIN_LENGTH) -> List[ir.Stmt]:
+    """ 送出的常數文字長度達到門檻時，改為經由剪貼簿貼上 (逐字送出數 KB 的文字需要數秒，且可能被使用者的輸入打斷)
+
+    文字為執行時才決定的運算式 (如剪貼簿內容) 時，長度未知，仍逐字送出
+
+    Args:
+        body (List[ir.Stmt])
+        min_length (int, optional): 改為貼上的文字長度. Defaults to PASTE_TEXT_MIN_LENGTH.
+
+    Returns:
+        List[ir.Stmt]
+    """
+    com_stmt_list: List[ir.Stmt] = []
+    for stmt in body:
+        send_text = get_constant_send_text(stmt)
+        if send_text is None or len(send_text[1]) < min_length:
+            com_stmt_list.append(stmt)
+            continue
+        keys, text = send_text
+        if keys:
+            com_stmt_list.append(ir.Command(stmt.name, [keys]))
+        com_stmt_list.append(ir.CallStatement(ir.Call(PASTE_TEXT_FUNC_NAME, [ir.String(text)])))
+    return com_stmt_list
+
+
+def use_precise_sleeps(body: List[ir.Stmt]) -> List[ir.Stmt]:
+    """ 將等待命令改為精確等待 (整個白板使用精確等待時；系統計時器的間隔約 10~15.6 毫秒，短的等待時間誤差很大)
+
+    Args:
+        body (List[ir.Stmt])
+
+    Returns:
+        List[ir.Stmt]
+    """
+    return [
+        ir.CallStatement(ir.Call(PRECISE_SLEEP_FUNC_NAME, [stmt.args[0]]))
+        if isinstance(stmt, ir.Command) and stmt.name == 'Sleep'
+        and not stmt.disabled and len(stmt.args) == 1 and isinstance(stmt.args[0], ir.Expr)
+        else stmt
+        for stmt in body
+    ]
+
+# endregion 窺孔最佳化
+
+
+# region 執行期設定
+
+class WorkloadStats(NamedTuple):
+    """ 程式的工作負載統計 (用於選擇執行期設定) """
+    # 啟用中的熱鍵數量
+    hotkey_count: int = 0
+    # 滑鼠按鍵 (含滾輪) 熱鍵數量
+    mouse_hotkey_count: int = 0
+    # 滾輪熱鍵數量 (捲動時會快速連續觸發)
+    wheel_hotkey_count: int = 0
+    # 啟用中的熱字串 (含熱字串動作) 數量
+    hotstring_count: int = 0
+    # 熱鍵中送出按鍵/文字的陳述式數量 (送出的按鍵可能觸發非 hook 的熱鍵)
+    hotkey_send_count: int = 0
+    # 執行的陳述式數量 (熱鍵、熱字串動作、標籤與自動執行區段)
+    stmt_count: int = 0
+
+
+def is_send_stmt(stmt: ir.Stmt) -> bool:
+    """ 判斷是否為送出按鍵/文字的陳述式 (含經由剪貼簿貼上) """
+    if isinstance(stmt, ir.Command):
+        return stmt.name in SEND_COMMAND_NAME_SET
+    return isinstance(stmt, ir.CallStatement) and stmt.call.func_name == PASTE_TEXT_FUNC_NAME
+
+
+def analyze_workload(program: ir.Program) -> WorkloadStats:
+    """ 統計程式的工作負載: 熱鍵數量、滑鼠/鍵盤熱鍵、熱鍵中的送出命令與熱字串數量
+
+    Args:
+        program (ir.Program)
+
+    Returns:
+        WorkloadStats
+    """
+    hotkey_count = mouse_hotkey_count = wheel_hotkey_count = 0
+    hotstring_count = hotkey_send_count = stmt_count = 0
+    for item in program.items:
+        if item.disabled:
+            continue
+        if isinstance(item, (ir.Hotstring, ir.HotstringAction)):
+            hotstring_count += 1
+        body = getattr(item, 'body', [])
+        stmt_count += sum(not stmt.disabled for stmt in body)
+        if not isinstance(item, ir.Hotkey):
+            continue
+        hotkey_count += 1
+        if MOUSE_KEY_PATTERN.search(item.key):
+            mouse_hotkey_count += 1
+        if WHEEL_KEY_PATTERN.search(item.key):
+            wheel_hotkey_count += 1
+        hotkey_send_count += sum(is_send_stmt(stmt) and not stmt.disabled for stmt in body)
+    return WorkloadStats(
+        hotkey_count=hotkey_count,
+        mouse_hotkey_count=mouse_hotkey_count,
+        wheel_hotkey_count=wheel_hotkey_count,
+        hotstring_count=hotstring_count,
+        hotkey_send_count=hotkey_send_count,
+        stmt_count=stmt_count,
+    )
+
+
+def get_runtime_tuning_dict(workload_stats: WorkloadStats) -> Dict[str, str]:
+    """ 依工作負載選擇執行期設定
+
+    - 有執行的陳述式: `SetBatchLines -1` (AHK v1 預設每 10 毫秒暫停一次) 與 `ListLines Off` (不記錄執行的行)
+    - 有熱鍵或熱字串 (使用鍵盤/滑鼠 hook): `#KeyHistory 0` (不記錄按鍵歷史)
+    - 熱鍵很多或有滾輪熱鍵: 提高 `#MaxHotkeysPerInterval`，避免快速觸發時跳出警告
+    - 鍵盤熱鍵中有送出命令: `#UseHook`，送出的按鍵不會觸發熱鍵自身或其他熱鍵
+
+    Args:
+        workload_stats (WorkloadStats)
+
+    Returns:
+        Dict[str, str]: 設定名稱與其值字典 (值為空字串表示只輸出名稱，如 `#UseHook`)
+    """
+    com_tuning_dict: Dict[str, str] = {}
+    if workload_stats.stmt_count:
+        com_tuning_dict['SetBatchLines'] = '-1'
+        com_tuning_dict['ListLines'] = 'Off'
+    if workload_stats.hotkey_count or workload_stats.hotstring_count:
+        com_tuning_dict['#KeyHistory'] = '0'
+    if workload_stats.wheel_hotkey_count or workload_stats.hotkey_count >= MANY_HOTKEY_COUNT:
+        com_tuning_dict['#MaxHotkeysPerInterval'] = str(MAX_HOTKEYS_PER_INTERVAL)
+    if workload_stats.hotkey_send_count \
+            and workload_stats.hotkey_count > workload_stats.mouse_hotkey_count:
+        com_tuning_dict['#UseHook'] = ''
+    return com_tuning_dict
+
+
+def parse_runtime_tuning_override(tuning_str: str) -> Tuple[str, Optional[str]]:
+    """ 解析自訂的執行期設定，如 `SetBatchLines=20ms`、`#UseHook=` (值為空表示不輸出該設定)
+
+    Args:
+        tuning_str (str)
+
+    Raises:
+        ValueError: 格式錯誤或未知的設定名稱
+
+    Returns:
+        Tuple[str, Optional[str]]: (設定名稱, 值)
+    """
+    name, sep, value = tuning_str.partition('=')
+    name = name.strip()
+    if not sep or name not in RUNTIME_TUNING_NAMES:
+        raise ValueError(
+            f"自訂的執行期設定需為 名稱=值，名稱為 {', '.join(RUNTIME_TUNING_NAMES)}: {tuning_str}")
+    return name, value.strip() or None
+
+
+def parse_runtime_tuning_overrides(tuning_overrides_str: str) -> Dict[str, Optional[str]]:
+    """ 解析以逗號分隔的自訂執行期設定，如 `SetBatchLines=20ms, #UseHook=` (見 `parse_runtime_tuning_override`)
+
+    Args:
+        tuning_overrides_str (str)
+
+    Raises:
+        ValueError: 格式錯誤或未知的設定名稱
+
+    Returns:
+        Dict[str, Optional[str]]
+    """
+    return dict(
+        parse_runtime_tuning_override(tuning_str)
+        for tuning_str in tuning_overrides_str.split(',')
+        if tuning_str.strip()
+    )
+
+
+def select_runtime_tuning(
+        program: ir.Program,
+        auto_tuning: bool = True,
+        tuning_overrides: Optional[Dict[str, Optional[str]]] = None) -> Dict[str, str]:
+    """ 選擇程式的執行期設定: 依工作負載選擇 (見 `get_runtime_tuning_dict`)，再套用白板自訂的設定
+
+    設定由置頂程式碼輸出 (見 `compiler.get_header_ahkscr`)，不會加入程式中
+
+    Args:
+        program (ir.Program): 最佳化後的程式 (含貼上、分派器等函式呼叫)
+        auto_tuning (bool, optional): 是否依工作負載選擇設定 (否則只輸出自訂的設定). Defaults to True.
+        tuning_overrides (Optional[Dict[str, Optional[str]]], optional): 白板自訂的設定，
+            如 {"SetBatchLines": "20ms", "#UseHook": None} (None 表示不輸出該設定). Defaults to None.
+
+    Raises:
+        ValueError: 未知的設定名稱
+
+    Returns:
+        Dict[str, str]: 依 `RUNTIME_TUNING_NAMES` 順序排列的設定名稱與其值字典 (值為空字串表示只輸出名稱)
+    """
+    tuning_dict = get_runtime_tuning_dict(analyze_workload(program)) if auto_tuning else {}
+    for name, value in (tuning_overrides or {}).items():
+        if name not in RUNTIME_TUNING_NAMES:
+            raise ValueError(f"未知的執行期設定: {name} (可用: {', '.join(RUNTIME_TUNING_NAMES)})")
+        if value is None:
+            tuning_dict.pop(name, None)
+        else:
+            tuning_dict[name] = value
+    return {
+        name: tuning_dict[name]
+        for name in RUNTIME_TUNING_NAMES
+        if name in tuning_dict
+    }
+
+# endregion 執行期設定
+
+
+# region 程式
+
+def with_body(item: ir.TopLevel, body: List[ir.Stmt]) -> ir.TopLevel:
+    """ 以新的陳述式串列建立頂層項目
+
+    Args:
+        item (ir.TopLevel): 熱鍵、熱字串動作或頂層的陳述式串列
+        body (List[ir.Stmt])
+
+    Returns:
+        ir.TopLevel
+    """
+    if isinstance(item, ir.Hotkey):
+        return ir.Hotkey(item.key, body, disabled=item.disabled)
+    if isinstance(item, ir.HotstringAction):
+        return ir.HotstringAction(item.options, item.abbr, body, disabled=item.disabled)
+    if isinstance(item, ir.Label):
+        return ir.Label(item.name, body)
+    return ir.Sequence(body)
+
+
+def map_bodies(program: ir.Program, body_pass: Callable[[List[ir.Stmt]], List[ir.Stmt]]) -> ir.Program:
+    """ 對程式中每個頂層項目的陳述式串列套用最佳化
+
+    Args:
+        program (ir.Program)
+        body_pass (Callable[[List[ir.Stmt]], List[ir.Stmt]]): 回傳新的陳述式串列
+
+    Returns:
+        ir.Program
+    """
+    return ir.Program([
+        with_body(item, body_pass(item.body))
+        if isinstance(item, (ir.Hotkey, ir.HotstringAction, ir.Label, ir.Sequence))
+        else item
+        for item in program.items
+    ])
+
+
+def optimize_exprs(body: List[ir.Stmt]) -> List[ir.Stmt]:
+    """ 最佳化陳述式串列中的運算式
+
+    每個陳述式串列各自編號暫存變數，相同的動作產生相同的代碼，以便共用 (見 `share_action_bodies`)
+    """
+    stmt_optimizer = StmtOptimizer()
+    return [
+        optimized_stmt
+        for stmt in body
+        for optimized_stmt in stmt_optimizer.optimize(stmt)
+    ]
+
+
+def share_action_bodies(program: ir.Program) -> ir.Program:
+    """ 多個熱鍵/熱字串動作執行相同的多行陳述式時，只產生一次標籤，熱鍵改以 Gosub 跳至標籤
+
+    標籤置於程式結尾 (熱鍵之後)，不會於腳本載入時執行
+
+    Args:
+        program (ir.Program)
+
+    Returns:
+        ir.Program
+    """
+    def get_body_key(item: ir.TopLevel) -> Optional[Tuple[str, ...]]:
+        # 單行的陳述式不需共用；停用的項目不會執行
+        if not isinstance(item, (ir.Hotkey, ir.HotstringAction)) \
+                or item.disabled or len(item.body) < 2:
+            return None
+        return tuple(codegen.stmt_to_ahkscr(stmt) for stmt in item.body)
+
+    item_key_list = [get_body_key(item) for item in program.items]
+    key_mapping_count_dict: Dict[Tuple[str, ...], int] = {}
+    for key in item_key_list:
+        if key is not None:
+            key_mapping_count_dict[key] = key_mapping_count_dict.get(key, 0) + 1
+    if not any(count >= 2 for count in key_mapping_count_dict.values()):
+        return program
+
+    item_list: List[ir.TopLevel] = []
+    label_list: List[ir.Label] = []
+    key_mapping_label_name_dict: Dict[Tuple[str, ...], str] = {}
+    for item, key in zip(program.items, item_key_list):
+        if key is None or key_mapping_count_dict[key] < 2:
+            item_list.append(item)
+            continue
+        if key not in key_mapping_label_name_dict:
+            label_name = f"{SHARED_ACTION_LABEL_NAME_PREFIX}{len(label_list) + 1}"
+            key_mapping_label_name_dict[key] = label_name
+            label_list.append(ir.Label(label_name, item.body))
+        item_list.append(with_body(item, [
+            ir.Command('Gosub', [key_mapping_label_name_dict[key]]),
+        ]))
+    return ir.Program(item_list + label_list)
+
+
+def is_dispatchable_hotstring(item: ir.TopLevel) -> bool:
+    """ 判斷是否為可交由熱字串分派器處理的熱字串 (啟用中的展開文字熱字串，且僅使用分派器支援的選項) """
+    return isinstance(item, ir.Hotstring) and not item.disabled \
+        and set(item.options.lower()) <= HOTSTRING_DISPATCH_OPTION_CHAR_SET
+
+
+def get_hotstring_dispatch_sequence(hotstrings: List[ir.Hotstring]) -> ir.Sequence:
+    """ 將熱字串轉換成熱字串分派器的資料段落: 以續行段落保留 `:選項:縮寫::展開字詞` 原文
+    (% 與 ` 選項: 不取代變數、不處理跳脫序列，由分派器依熱字串的規則處理)
+
+    Args:
+        hotstrings (List[ir.Hotstring])
+
+    Returns:
+        ir.Sequence
+    """
+    data_line_list = [
+        f":{hotstring.options}:{hotstring.abbr}::{hotstring.text}"
+        for hotstring in hotstrings
+    ]
+    return ir.Sequence([
+        ir.RawStatement("\n".join([
+            f"{HOTSTRING_DISPATCH_DATA_VAR_NAME} =",
+            "(% `",
+            *data_line_list,
+            ")",
+        ])),
+        ir.CallStatement(ir.Call(
+            HOTSTRING_DISPATCHER_FUNC_NAME, [ir.Raw(HOTSTRING_DISPATCH_DATA_VAR_NAME)])),
+    ])
+
+
+def dispatch_hotstrings(program: ir.Program, threshold: int) -> ir.Program:
+    """ 熱字串數量達到門檻時，改以單一 InputHook 的熱字串分派器處理:
+    縮寫與展開文字輸出成資料段落，分派器以雜湊表查詢，每次按鍵的處理時間不隨熱字串數量增加
+
+    資料段落須於自動執行區段中執行，因此置於第一個熱鍵/熱字串之前；
+    熱字串動作 (有陳述式的熱字串) 與使用其他選項的熱字串仍以原生熱字串輸出
+
+    Args:
+        program (ir.Program)
+        threshold (int): 可分派的熱字串數量門檻
+
+    Returns:
+        ir.Program
+    """
+    hotstring_list = [item for item in program.items if is_dispatchable_hotstring(item)]
+    if not hotstring_list or len(hotstring_list) < threshold:
+        return program
+
+    item_list = [item for item in program.items if not is_dispatchable_hotstring(item)]
+    insert_index = 0
+    while insert_index < len(item_list) and isinstance(item_list[insert_index], ir.Sequence):
+        insert_index += 1
+    item_list[insert_index:insert_index] = [
+        get_hotstring_dispatch_sequence(hotstring_list[index:index + HOTSTRING_DISPATCH_CHUNK_SIZE])
+        for index in range(0, len(hotstring_list), HOTSTRING_DISPATCH_CHUNK_SIZE)
+    ]
+    return ir.Program(item_list)
+
+
+def optimize_program(
+        program: ir.Program,
+        hotstring_dispatch_threshold: Optional[int] = None,
+        paste_text_min_length: Optional[int] = None,
+        precise_sleep: bool = False,
+        whole_program: bool = True) -> ir.Program:
+    """ 最佳化整個程式
+
+    Args:
+        program (ir.Program)
+        hotstring_dispatch_threshold (Optional[int], optional):
+            熱字串數量達到此門檻時改用熱字串分派器 (見 `dispatch_hotstrings`). Defaults to None (不使用).
+        paste_text_min_length (Optional[int], optional):
+            送出的常數文字長度達到此門檻時改為經由剪貼簿貼上 (見 `paste_long_texts`).
+            Defaults to None (一律逐字送出).
+        precise_sleep (bool, optional): 是否將所有等待命令改為精確等待 (見 `use_precise_sleeps`). Defaults to False.
+        whole_program (bool, optional): 是否執行需要整個程式的最佳化 (模式設定提升、共用動作、熱字串分派器)；
+            否則只最佳化各頂層項目本身，可逐一最佳化積木. Defaults to True.
+
+    Returns:
+        ir.Program: 新的程式 (不修改傳入的 IR)
+    """
+    program = map_bodies(program, optimize_exprs)
+    if whole_program:
+        program = hoist_mode_settings(program)
+    program = map_bodies(program, peephole)
+    # 於合併相鄰的送出命令之後判斷，以合併後的文字長度選擇送出方式
+    if paste_text_min_length is not None:
+        program = map_bodies(program, lambda body: paste_long_texts(body, paste_text_min_length))
+    # 於相鄰的常數等待時間相加之後才改為精確等待
+    if precise_sleep:
+        program = map_bodies(program, use_precise_sleeps)
+    if not whole_program:
+        return program
+    program = share_action_bodies(program)
+    # 資料段落為原始陳述式，於其他最佳化之後才加入
+    if hotstring_dispatch_threshold is not None:
+        program = dispatch_hotstrings(program, hotstring_dispatch_threshold)
+    return program
+
+# endregion 程式
@@ -0,0 +1,139 @@
+"""
+積木編譯效能分析 (瀏覽器與伺服器端共用): 依積木類統計實例化、產生 AHK 代碼 (降階) 與序列化的
+呼叫次數、累計時間與自身時間，並記錄整個白板各編譯階段的耗時
+"""
+import time
+from typing import Callable, Dict, List, Tuple
+
+# 積木類的分析階段: 實例化、產生 AHK 代碼 (降階成 IR)、序列化 (xml 字串或 json 字典)
+BLOCK_STAGE_NAMES = ('create', 'ahkscr', 'serialize')
+
+
+class StageStat:
+    """ 單一積木類於單一階段的統計 """
+    __slots__ = ('call_count', 'cumulative_time', 'self_time')
+
+    def __init__(self):
+        self.call_count = 0
+        # 累計時間: 含子層積木的時間 (同類積木巢狀時只計最外層)
+        self.cumulative_time = 0.0
+        # 自身時間: 扣除子層積木的時間
+        self.self_time = 0.0
+
+    def get_dict(self) -> dict:
+        """ 取得統計字典 (時間單位為毫秒) """
+        return {
+            "call_count": self.call_count,
+            "cumulative_ms": round(self.cumulative_time * 1000, 4),
+            "self_ms": round(self.self_time * 1000, 4),
+        }
+
+
+class BlockProfiler:
+    """ 積木編譯效能分析器
+
+    以 `start()`、`stop()` 成對包住單一積木的處理 (可巢狀)，
+    子層積木的時間會自上層積木的自身時間中扣除
+    """
+
+    def __init__(self):
+        # (積木類名稱, 階段名稱) 與其統計字典
+        self.block_class_name_and_stage_name_mapping_stage_stat_dict: Dict[Tuple[str, str], StageStat] = {}
+        # 白板各編譯階段名稱與其耗時秒數字典 (依執行順序)
+        self.workspace_stage_name_mapping_time_dict: Dict[str, float] = {}
+        # 進行中的量測: [(積木類名稱, 階段名稱), 開始時間, 子層積木時間]
+        self._frame_stack: List[list] = []
+        # 進行中的 (積木類名稱, 階段名稱) 與其巢狀層數字典
+        self._active_key_mapping_depth_dict: Dict[Tuple[str, str], int] = {}
+
+    def start(self, block_class_name: str, stage_name: str):
+        """ 開始量測單一積木的處理
+
+        Args:
+            block_class_name (str): 積木類名稱
+            stage_name (str): 階段名稱 (見 `BLOCK_STAGE_NAMES`)
+        """
+        key = (block_class_name, stage_name)
+        self._active_key_mapping_depth_dict[key] = self._active_key_mapping_depth_dict.get(key, 0) + 1
+        self._frame_stack.append([key, time.perf_counter(), 0.0])
+
+    def stop(self):
+        """ 結束最近一次開始的量測 """
+        key, start_time, sub_time = self._frame_stack.pop()
+        elapsed_time = time.perf_counter() - start_time
+        stage_stat = self.block_class_name_and_stage_name_mapping_stage_stat_dict.get(key)
+        if stage_stat is None:
+            stage_stat = self.block_class_name_and_stage_name_mapping_stage_stat_dict[key] = StageStat()
+        stage_stat.call_count += 1
+        stage_stat.self_time += elapsed_time - sub_time
+
+        depth = self._active_key_mapping_depth_dict[key] - 1
+        self._active_key_mapping_depth_dict[key] = depth
+        if depth == 0:
+            stage_stat.cumulative_time += elapsed_time
+        if self._frame_stack:
+            self._frame_stack[-1][2] += elapsed_time
+
+    def measure(self, workspace_stage_name: str, func: Callable, *args):
+        """ 量測白板的單一編譯階段
+
+        Args:
+            workspace_stage_name (str): 階段名稱，如 'parse'、'lower'
+            func (Callable): 執行該階段的函式
+            *args: 函式參數
+
+        Returns:
+            函式的回傳值
+        """
+        start_time = time.perf_counter()
+        result = func(*args)
+        self.workspace_stage_name_mapping_time_dict[workspace_stage_name] = \
+            self.workspace_stage_name_mapping_time_dict.get(workspace_stage_name, 0.0) \
+            + time.perf_counter() - start_time
+        return result
+
+    def get_report_dict(self) -> dict:
+        """ 取得分析報告字典: 白板各階段耗時，與依自身時間總和排序 (由大至小) 的積木類統計
+
+        Returns:
+            dict: {
+                "workspace": {"total_ms": 總耗時, "block_count": 實例化的積木數, "stages": {階段名稱: 耗時}},
+                "blocks": [{"block_class": 積木類名稱, "self_ms": 自身時間總和, "stages": {階段名稱: 統計字典}}, ...],
+            }
+        """
+        block_class_name_mapping_stage_dict: Dict[str, Dict[str, dict]] = {}
+        for (block_class_name, stage_name), stage_stat in \
+                self.block_class_name_and_stage_name_mapping_stage_stat_dict.items():
+            block_class_name_mapping_stage_dict.setdefault(
+                block_class_name, {})[stage_name] = stage_stat.get_dict()
+
+        com_block_report_list = [
+            {
+                "block_class": block_class_name,
+                "self_ms": round(sum(
+                    stage_dict['self_ms'] for stage_dict in stage_name_mapping_stage_dict.values()
+                ), 4),
+                "stages": {
+                    stage_name: stage_name_mapping_stage_dict[stage_name]
+                    for stage_name in BLOCK_STAGE_NAMES
+                    if stage_name in stage_name_mapping_stage_dict
+                },
+            }
+            for block_class_name, stage_name_mapping_stage_dict in block_class_name_mapping_stage_dict.items()
+        ]
+        com_block_report_list.sort(key=lambda block_report: -block_report['self_ms'])
+
+        return {
+            "workspace": {
+                "total_ms": round(sum(self.workspace_stage_name_mapping_time_dict.values()) * 1000, 4),
+                "block_count": sum(
+                    block_report['stages'].get('create', {}).get('call_count', 0)
+                    for block_report in com_block_report_list
+                ),
+                "stages": {
+                    stage_name: round(stage_time * 1000, 4)
+                    for stage_name, stage_time in self.workspace_stage_name_mapping_time_dict.items()
+                },
+            },
+            "blocks": com_block_report_list,
+        }
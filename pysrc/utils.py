@@ -1,13 +1,20 @@
-from browser import (
-    window,
-)
-import browser
+import html
 import re
 
 from utils import AHK_PROCESS_PID_FILENAME
+from pysrc.dom import prettify_xml_str
 
-log = window.console.log
-Blockly = window.Blockly
+try:
+    from browser import (
+        window,
+    )
+    import browser
+except ImportError:
+    # 於 CPython (伺服器端) 下執行時沒有 browser 模組
+    window = browser = None
+
+log = window.console.log if window else print
+Blockly = window.Blockly if window else None
 TAB4_INDENT: str = '    '
 
 
@@ -22,7 +29,17 @@ def to_camel_case(snake_str: str) -> str:
     return snake_str.title()
 
 
-def xml_to_str(xml: browser.DOMNode, formatting: bool = False) -> str:
+def escape_xml_text(text: str) -> str:
+    """ 跳脫 xml 文字內容中的 `&`、`<`、`>` """
+    return html.escape(text, quote=False)
+
+
+def escape_xml_attr(attr_value: str) -> str:
+    """ 跳脫 xml 屬性值中的 `&`、`<`、`>`、`"`、`'` """
+    return html.escape(attr_value, quote=True)
+
+
+def xml_to_str(xml: 'browser.DOMNode', formatting: bool = False) -> str:
     """ XML 元素轉換成字串
 
     Args:
@@ -43,5 +60,5 @@ def xml_to_str(xml: browser.DOMNode, formatting: bool = False) -> str:
     return com_xml.replace("/>", "></block>")
 
 
-def xml_str_to_xml(xml_str: str) -> browser.DOMNode:
+def xml_str_to_xml(xml_str: str) -> 'browser.DOMNode':
     return window.DOMParser.new().parseFromString(xml_str, 'text/xml')
@@ -0,0 +1,323 @@
+"""
+白板 xml 字串與 json 格式 (Blockly 的 json 序列化格式) 的無損轉換
+
+    {
+        "blocks": {
+            "languageVersion": 0,
+            "blocks": [
+                {
+                    "type": "short_cut", "id": "...", "x": 10, "y": 10,
+                    "fields": {...}, "inputs": {"DO": {"block": {...}}}, "next": {"block": {...}},
+                },
+            ],
+        },
+        "variables": [{"name": "...", "id": "...", "type": ""}],
+    }
+
+轉換保留積木的 id、座標、停用/收合等狀態、註解、mutation 與 shadow 積木，
+用於轉換舊的 xml 檔；積木實例直接產生的 json 見 `BlockBase.get_json_dict`
+"""
+import html
+import json
+from typing import Dict, List, Optional, Tuple, Union
+
+from pysrc import dom
+from pysrc.dom import DomNode
+from pysrc.models.block_bases import BlockBase
+from pysrc.utils import escape_xml_attr, escape_xml_text
+
+# 動態引入所有積木類，以便根據積木定義判斷輸入的標籤名稱
+BlockBase.import_block_classes()
+
+BLOCKLY_XML_NAMESPACE = 'https://developers.google.com/blockly/xml'
+
+# 值為 "true"/"false" 的積木屬性 (xml 屬性名稱 → json 鍵、預設值)
+BOOL_ATTR_NAME_MAPPING_KEY_AND_DEFAULT_DICT: Dict[str, Tuple[str, bool]] = {
+    'collapsed': ('collapsed', False),
+    'inline': ('inline', None),
+    'deletable': ('deletable', True),
+    'movable': ('movable', True),
+    'editable': ('editable', True),
+}
+
+
+def get_text(node: DomNode) -> str:
+    """ 獲取節點的文字內容 (反跳脫內部內容字串) """
+    return html.unescape(dom.get_inner_xml_str(node))
+
+
+def get_input_tag_name(block_type: str, input_name: str) -> str:
+    """ 根據積木定義判斷輸入的 xml 標籤名稱 (Blockly 載入 xml 時兩者相同，未知的積木視為 value)
+
+    Args:
+        block_type (str)
+        input_name (str)
+
+    Returns:
+        str: 'value' 或 'statement'
+    """
+    try:
+        block_class = BlockBase.get_block_class_by_type(block_type)
+    except (NameError, SyntaxError):
+        return 'value'
+    if input_name in block_class._input_statement_arg_names:
+        return 'statement'
+    return 'value'
+
+
+# region xml → json
+
+def block_node_to_json(block_node: DomNode, keep_ids: bool = True) -> dict:
+    """ block (或 shadow) node 轉換成積木 json 字典 (以工作堆疊取代遞迴)
+
+    Args:
+        block_node (DomNode)
+        keep_ids (bool, optional): 是否保留積木 id (Blockly 載入時會重新產生). Defaults to True.
+
+    Returns:
+        dict
+    """
+    com_block_json = {}
+    work_stack: List[Tuple[DomNode, dict]] = [(block_node, com_block_json)]
+    while work_stack:
+        node, block_json = work_stack.pop()
+
+        # 屬性
+        block_json['type'] = dom.get_attr(node, 'type')
+        for attr_name in ('id', 'x', 'y'):
+            attr_value = dom.get_attr(node, attr_name)
+            if attr_value is None or (attr_name == 'id' and not keep_ids):
+                continue
+            if attr_name != 'id':
+                try:
+                    attr_value = int(attr_value)
+                except ValueError:
+                    attr_value = float(attr_value)
+            block_json[attr_name] = attr_value
+        if dom.get_attr(node, 'disabled') == 'true':
+            block_json['enabled'] = False
+        for attr_name, (key, default_value) in BOOL_ATTR_NAME_MAPPING_KEY_AND_DEFAULT_DICT.items():
+            attr_value = dom.get_attr(node, attr_name)
+            if attr_value is not None and (attr_value == 'true') != default_value:
+                block_json[key] = attr_value == 'true'
+
+        # 子節點
+        for sub_node in dom.get_children(node):
+            tag_name = dom.get_tag_name(sub_node)
+            name = dom.get_attr(sub_node, 'name')
+            if tag_name == 'MUTATION':
+                # 同 Blockly: 以 mutationToDom 儲存的狀態以 xml 字串作為 extraState
+                block_json['extraState'] = dom.get_outer_xml_str(sub_node)
+            elif tag_name == 'COMMENT':
+                comment_json = {'text': get_text(sub_node)}
+                if dom.get_attr(sub_node, 'pinned') is not None:
+                    comment_json['pinned'] = dom.get_attr(sub_node, 'pinned') == 'true'
+                for attr_name, key in (('h', 'height'), ('w', 'width')):
+                    if dom.get_attr(sub_node, attr_name) is not None:
+                        comment_json[key] = int(float(dom.get_attr(sub_node, attr_name)))
+                block_json.setdefault('icons', {})['comment'] = comment_json
+            elif tag_name == 'DATA':
+                block_json['data'] = get_text(sub_node)
+            elif tag_name == 'FIELD':
+                # 變數欄位: 保留變數 id 與類型
+                if dom.get_attr(sub_node, 'id') is not None:
+                    field_value = {
+                        'id': dom.get_attr(sub_node, 'id'),
+                        'name': get_text(sub_node),
+                        'type': dom.get_attr(sub_node, 'variabletype') or '',
+                    }
+                else:
+                    field_value = get_text(sub_node)
+                block_json.setdefault('fields', {})[name] = field_value
+            elif tag_name in ('VALUE', 'STATEMENT', 'NEXT'):
+                input_json = {}
+                for input_sub_node in dom.get_children(sub_node):
+                    input_sub_tag_name = dom.get_tag_name(input_sub_node)
+                    if input_sub_tag_name in ('BLOCK', 'SHADOW'):
+                        sub_block_json = {}
+                        input_json[input_sub_tag_name.lower()] = sub_block_json
+                        work_stack.append((input_sub_node, sub_block_json))
+                if tag_name == 'NEXT':
+                    if input_json:
+                        block_json['next'] = input_json
+                elif input_json:
+                    block_json.setdefault('inputs', {})[name] = input_json
+    return com_block_json
+
+
+def xml_str_to_workspace_json(xml_str: str, keep_ids: bool = True) -> dict:
+    """ 白板 xml 字串轉換成 json 字典
+
+    Args:
+        xml_str (str): 開頭應為 <xml> 或 <block> 節點字串
+        keep_ids (bool, optional): 是否保留積木 id. Defaults to True.
+
+    Returns:
+        dict
+    """
+    xml_div = dom.parse_xml_str(xml_str)
+    xml_node = dom.select_one(xml_div, 'xml')
+    if xml_node is None:
+        xml_node = xml_div
+
+    block_json_list = []
+    variable_json_list = []
+    for sub_node in dom.get_children(xml_node):
+        tag_name = dom.get_tag_name(sub_node)
+        if tag_name == 'BLOCK':
+            block_json_list.append(block_node_to_json(sub_node, keep_ids))
+        elif tag_name == 'VARIABLES':
+            variable_json_list.extend(
+                {
+                    'name': get_text(variable_node),
+                    'id': dom.get_attr(variable_node, 'id'),
+                    'type': dom.get_attr(variable_node, 'type') or '',
+                }
+                for variable_node in dom.get_children(sub_node)
+            )
+
+    com_workspace_json = {
+        'blocks': {
+            'languageVersion': 0,
+            'blocks': block_json_list,
+        },
+    }
+    if variable_json_list:
+        com_workspace_json['variables'] = variable_json_list
+    return com_workspace_json
+
+# endregion xml → json
+
+
+# region json → xml
+
+def write_block_xml_str(
+        xml_str_buffer: List[str],
+        block_json: dict,
+        tag_name: str = 'block'):
+    """ 將積木 json 字典的 xml 片段寫入緩衝串列 (以工作堆疊取代遞迴)
+
+    Args:
+        xml_str_buffer (List[str]): xml 片段緩衝串列
+        block_json (dict)
+        tag_name (str, optional): 'block' 或 'shadow'. Defaults to 'block'.
+    """
+    work_stack: List[Union[str, Tuple[dict, str]]] = [(block_json, tag_name)]
+    while work_stack:
+        work = work_stack.pop()
+        if isinstance(work, str):
+            xml_str_buffer.append(work)
+            continue
+
+        block_json, tag_name = work
+        block_type = block_json['type']
+        attrs_str = f' type="{escape_xml_attr(block_type)}"'
+        for key in ('id', 'x', 'y'):
+            if key in block_json:
+                attrs_str += f' {key}="{escape_xml_attr(str(block_json[key]))}"'
+        if block_json.get('enabled') is False:
+            attrs_str += ' disabled="true"'
+        for attr_name, (key, default_value) in BOOL_ATTR_NAME_MAPPING_KEY_AND_DEFAULT_DICT.items():
+            if key in block_json and block_json[key] != default_value:
+                attrs_str += f' {attr_name}="{str(block_json[key]).lower()}"'
+
+        sub_work_list: List[Union[str, Tuple[dict, str]]] = [f'<{tag_name}{attrs_str}>']
+        extra_state = block_json.get('extraState')
+        if isinstance(extra_state, str):
+            sub_work_list.append(extra_state)
+        elif extra_state is not None:
+            # 以 saveExtraState 儲存的狀態 (json) 沒有對應的 xml，以 mutation 的屬性保留
+            sub_work_list.append(
+                f'<mutation extra_state="{escape_xml_attr(json.dumps(extra_state, ensure_ascii=False))}"></mutation>'
+            )
+
+        comment_json = (block_json.get('icons') or {}).get('comment')
+        if comment_json is not None:
+            comment_attrs_str = ''
+            if 'pinned' in comment_json:
+                comment_attrs_str += f' pinned="{str(comment_json["pinned"]).lower()}"'
+            for attr_name, key in (('h', 'height'), ('w', 'width')):
+                if key in comment_json:
+                    comment_attrs_str += f' {attr_name}="{comment_json[key]}"'
+            sub_work_list.append(
+                f'<comment{comment_attrs_str}>{escape_xml_text(comment_json.get("text", ""))}</comment>')
+        if 'data' in block_json:
+            sub_work_list.append(f'<data>{escape_xml_text(block_json["data"])}</data>')
+
+        for field_name, field_value in (block_json.get('fields') or {}).items():
+            if isinstance(field_value, dict):
+                sub_work_list.append(
+                    f'<field name="{escape_xml_attr(field_name)}"'
+                    f' id="{escape_xml_attr(field_value.get("id", ""))}"'
+                    f' variabletype="{escape_xml_attr(field_value.get("type", ""))}">'
+                    f'{escape_xml_text(field_value.get("name", ""))}</field>'
+                )
+            else:
+                sub_work_list.append(
+                    f'<field name="{escape_xml_attr(field_name)}">{escape_xml_text(str(field_value))}</field>')
+
+        input_item_list = [
+            (get_input_tag_name(block_type, input_name), input_name, input_json)
+            for input_name, input_json in (block_json.get('inputs') or {}).items()
+        ]
+        if block_json.get('next'):
+            input_item_list.append(('next', None, block_json['next']))
+        for input_tag_name, input_name, input_json in input_item_list:
+            name_attr_str = f' name="{escape_xml_attr(input_name)}"' if input_name is not None else ''
+            sub_work_list.append(f'<{input_tag_name}{name_attr_str}>')
+            for sub_tag_name in ('shadow', 'block'):
+                if input_json.get(sub_tag_name):
+                    sub_work_list.append((input_json[sub_tag_name], sub_tag_name))
+            sub_work_list.append(f'</{input_tag_name}>')
+
+        sub_work_list.append(f'</{tag_name}>')
+        work_stack.extend(reversed(sub_work_list))
+
+
+def workspace_json_to_xml_str(workspace_json: Union[str, dict]) -> str:
+    """ 白板 json 字典 (或 json 字串) 轉換成 xml 字串
+
+    Args:
+        workspace_json (Union[str, dict])
+
+    Returns:
+        str
+    """
+    if isinstance(workspace_json, str):
+        workspace_json = json.loads(workspace_json)
+
+    xml_str_buffer = [f'<xml xmlns="{BLOCKLY_XML_NAMESPACE}">']
+    variable_json_list = workspace_json.get('variables') or []
+    if variable_json_list:
+        xml_str_buffer.append('<variables>')
+        xml_str_buffer.extend(
+            f'<variable type="{escape_xml_attr(variable_json.get("type", ""))}"'
+            f' id="{escape_xml_attr(variable_json.get("id", ""))}">'
+            f'{escape_xml_text(variable_json.get("name", ""))}</variable>'
+            for variable_json in variable_json_list
+        )
+        xml_str_buffer.append('</variables>')
+    for block_json in (workspace_json.get('blocks') or {}).get('blocks') or []:
+        write_block_xml_str(xml_str_buffer, block_json)
+    xml_str_buffer.append('</xml>')
+    return ''.join(xml_str_buffer)
+
+# endregion json → xml
+
+
+def dumps(workspace_json: dict, indent: Optional[int] = None) -> str:
+    """ json 字典轉換成字串 (未設定縮排時使用最精簡的分隔符號)
+
+    Args:
+        workspace_json (dict)
+        indent (Optional[int], optional): 縮排空白數. Defaults to None.
+
+    Returns:
+        str
+    """
+    return json.dumps(
+        workspace_json,
+        ensure_ascii=False,
+        indent=indent,
+        separators=None if indent else (',', ':'),
+    )
@@ -0,0 +1,3 @@
+"""
+FastApi 伺服器端服務模組 (僅於 CPython 下使用，不會被 Brython 載入)
+"""
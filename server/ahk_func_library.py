@@ -0,0 +1,192 @@
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from loguru import logger
+
+
+class AhkFuncFileStat(NamedTuple):
+    """ AHK 函式檔案的索引資料 """
+    mtime_ns: int
+    size: int
+    sha1: str
+
+
+class AhkFuncLibrary:
+    """ AHK 函式庫 (ahk_funcs 目錄)
+
+    以背景執行緒輪詢目錄，依檔案修改時間與大小判斷變動，僅重新讀取有變動的檔案，
+    再以新字典整體替換函式索引 (不會原地修改)，因此讀取端取得的字典永遠是完整的一版
+    """
+
+    def __init__(self, dirpath: Path, poll_interval: float = 1.0):
+        """ AHK 函式庫
+
+        Args:
+            dirpath (Path): AHK 函式目錄
+            poll_interval (float, optional): 輪詢目錄的間隔秒數. Defaults to 1.0.
+        """
+        self.dirpath = dirpath
+        self.poll_interval = poll_interval
+
+        # AHK 函式名稱與腳本內容字典 (每次重新載入時整體替換)
+        self.func_name_mapping_scr_dict: Dict[str, str] = {}
+        # 函式庫版本: 所有函式檔案雜湊的總雜湊，內容變動時才會改變，供前端判斷是否需要清除快取
+        self.version: str = ''
+
+        self._file_stat_dict: Dict[str, AhkFuncFileStat] = {}
+        self._reload_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._watcher_thread: Optional[threading.Thread] = None
+
+        self.reload()
+
+    def reload(self) -> bool:
+        """ 重新載入有變動的函式檔案
+
+        Returns:
+            bool: 函式庫內容是否有變動
+        """
+        with self._reload_lock:
+            file_stat_dict: Dict[str, AhkFuncFileStat] = {}
+            changed_func_name_mapping_scr_dict: Dict[str, str] = {}
+            for dir_entry in os.scandir(self.dirpath):
+                if not (dir_entry.is_file() and dir_entry.name.endswith('.ahk')):
+                    continue
+                func_name = dir_entry.name[:-len('.ahk')]
+                stat = dir_entry.stat()
+                old_file_stat = self._file_stat_dict.get(func_name)
+
+                # 修改時間與大小皆未變動: 沿用舊的索引資料
+                if old_file_stat and (old_file_stat.mtime_ns, old_file_stat.size) == (stat.st_mtime_ns, stat.st_size):
+                    file_stat_dict[func_name] = old_file_stat
+                    continue
+
+                # 讀取變動的檔案，並以雜湊判斷內容是否真的有變動
+                func_scr = Path(dir_entry.path).read_text('utf-8')
+                sha1 = hashlib.sha1(func_scr.encode('utf-8')).hexdigest()
+                file_stat_dict[func_name] = AhkFuncFileStat(
+                    stat.st_mtime_ns, stat.st_size, sha1)
+                if not old_file_stat or old_file_stat.sha1 != sha1:
+                    changed_func_name_mapping_scr_dict[func_name] = func_scr
+
+            removed_func_name_set = self._file_stat_dict.keys() - file_stat_dict.keys()
+            self._file_stat_dict = file_stat_dict
+            if not changed_func_name_mapping_scr_dict and not removed_func_name_set:
+                return False
+
+            # 建立新的函式索引並整體替換
+            func_name_mapping_scr_dict = {
+                func_name: func_scr
+                for func_name, func_scr in self.func_name_mapping_scr_dict.items()
+                if func_name not in removed_func_name_set
+            }
+            func_name_mapping_scr_dict.update(changed_func_name_mapping_scr_dict)
+            self.func_name_mapping_scr_dict = func_name_mapping_scr_dict
+            self.version = hashlib.sha1(''.join(
+                f"{func_name}:{file_stat_dict[func_name].sha1};"
+                for func_name in sorted(file_stat_dict)
+            ).encode('utf-8')).hexdigest()[:16]
+
+        logger.info(
+            f"AHK 函式庫已更新 (version={self.version}): "
+            f"變動 {sorted(changed_func_name_mapping_scr_dict)}，移除 {sorted(removed_func_name_set)}"
+        )
+        return True
+
+    def resolve_func_name_list(self, func_names: Iterable[str]) -> List[str]:
+        """ 解析函式相依: 若函式腳本中有呼叫其他函式庫中的函式，則一併加入
+
+        Args:
+            func_names (Iterable[str]): 函式名稱 (不在函式庫中的名稱會被忽略)
+
+        Returns:
+            List[str]: 排序後的函式名稱列表
+        """
+        # 取用同一版本的函式庫字典 (避免處理途中函式庫重新載入)
+        func_name_mapping_scr_dict = self.func_name_mapping_scr_dict
+        func_name_set = set(
+            func_name for func_name in func_names
+            if func_name in func_name_mapping_scr_dict
+        )
+        unresolved_func_name_list = list(func_name_set)
+        while unresolved_func_name_list:
+            func_scr = func_name_mapping_scr_dict[unresolved_func_name_list.pop()]
+            for func_name in func_name_mapping_scr_dict:
+                if func_name not in func_name_set and f"{func_name}(" in func_scr:
+                    func_name_set.add(func_name)
+                    unresolved_func_name_list.append(func_name)
+        return sorted(func_name_set)
+
+    def get_funcs_script(self, func_names: Iterable[str]) -> str:
+        """ 獲取函式腳本 (含相依函式)
+
+        Args:
+            func_names (Iterable[str])
+
+        Returns:
+            str
+        """
+        func_name_mapping_scr_dict = self.func_name_mapping_scr_dict
+        return '\n\n'.join(
+            func_name_mapping_scr_dict[func_name]
+            for func_name in self.resolve_func_name_list(func_names)
+            if func_name in func_name_mapping_scr_dict
+        )
+
+    def get_funcs_include_script(self, func_names: Iterable[str], include_dirpath: Path) -> str:
+        """ 獲取引入函式檔案的腳本 (含相依函式)，如 `#Include C:\\...\\GetMousePos_0123456789ab.ahk`
+
+        函式檔案以內容雜湊命名，同一內容只會寫入一次，
+        因此生成的腳本不需夾帶函式內容，AHK 也只需解析實際用到的函式
+
+        Args:
+            func_names (Iterable[str])
+            include_dirpath (Path): 函式檔案的存放目錄 (通常位於 AHK 主程式旁)
+
+        Returns:
+            str
+        """
+        func_name_mapping_scr_dict = self.func_name_mapping_scr_dict
+        include_line_list = []
+        for func_name in self.resolve_func_name_list(func_names):
+            func_scr = func_name_mapping_scr_dict.get(func_name)
+            if func_scr is None:
+                continue
+            sha1 = hashlib.sha1(func_scr.encode('utf-8')).hexdigest()
+            include_filepath = (include_dirpath / f"{func_name}_{sha1[:12]}.ahk").absolute()
+            if not include_filepath.exists():
+                include_dirpath.mkdir(parents=True, exist_ok=True)
+                # 先寫入暫存檔再更名，避免執行中的腳本引入寫到一半的檔案
+                tmp_filepath = include_filepath.with_suffix(f'.{os.getpid()}.tmp')
+                tmp_filepath.write_text(func_scr, encoding='utf-8-sig')
+                os.replace(tmp_filepath, include_filepath)
+            include_line_list.append(f"#Include {include_filepath}")
+        return '\n'.join(include_line_list)
+
+    def _watch(self):
+        """ 輪詢目錄直到停止 """
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self.reload()
+            except Exception:
+                # 任何錯誤都不能終止監看執行緒，否則之後的函式檔案變動將不再生效
+                logger.exception("AHK 函式庫重新載入失敗")
+
+    def start_watching(self):
+        """ 啟動背景監看執行緒 """
+        if self._watcher_thread and self._watcher_thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._watcher_thread = threading.Thread(
+            target=self._watch, name='ahk_func_library_watcher', daemon=True)
+        self._watcher_thread.start()
+
+    def stop_watching(self):
+        """ 停止背景監看執行緒 """
+        self._stop_event.set()
+        if self._watcher_thread:
+            self._watcher_thread.join()
+            self._watcher_thread = None
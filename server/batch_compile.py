@@ -0,0 +1,207 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Union
+
+from pysrc import compiler
+from server.ahk_func_library import AhkFuncLibrary
+from server.compile_cache import CompileCache
+
+
+class BatchCompiler:
+    """ 批次編譯白板 (積木 xml 字串或 json 字典)
+
+    積木解析與編譯 (CPU 密集，含置頂程式碼的執行期設定) 於 ProcessPoolExecutor 的子進程中平行執行，
+    函式腳本則於主進程中組合，以使用最新版本的函式庫；
+    若有提供編譯快取，已編譯過的白板會直接回傳快取的腳本
+    """
+
+    def __init__(
+            self,
+            get_ahk_func_name_list: Callable[[], List[str]],
+            get_ahk_funcs_script: Callable[[Iterable[str]], str],
+            compile_cache: Optional[CompileCache] = None,
+            max_workers: Optional[int] = None):
+        """ 批次編譯積木 xml 字串
+
+        Args:
+            get_ahk_func_name_list (Callable[[], List[str]]): 獲取函式庫中所有函式名稱
+            get_ahk_funcs_script (Callable[[Iterable[str]], str]): 根據函式名稱獲取函式腳本 (含相依函式)
+            compile_cache (Optional[CompileCache], optional): 編譯快取. Defaults to None.
+            max_workers (Optional[int], optional): 子進程數量. Defaults to None (CPU 核心數).
+        """
+        self.get_ahk_func_name_list = get_ahk_func_name_list
+        self.get_ahk_funcs_script = get_ahk_funcs_script
+        self.compile_cache = compile_cache
+        self.max_workers = max_workers or os.cpu_count()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        """ 子進程池 (首次使用時才建立) """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def _join_ahkscr(self, header_ahkscr: str, block_ahkscr: str) -> str:
+        """ 組合置頂程式碼、積木代碼與關聯的函式腳本 """
+        return compiler.link_ahkscr(
+            header_ahkscr,
+            block_ahkscr,
+            self.get_ahk_func_name_list(),
+            self.get_ahk_funcs_script,
+        )
+
+    def _get_cached_ahkscr(self, cache_key: str) -> Optional[str]:
+        return self.compile_cache.get(cache_key) if self.compile_cache else None
+
+    def _put_cached_ahkscr(self, cache_key: str, ahkscr: str):
+        if self.compile_cache:
+            self.compile_cache.put(cache_key, ahkscr)
+
+    def compile_xml_str(
+            self,
+            xml_str: Union[str, dict],
+            run_as_admin: bool = False,
+            compile_options: Optional[compiler.CompileOptions] = None) -> str:
+        """ 於本進程編譯單一白板
+
+        Args:
+            xml_str (Union[str, dict]): 白板的 xml 字串或 json 字典
+            run_as_admin (bool, optional): 是否使用管理員權限執行. Defaults to False.
+            compile_options (Optional[compiler.CompileOptions], optional): 編譯請求指定的選項
+                (優先於白板的腳本設定積木). Defaults to None.
+
+        Returns:
+            str: AHK 腳本
+        """
+        cache_key = CompileCache.get_key(xml_str, run_as_admin, compile_options)
+        ahkscr = self._get_cached_ahkscr(cache_key)
+        if ahkscr is None:
+            ahkscr = self._join_ahkscr(
+                *compiler.compile_workspace(xml_str, run_as_admin, compile_options))
+            self._put_cached_ahkscr(cache_key, ahkscr)
+        return ahkscr
+
+    def iter_compile_xml_str(
+            self,
+            xml_str: Union[str, dict],
+            run_as_admin: bool = False,
+            compile_options: Optional[compiler.CompileOptions] = None,
+            whole_program: bool = True) -> Iterator[str]:
+        """ 於本進程編譯單一白板，並依序產出腳本段落: 置頂程式碼、各頂層積木的代碼段落、函式腳本
+
+        已快取的白板直接產出整個快取的腳本；未快取的白板逐段產出且不寫入快取 (供串流輸出大型白板，避免組合成一整個字串)
+
+        Args:
+            xml_str (Union[str, dict]): 白板的 xml 字串或 json 字典
+            run_as_admin (bool, optional): 是否使用管理員權限執行. Defaults to False.
+            compile_options (Optional[compiler.CompileOptions], optional): 編譯請求指定的選項. Defaults to None.
+            whole_program (bool, optional): 是否執行整個程式的最佳化 (否則逐一編譯積木，
+                見 `compiler.iter_workspace_ahkscr`). Defaults to True.
+
+        Yields:
+            str: 執行整個程式的最佳化時，組合後同 `compile_xml_str` 的 AHK 腳本
+        """
+        ahkscr = self._get_cached_ahkscr(CompileCache.get_key(xml_str, run_as_admin, compile_options))
+        if ahkscr is not None:
+            yield ahkscr
+            return
+        yield from compiler.iter_workspace_ahkscr(
+            xml_str,
+            self.get_ahk_func_name_list(),
+            self.get_ahk_funcs_script,
+            run_as_admin=run_as_admin,
+            compile_options=compile_options,
+            whole_program=whole_program,
+        )
+
+    def profile(self, xml_str: Union[str, dict], compile_options: Optional[compiler.CompileOptions] = None) -> dict:
+        """ 編譯單一白板並分析效能 (於子進程中執行: 效能分析器為全域設定，以免記錄到本進程的其他編譯)
+
+        Args:
+            xml_str (Union[str, dict]): 白板的 xml 字串或 json 字典
+            compile_options (Optional[compiler.CompileOptions], optional): 編譯請求指定的選項. Defaults to None.
+
+        Returns:
+            dict: 分析報告字典 (見 `BlockProfiler.get_report_dict`)
+        """
+        _, report_dict = self.executor.submit(
+            compiler.profile_workspace, xml_str, compile_options).result()
+        return report_dict
+
+    def compile(
+            self,
+            xml_strs: Iterable[Union[str, dict]],
+            run_as_admin: bool = False,
+            compile_options: Optional[compiler.CompileOptions] = None) -> Iterator[dict]:
+        """ 批次編譯白板，並依完成順序逐一產出結果
+
+        Args:
+            xml_strs (Iterable[Union[str, dict]]): 白板的 xml 字串或 json 字典
+            run_as_admin (bool, optional): 是否使用管理員權限執行. Defaults to False.
+            compile_options (Optional[compiler.CompileOptions], optional): 編譯請求指定的選項 (套用至所有白板). Defaults to None.
+
+        Yields:
+            dict: 成功時為 {"index": 序號, "ahkscr": AHK 腳本}，失敗時為 {"index": 序號, "error": 錯誤訊息}
+        """
+        # 已快取的白板直接產出結果，其餘送至子進程編譯
+        future_mapping_index_and_cache_key_dict = {}
+        for index, xml_str in enumerate(xml_strs):
+            cache_key = CompileCache.get_key(xml_str, run_as_admin, compile_options)
+            ahkscr = self._get_cached_ahkscr(cache_key)
+            if ahkscr is not None:
+                yield {"index": index, "ahkscr": ahkscr}
+                continue
+            future = self.executor.submit(
+                compiler.compile_workspace, xml_str, run_as_admin, compile_options)
+            future_mapping_index_and_cache_key_dict[future] = (index, cache_key)
+
+        for future in as_completed(future_mapping_index_and_cache_key_dict):
+            index, cache_key = future_mapping_index_and_cache_key_dict[future]
+            # 單一項目編譯失敗時回報錯誤，不中斷整個批次
+            try:
+                ahkscr = self._join_ahkscr(*future.result())
+            except Exception as err:
+                yield {"index": index, "error": f"{type(err).__name__}: {err}"}
+                continue
+            self._put_cached_ahkscr(cache_key, ahkscr)
+            yield {"index": index, "ahkscr": ahkscr}
+
+    def shutdown(self):
+        """ 關閉子進程池 """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+def compile_xml_strs(
+        xml_strs: Iterable[Union[str, dict]],
+        ahk_func_dirpath: str = 'ahk_funcs',
+        run_as_admin: bool = False,
+        max_workers: Optional[int] = None,
+        compile_options: Optional[compiler.CompileOptions] = None) -> Iterator[dict]:
+    """ 批次編譯白板 (Python 進入點，函式庫直接自 ahk_funcs 目錄讀取)
+
+    Args:
+        xml_strs (Iterable[Union[str, dict]]): 白板的 xml 字串或 json 字典
+        ahk_func_dirpath (str, optional): AHK 函式目錄. Defaults to 'ahk_funcs'.
+        run_as_admin (bool, optional): 是否使用管理員權限執行. Defaults to False.
+        max_workers (Optional[int], optional): 子進程數量. Defaults to None (CPU 核心數).
+        compile_options (Optional[compiler.CompileOptions], optional): 編譯請求指定的選項. Defaults to None.
+
+    Yields:
+        dict: 同 `BatchCompiler.compile`
+    """
+    ahk_func_library = AhkFuncLibrary(Path(ahk_func_dirpath))
+    batch_compiler = BatchCompiler(
+        get_ahk_func_name_list=lambda: list(
+            ahk_func_library.func_name_mapping_scr_dict),
+        get_ahk_funcs_script=ahk_func_library.get_funcs_script,
+        max_workers=max_workers,
+    )
+    try:
+        yield from batch_compiler.compile(
+            xml_strs, run_as_admin=run_as_admin, compile_options=compile_options)
+    finally:
+        batch_compiler.shutdown()
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+from pysrc import codegen, compiler, ir, optimizer
+from pysrc.models import block_bases, blocks
+
+# 積木標籤 (含 shadow 積木) 與其中會隨機產生或隨拖曳變動的屬性: id、x、y
+BLOCK_TAG_PATTERN = re.compile(R'<(?:block|shadow)\b[^>]*>')
+VOLATILE_ATTR_PATTERN = re.compile(R'\s(?:id|x|y)="[^"]*"')
+# 白板 json 字典中積木會隨機產生或隨拖曳變動的鍵
+VOLATILE_JSON_KEYS = {'id', 'x', 'y'}
+
+
+def normalize_xml_str(xml_str: str) -> str:
+    """ 正規化白板 xml 字串: 移除積木標籤中的 id 與 x/y 座標屬性
+
+    (xml 的文字內容與屬性值中的 `<`、`>` 皆已跳脫，因此只會比對到真正的積木標籤)
+
+    Args:
+        xml_str (str)
+
+    Returns:
+        str
+    """
+    return BLOCK_TAG_PATTERN.sub(
+        lambda match: VOLATILE_ATTR_PATTERN.sub('', match.group()),
+        xml_str.strip(),
+    )
+
+
+def normalize_workspace_json(workspace_json: dict) -> str:
+    """ 正規化白板 json 字典: 移除積木的 id 與 x/y 座標，並以排序的鍵轉換成字串
+
+    Args:
+        workspace_json (dict)
+
+    Returns:
+        str
+    """
+    normalized_workspace_json = dict(workspace_json)
+    # (原始字典, 正規化後的字典) 以工作堆疊遍歷巢狀的積木
+    work_stack = [(workspace_json, normalized_workspace_json)]
+    while work_stack:
+        origin_dict, normalized_dict = work_stack.pop()
+        for key, value in origin_dict.items():
+            if key in VOLATILE_JSON_KEYS and 'type' in origin_dict:
+                del normalized_dict[key]
+            elif isinstance(value, dict):
+                normalized_dict[key] = dict(value)
+                work_stack.append((value, normalized_dict[key]))
+            elif isinstance(value, list):
+                normalized_dict[key] = [
+                    dict(item) if isinstance(item, dict) else item
+                    for item in value
+                ]
+                work_stack.extend(
+                    (item, normalized_item)
+                    for item, normalized_item in zip(value, normalized_dict[key])
+                    if isinstance(item, dict)
+                )
+    return json.dumps(normalized_workspace_json, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+
+
+@lru_cache(maxsize=None)
+def get_block_definition_version() -> str:
+    """ 獲取積木定義版本: 本進程已載入的積木模型與編譯模組原始碼的雜湊
+
+    Returns:
+        str
+    """
+    sha1 = hashlib.sha1()
+    for module in [compiler, ir, codegen, optimizer, block_bases, blocks]:
+        sha1.update(Path(module.__file__).read_bytes())
+    return sha1.hexdigest()[:16]
+
+
+class CompileCache:
+    """ 編譯快取: 正規化 xml 字串 (或 json 字典) 的雜湊 → 編譯後的 AHK 腳本
+
+    以 LRU 方式依腳本總字元數淘汰，並於積木定義或函式庫版本變動時自動清空
+    """
+
+    def __init__(self, get_version: Callable[[], str], max_size: int = 32 * 1024 * 1024):
+        """ 編譯快取
+
+        Args:
+            get_version (Callable[[], str]): 獲取目前的積木定義與函式庫版本
+            max_size (int, optional): 快取腳本的總字元數上限. Defaults to 32M.
+        """
+        self.get_version = get_version
+        self.max_size = max_size
+
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._version: Optional[str] = None
+        self._key_mapping_ahkscr_dict: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_key(
+            workspace: Union[str, dict],
+            run_as_admin: bool = False,
+            compile_options: Optional[compiler.CompileOptions] = None) -> str:
+        """ 獲取快取鍵
+
+        Args:
+            workspace (Union[str, dict]): 白板的 xml 字串或 json 字典
+            run_as_admin (bool, optional): 是否使用管理員權限執行. Defaults to False.
+            compile_options (Optional[compiler.CompileOptions], optional): 編譯請求指定的選項. Defaults to None.
+
+        Returns:
+            str
+        """
+        normalized_workspace_str = normalize_workspace_json(workspace) \
+            if isinstance(workspace, dict) else normalize_xml_str(workspace)
+        compile_options_str = json.dumps(
+            (compile_options or compiler.CompileOptions())._asdict(), sort_keys=True)
+        return hashlib.sha1(
+            f"{int(run_as_admin)}:{compile_options_str}:{normalized_workspace_str}".encode('utf-8')
+        ).hexdigest()
+
+    def _check_version(self):
+        """ 版本變動時清空快取 (須於 lock 內呼叫) """
+        version = self.get_version()
+        if version != self._version:
+            self._key_mapping_ahkscr_dict.clear()
+            self.size = 0
+            self._version = version
+
+    def get(self, key: str) -> Optional[str]:
+        """ 獲取快取的 AHK 腳本
+
+        Args:
+            key (str)
+
+        Returns:
+            Optional[str]: 無快取時回傳 None
+        """
+        with self._lock:
+            self._check_version()
+            ahkscr = self._key_mapping_ahkscr_dict.get(key)
+            if ahkscr is None:
+                self.misses += 1
+                return None
+            self._key_mapping_ahkscr_dict.move_to_end(key)
+            self.hits += 1
+            return ahkscr
+
+    def put(self, key: str, ahkscr: str):
+        """ 快取 AHK 腳本，超過總字元數上限時淘汰最久未使用的腳本
+
+        Args:
+            key (str)
+            ahkscr (str)
+        """
+        if len(ahkscr) > self.max_size:
+            return
+        with self._lock:
+            self._check_version()
+            old_ahkscr = self._key_mapping_ahkscr_dict.pop(key, None)
+            if old_ahkscr is not None:
+                self.size -= len(old_ahkscr)
+            self._key_mapping_ahkscr_dict[key] = ahkscr
+            self.size += len(ahkscr)
+            while self.size > self.max_size:
+                _, evicted_ahkscr = self._key_mapping_ahkscr_dict.popitem(last=False)
+                self.size -= len(evicted_ahkscr)
+
+    def get_stats(self) -> dict:
+        """ 獲取快取統計 """
+        with self._lock:
+            return {
+                "version": self._version,
+                "entries": len(self._key_mapping_ahkscr_dict),
+                "size": self.size,
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
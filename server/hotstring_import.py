@@ -0,0 +1,231 @@
+"""
+熱字串批次匯入: 逐列讀取 CSV/TSV 縮寫字典並建立熱字串積木，再逐段輸出白板 xml 字串、json 字串或 AHK 腳本
+(逐列處理、逐段輸出，記憶體用量不隨字典列數增加)
+
+字典檔的欄位依序為縮寫、展開文字，與選填的熱字串設定 (同熱字串設定積木):
+區分大小寫、字詞間展開、立即展開、包含終止符；第一列為欄位名稱時 (含 abbr 與 text) 則依欄位名稱對應，如:
+
+    abbr,text,case_sensitive,immediately
+    btw,by the way,1,0
+"""
+import csv
+import re
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional, Set, TextIO
+
+from loguru import logger
+
+from pysrc import compiler, workspace_json
+from pysrc.models.block_bases import BlockBase
+from pysrc.models.blocks import (
+    HotStringBlock,
+    HotStringSettingBlock,
+    HotStringWithSettingBlock,
+    TextBlock,
+)
+
+# 輸出格式: AHK 腳本、白板 xml 字串、白板 json 字串
+OUTPUT_FORMATS = ('ahk', 'xml', 'json')
+# 輸出格式與其 HTTP 媒體類型字典
+OUTPUT_FORMAT_MAPPING_MEDIA_TYPE_DICT = {
+    'ahk': 'text/plain; charset=utf-8',
+    'xml': 'application/xml',
+    'json': 'application/json',
+}
+# 字典檔副檔名與欄位分隔符號字典 (其餘副檔名使用逗號)
+FILE_SUFFIX_MAPPING_DELIMITER_DICT = {
+    '.csv': ',',
+    '.tsv': '\t',
+    '.tab': '\t',
+}
+
+# 縮寫與展開文字的欄位名稱
+ABBR_COLUMN_NAME = 'abbr'
+TEXT_COLUMN_NAME = 'text'
+# 熱字串設定的欄位名稱與熱字串設定積木的參數名稱字典 (依無欄位名稱列時的欄位順序)
+SETTING_COLUMN_NAME_MAPPING_ARG_NAME_DICT = {
+    'case_sensitive': 'CASE_SENSITIVE',
+    'in_words': 'IN_WORDS',
+    'immediately': 'IMMEDIATELY',
+    'contain_ending_character': 'CONTAIN_ENDING_CHARACTER',
+}
+# 熱字串設定欄位中視為勾選的值 (不區分大小寫)
+TRUE_VALUE_SET = {'1', 'true', 'yes', 'y', 't', 'v'}
+# 展開文字中會被 AHK 視為註解開頭的分號 (前方為空白)
+COMMENT_SEMICOLON_PATTERN = re.compile(R'(?<=[ \t]);')
+
+
+def get_delimiter(filename: str) -> str:
+    """ 依字典檔副檔名獲取欄位分隔符號
+
+    Args:
+        filename (str)
+
+    Returns:
+        str
+    """
+    return FILE_SUFFIX_MAPPING_DELIMITER_DICT.get(Path(filename).suffix.lower(), ',')
+
+
+def escape_hotstring_text(text: str) -> str:
+    """ 跳脫展開文字: 換行與定位字元改為 AHK 跳脫序列 (文字積木僅能有一行)，並跳脫反引號與註解分號
+
+    Args:
+        text (str)
+
+    Returns:
+        str
+    """
+    text = text.replace('`', '``').replace('\r\n', '\n').replace('\r', '\n')
+    text = text.replace('\n', '`n').replace('\t', '`t')
+    return COMMENT_SEMICOLON_PATTERN.sub('`;', text)
+
+
+def iter_hotstring_row_dicts(file: TextIO, delimiter: str = ',') -> Iterator[Dict[str, str]]:
+    """ 逐列讀取字典檔
+
+    Args:
+        file (TextIO): 字典檔 (可為逐行產生的任何文字串流)
+        delimiter (str, optional): 欄位分隔符號. Defaults to ','.
+
+    Yields:
+        Dict[str, str]: 欄位名稱與值字典，另以 'line' 鍵記錄列號
+    """
+    column_name_list = [ABBR_COLUMN_NAME, TEXT_COLUMN_NAME, *SETTING_COLUMN_NAME_MAPPING_ARG_NAME_DICT]
+    for row_index, row in enumerate(csv.reader(file, delimiter=delimiter)):
+        if not row:
+            continue
+        # 第一列為欄位名稱時，依欄位名稱對應
+        if row_index == 0:
+            lower_row = [value.strip().lower() for value in row]
+            if ABBR_COLUMN_NAME in lower_row and TEXT_COLUMN_NAME in lower_row:
+                column_name_list = lower_row
+                continue
+        row_dict = dict(zip(column_name_list, row))
+        row_dict['line'] = str(row_index + 1)
+        yield row_dict
+
+
+def create_hotstring_block(row_dict: Dict[str, str]) -> Optional[BlockBase]:
+    """ 依字典檔的一列建立熱字串積木: 有任一熱字串設定欄位值時使用含設定熱字串積木
+
+    Args:
+        row_dict (Dict[str, str]): 欄位名稱與值字典
+
+    Returns:
+        Optional[BlockBase]: 縮寫或展開文字無效時回傳 None
+    """
+    abbr = row_dict.get(ABBR_COLUMN_NAME, '').strip()
+    text = row_dict.get(TEXT_COLUMN_NAME, '')
+    if not abbr or not text or '::' in abbr or '\n' in abbr:
+        return None
+
+    abbr_block = TextBlock(TEXT=abbr)
+    text_block = TextBlock(TEXT=escape_hotstring_text(text))
+    setting_arg_name_mapping_value_dict = {
+        arg_name: 'TRUE' if row_dict[column_name].strip().lower() in TRUE_VALUE_SET else 'FALSE'
+        for column_name, arg_name in SETTING_COLUMN_NAME_MAPPING_ARG_NAME_DICT.items()
+        if row_dict.get(column_name, '').strip()
+    }
+    if not setting_arg_name_mapping_value_dict:
+        return HotStringBlock(ABBR=abbr_block, TEXT=text_block)
+
+    # 未填寫的設定欄位使用熱字串設定積木的預設值
+    for arg_name, arg_dict in HotStringSettingBlock.arg_dicts.items():
+        setting_arg_name_mapping_value_dict.setdefault(
+            arg_name, 'TRUE' if arg_dict.get('checked') else 'FALSE')
+    return HotStringWithSettingBlock(
+        ABBR=abbr_block,
+        TEXT=text_block,
+        SETTING=[HotStringSettingBlock(**setting_arg_name_mapping_value_dict)],
+    )
+
+
+def iter_hotstring_blocks(file: TextIO, delimiter: str = ',') -> Iterator[BlockBase]:
+    """ 逐列讀取字典檔並建立熱字串積木 (略過無效的列)
+
+    Args:
+        file (TextIO): 字典檔
+        delimiter (str, optional): 欄位分隔符號. Defaults to ','.
+
+    Yields:
+        BlockBase
+    """
+    for row_dict in iter_hotstring_row_dicts(file, delimiter):
+        hotstring_block = create_hotstring_block(row_dict)
+        if hotstring_block is None:
+            logger.warning(f"略過第 {row_dict['line']} 列: 縮寫或展開文字無效")
+            continue
+        yield hotstring_block
+
+
+def iter_workspace_xml_str(blocks: Iterable[BlockBase]) -> Iterator[str]:
+    """ 逐段產生白板 xml 字串
+
+    Args:
+        blocks (Iterable[BlockBase])
+
+    Yields:
+        str
+    """
+    yield f'<xml xmlns="{workspace_json.BLOCKLY_XML_NAMESPACE}">'
+    for block in blocks:
+        yield block.get_xml_str()
+    yield '</xml>'
+
+
+def iter_workspace_json_str(blocks: Iterable[BlockBase]) -> Iterator[str]:
+    """ 逐段產生白板 json 字串 (Blockly 的 json 序列化格式)
+
+    Args:
+        blocks (Iterable[BlockBase])
+
+    Yields:
+        str
+    """
+    yield '{"blocks":{"languageVersion":0,"blocks":['
+    separator = ''
+    for block in blocks:
+        yield separator + workspace_json.dumps(block.get_json_dict())
+        separator = ','
+    yield ']}}'
+
+
+def iter_import_chunks(
+        file: TextIO,
+        output_format: str = 'ahk',
+        delimiter: str = ',',
+        ahk_func_names: Iterable[str] = (),
+        get_ahk_funcs_script: Callable[[Set[str]], str] = lambda _: '',
+        run_as_admin: bool = False) -> Iterator[str]:
+    """ 匯入字典檔並逐段產生輸出
+
+    Args:
+        file (TextIO): 字典檔
+        output_format (str, optional): 輸出格式 (見 `OUTPUT_FORMATS`). Defaults to 'ahk'.
+        delimiter (str, optional): 欄位分隔符號. Defaults to ','.
+        ahk_func_names (Iterable[str], optional): 函式庫中所有的函式名稱 (輸出 AHK 腳本時使用). Defaults to ().
+        get_ahk_funcs_script (Callable[[Set[str]], str], optional): 根據函式名稱獲取函式腳本 (輸出 AHK 腳本時使用).
+        run_as_admin (bool, optional): 是否使用管理員權限執行 (輸出 AHK 腳本時使用). Defaults to False.
+
+    Raises:
+        ValueError: 未知的輸出格式
+
+    Yields:
+        str
+    """
+    hotstring_blocks = iter_hotstring_blocks(file, delimiter)
+    if output_format == 'xml':
+        yield from iter_workspace_xml_str(hotstring_blocks)
+    elif output_format == 'json':
+        yield from iter_workspace_json_str(hotstring_blocks)
+    elif output_format == 'ahk':
+        # 熱字串不需最佳化: 逐一降階積木，不保留整個程式的 IR
+        yield from compiler.iter_linked_ahkscr(
+            compiler.iter_blocks_ahkscr(hotstring_blocks, optimize=False),
+            ahk_func_names,
+            get_ahk_funcs_script,
+            run_as_admin=run_as_admin,
+        )
+    else:
+        raise ValueError(f"未知的輸出格式: {output_format}")
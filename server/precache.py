@@ -0,0 +1,71 @@
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+class PrecacheManifest:
+    """ Service Worker 預快取清單
+
+    列出編輯器外殼 (Blockly、Brython、語系檔、pysrc 等) 的網址，
+    並以檔案內容計算版本雜湊，供 Service Worker 判斷是否需要更新快取
+    """
+
+    def __init__(
+            self,
+            root_dirpath: Path,
+            page_url_mapping_filepath_dict: Dict[str, str],
+            static_glob_patterns: List[str]):
+        """ Service Worker 預快取清單
+
+        Args:
+            root_dirpath (Path): 專案根目錄
+            page_url_mapping_filepath_dict (Dict[str, str]): 頁面網址與其模板檔案路徑字典，如 {"/": "templates/index.html"}
+            static_glob_patterns (List[str]): 靜態檔案的 glob 樣式列表 (網址即為相對於根目錄的路徑)
+        """
+        self.root_dirpath = root_dirpath
+        self.page_url_mapping_filepath_dict = page_url_mapping_filepath_dict
+        self.static_glob_patterns = static_glob_patterns
+
+        # 上次計算清單時各檔案的 (路徑, 修改時間, 大小)，用於避免重複讀檔計算雜湊
+        self._stat_key: Optional[Tuple[tuple, ...]] = None
+        self._manifest_dict: Optional[dict] = None
+
+    def _get_url_mapping_filepath_dict(self) -> Dict[str, Path]:
+        """ 獲取網址與檔案路徑字典 """
+        url_mapping_filepath_dict = {
+            url: self.root_dirpath / filepath
+            for url, filepath in self.page_url_mapping_filepath_dict.items()
+        }
+        for pattern in self.static_glob_patterns:
+            for filepath in sorted(self.root_dirpath.glob(pattern)):
+                if filepath.is_file():
+                    url = f"/{filepath.relative_to(self.root_dirpath).as_posix()}"
+                    url_mapping_filepath_dict[url] = filepath
+        return url_mapping_filepath_dict
+
+    def get(self) -> dict:
+        """ 獲取預快取清單字典
+
+        Returns:
+            dict: {"version": 版本雜湊, "urls": 網址列表}
+        """
+        url_mapping_filepath_dict = self._get_url_mapping_filepath_dict()
+        stat_key = tuple(
+            (url, filepath.stat().st_mtime_ns, filepath.stat().st_size)
+            for url, filepath in url_mapping_filepath_dict.items()
+        )
+
+        # 檔案皆未變動時，直接回傳上次的清單
+        if stat_key == self._stat_key:
+            return self._manifest_dict
+
+        sha1 = hashlib.sha1()
+        for url, filepath in url_mapping_filepath_dict.items():
+            sha1.update(url.encode('utf-8'))
+            sha1.update(filepath.read_bytes())
+        self._manifest_dict = {
+            "version": sha1.hexdigest()[:16],
+            "urls": list(url_mapping_filepath_dict.keys()),
+        }
+        self._stat_key = stat_key
+        return self._manifest_dict
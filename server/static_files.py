@@ -0,0 +1,20 @@
+from starlette.staticfiles import StaticFiles
+
+
+class CachedStaticFiles(StaticFiles):
+    """ 附帶 Cache-Control 標頭的靜態檔案 (用於內容不常變動的資源，如 Blockly 媒體檔) """
+
+    def __init__(self, *args, max_age: int = 60 * 60 * 24 * 7, **kwargs):
+        """ 附帶 Cache-Control 標頭的靜態檔案
+
+        Args:
+            max_age (int, optional): 瀏覽器快取秒數. Defaults to 一週.
+        """
+        super().__init__(*args, **kwargs)
+        self.max_age = max_age
+
+    async def get_response(self, path: str, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers['Cache-Control'] = f'public, max-age={self.max_age}'
+        return response
@@ -0,0 +1,136 @@
+// AHK Blockly Service Worker
+// - 編輯器外殼 (預快取清單內的檔案): 快取優先，並於背景比對清單版本，版本變更時重新預快取
+// - AHK 函式庫 API: 網路優先，伺服器無回應時改用快取；函式庫版本變更時清除快取，避免離線時混用新舊版本的函式
+var SHELL_CACHE_PREFIX = 'ahkblockly-shell-';
+var META_CACHE_NAME = 'ahkblockly-meta';
+var AHK_FUNCS_CACHE_NAME = 'ahkblockly-ahk-funcs';
+var MANIFEST_URL = '/api/precache_manifest';
+var ACTIVE_VERSION_KEY = '/__active_shell_version';
+var AHK_FUNCS_VERSION_URL = '/api/ahk_funcs_version';
+var AHK_FUNCS_VERSION_KEY = '/__ahk_funcs_version';
+var AHK_FUNCS_API_PATHS = ['/api/ahk_funcs', '/api/ahk_funcs_script'];
+
+var getActiveVersion = async function () {
+    var metaCache = await caches.open(META_CACHE_NAME);
+    var res = await metaCache.match(ACTIVE_VERSION_KEY);
+    return res ? res.text() : null;
+};
+
+var setActiveVersion = async function (version) {
+    var metaCache = await caches.open(META_CACHE_NAME);
+    await metaCache.put(ACTIVE_VERSION_KEY, new Response(version));
+};
+
+var precache = async function () {
+    // 獲取最新的預快取清單，若版本未變更則不做任何事
+    var res = await fetch(MANIFEST_URL, { cache: 'no-store' });
+    var manifest = await res.json();
+    var activeVersion = await getActiveVersion();
+    if (manifest.version === activeVersion) {
+        return;
+    }
+
+    // 將清單內的檔案全部下載至新版本的快取，完成後再切換版本並刪除舊版本快取
+    var shellCache = await caches.open(SHELL_CACHE_PREFIX + manifest.version);
+    await shellCache.addAll(manifest.urls.map(function (url) {
+        return new Request(url, { cache: 'reload' });
+    }));
+    await setActiveVersion(manifest.version);
+    var cacheNames = await caches.keys();
+    await Promise.all(cacheNames.filter(function (cacheName) {
+        return cacheName.startsWith(SHELL_CACHE_PREFIX)
+            && cacheName !== SHELL_CACHE_PREFIX + manifest.version;
+    }).map(function (cacheName) {
+        return caches.delete(cacheName);
+    }));
+};
+
+var syncAhkFuncsVersion = async function () {
+    // 比對伺服器的 AHK 函式庫版本，變更時清除函式庫 API 的快取
+    var res = await fetch(AHK_FUNCS_VERSION_URL, { cache: 'no-store' });
+    var version = (await res.json()).version;
+    var metaCache = await caches.open(META_CACHE_NAME);
+    var cachedVersionRes = await metaCache.match(AHK_FUNCS_VERSION_KEY);
+    var cachedVersion = cachedVersionRes ? await cachedVersionRes.text() : null;
+    if (version === cachedVersion) {
+        return;
+    }
+    await caches.delete(AHK_FUNCS_CACHE_NAME);
+    await metaCache.put(AHK_FUNCS_VERSION_KEY, new Response(version));
+};
+
+var matchShell = async function (request) {
+    var activeVersion = await getActiveVersion();
+    if (!activeVersion) {
+        return null;
+    }
+    var shellCache = await caches.open(SHELL_CACHE_PREFIX + activeVersion);
+    // Brython 載入模組時會加上 ?v=時間戳，故比對時忽略查詢字串
+    return shellCache.match(request, { ignoreSearch: true });
+};
+
+var fetchShell = async function (event) {
+    // 進入頁面時於背景檢查 AHK 函式庫版本
+    if (event.request.mode === 'navigate') {
+        event.waitUntil(syncAhkFuncsVersion().catch(function () { }));
+    }
+    var cachedRes = await matchShell(event.request);
+    if (cachedRes) {
+        // 進入頁面時於背景檢查清單版本
+        if (event.request.mode === 'navigate') {
+            event.waitUntil(precache().catch(function () { }));
+        }
+        return cachedRes;
+    }
+    try {
+        return await fetch(event.request);
+    } catch (err) {
+        // 伺服器無回應: 回傳錯誤狀態 (Brython 會視為找不到該模組)
+        return new Response('', { status: 504 });
+    }
+};
+
+var fetchAhkFuncs = async function (request) {
+    var ahkFuncsCache = await caches.open(AHK_FUNCS_CACHE_NAME);
+    try {
+        var res = await fetch(request);
+        if (res.ok) {
+            await ahkFuncsCache.put(request, res.clone());
+        }
+        return res;
+    } catch (err) {
+        var cachedRes = await ahkFuncsCache.match(request);
+        if (cachedRes) {
+            return cachedRes;
+        }
+        throw err;
+    }
+};
+
+self.addEventListener('install', function (event) {
+    event.waitUntil(Promise.all([
+        precache(),
+        syncAhkFuncsVersion().catch(function () { }),
+    ]).then(function () {
+        return self.skipWaiting();
+    }));
+});
+
+self.addEventListener('activate', function (event) {
+    event.waitUntil(self.clients.claim());
+});
+
+self.addEventListener('fetch', function (event) {
+    var url = new URL(event.request.url);
+    if (event.request.method !== 'GET' || url.origin !== self.location.origin) {
+        return;
+    }
+    if (AHK_FUNCS_API_PATHS.indexOf(url.pathname) !== -1) {
+        event.respondWith(fetchAhkFuncs(event.request));
+        return;
+    }
+    if (url.pathname.startsWith('/api/') || url.pathname.startsWith('/docs')) {
+        return;
+    }
+    event.respondWith(fetchShell(event));
+});
@@ -0,0 +1,49 @@
+from pysrc import compiler, workspace_json
+from pysrc.models.block_bases import BlockBase
+from pysrc.models.blocks import MsgboxBlock, TextBlock
+
+FIELD_TEXT = 'a&b <c> "d"'
+WORKSPACE_XML_STR = (
+    '<xml xmlns="https://developers.google.com/blockly/xml">'
+    '<block type="msgbox" id="a"><value name="TEXT">'
+    '<block type="text" id="b"><field name="TEXT">a&amp;b &lt;c&gt; "d"</field></block>'
+    '</value></block>'
+    '</xml>'
+)
+
+
+def get_field_text(xml_str: str) -> str:
+    """ 獲取白板中唯一的文字積木的 field 值 """
+    [msgbox_block] = BlockBase.create_blocks_from_xml_str(xml_str)
+    return msgbox_block.TEXT.TEXT
+
+
+def test_xml_field_is_unescaped_on_parse():
+    assert get_field_text(WORKSPACE_XML_STR) == FIELD_TEXT
+
+
+def test_xml_field_round_trip_is_stable():
+    xml_str = WORKSPACE_XML_STR
+    for _ in range(3):
+        [msgbox_block] = BlockBase.create_blocks_from_xml_str(xml_str)
+        xml_str = f'<xml>{msgbox_block.get_xml_str()}</xml>'
+        assert get_field_text(xml_str) == FIELD_TEXT
+    assert '<field name="TEXT">a&amp;b &lt;c&gt; "d"</field>' in xml_str
+
+
+def test_created_block_matches_parsed_block():
+    msgbox_block = MsgboxBlock(TEXT=TextBlock(TEXT=FIELD_TEXT))
+    assert get_field_text(f'<xml>{msgbox_block.get_xml_str()}</xml>') == FIELD_TEXT
+
+
+def test_json_field_matches_xml_field():
+    com_workspace_json = workspace_json.xml_str_to_workspace_json(WORKSPACE_XML_STR)
+    [msgbox_block] = BlockBase.create_blocks_from_workspace_json(com_workspace_json)
+    assert msgbox_block.TEXT.TEXT == FIELD_TEXT
+    assert get_field_text(f'<xml>{msgbox_block.get_xml_str()}</xml>') == FIELD_TEXT
+
+
+def test_compiled_field_is_unescaped():
+    block_ahkscr = compiler.get_workspace_ahkscr(WORKSPACE_XML_STR)
+    assert 'a&b <c>' in block_ahkscr
+    assert '&amp;' not in block_ahkscr
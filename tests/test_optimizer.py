@@ -0,0 +1,33 @@
+import pytest
+
+from pysrc import optimizer
+
+
+@pytest.mark.parametrize('a, b, expected', [
+    (7, 2, 3),
+    (-7, 2, -3),
+    (7, -2, -3),
+    (-7, -2, 3),
+    (5, -3, -1),
+    (-6, 3, -2),
+    (0, -5, 0),
+])
+def test_fold_integer_floor_divide_truncates_toward_zero(a, b, expected):
+    result = optimizer.fold_binary_op('//', a, b)
+    assert result == expected
+    assert isinstance(result, int)
+
+
+@pytest.mark.parametrize('a, b, expected', [
+    (7.0, 2, 3.0),
+    (-7.0, 2, -4.0),
+    (5, -3.0, -2.0),
+])
+def test_fold_float_floor_divide_rounds_down(a, b, expected):
+    result = optimizer.fold_binary_op('//', a, b)
+    assert result == expected
+    assert isinstance(result, float)
+
+
+def test_fold_floor_divide_by_zero_is_not_folded():
+    assert optimizer.fold_binary_op('//', 1, 0) is None